@@ -0,0 +1,230 @@
+"""
+Lokaler Ersatz für die TMDB-API und den Bild-Server (nur für Benchmarks).
+
+Beantwortet search/movie, search/tv, movie/<id>, tv/<id>, tv/<id>/season/<n>,
+tv/<id>/season/<n>/episode/<e> und /t/p/<größe>/<datei> mit deterministischen Daten
+(gleiche Suche = gleiche ID). Einstellbar: Latenz je Anfrage, Anteil nicht gefundener
+Titel und ein Rate-Limit, bei dessen Überschreitung wie bei TMDB HTTP 429 mit
+Retry-After kommt. GET /__stats liefert die Anzahl Anfragen je Endpunkt und Status.
+Ist Pillow installiert, sind die Bilder echte JPEGs in der angefragten Breite (damit der
+Scan auch die WebP/AVIF-Fassungen erzeugen kann), sonst nur Füllbytes.
+
+    python benchmarks/fake_tmdb.py --port 8765 --latency-ms 40 --rate-limit 50
+"""
+import argparse
+import io
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGE_BYTES = bytes(range(256)) * 40  # ~10 KB "Bild"
+
+
+@lru_cache(maxsize=None)
+def image_bytes(width, poster):
+    """JPEG mit Farbverlauf (Poster 2:3, sonst 16:9); ohne Pillow die Füllbytes."""
+    if Image is None:
+        return IMAGE_BYTES
+    height = width * 3 // 2 if poster else width * 9 // 16
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+GENRES = ['Action', 'Drama', 'Komödie', 'Krimi', 'Science Fiction', 'Dokumentarfilm', 'Animation', 'Thriller']
+
+ROUTES = [
+    ('search', re.compile(r'^/3/search/(movie|tv)$')),
+    ('episode', re.compile(r'^/3/tv/(\d+)/season/(\d+)/episode/(\d+)$')),
+    ('season', re.compile(r'^/3/tv/(\d+)/season/(\d+)$')),
+    ('tv', re.compile(r'^/3/tv/(\d+)$')),
+    ('movie', re.compile(r'^/3/movie/(\d+)$')),
+    ('genre', re.compile(r'^/3/genre/(movie|tv)/list$')),
+    ('image', re.compile(r'^/t/p/w?(\d*)[^/]*/(.+)$')),
+]
+
+
+def stable_id(text):
+    return zlib.crc32(text.casefold().encode('utf-8')) % 900000 + 1000
+
+
+class FakeTMDB:
+    def __init__(self, port=0, latency_ms=0.0, jitter_ms=0.0, rate_limit=0.0, not_found_ratio=0.05, seed=1):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_limit = rate_limit
+        self.not_found_ratio = not_found_ratio
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.tokens = float(max(1, rate_limit))
+        self.last_refill = time.monotonic()
+
+        handler = type('Handler', (_Handler,), {'fake': self})
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/3"
+
+    @property
+    def image_base_url(self):
+        return f"http://127.0.0.1:{self.port}/t/p/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self):
+        with self.lock:
+            return {key: dict(value) for key, value in self.stats.items()}
+
+    def count(self, endpoint, status):
+        with self.lock:
+            per_endpoint = self.stats.setdefault(endpoint, {})
+            per_endpoint[str(status)] = per_endpoint.get(str(status), 0) + 1
+
+    def allow(self):
+        """Token-Bucket wie bei TMDB: False = diese Anfrage bekommt 429."""
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate_limit, self.tokens + (now - self.last_refill) * self.rate_limit)
+            self.last_refill = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    # --- Antworten ---
+
+    def search(self, kind, query):
+        rng = random.Random(f"{self.seed}:{kind}:{query.casefold()}")
+        if not query or rng.random() < self.not_found_ratio:
+            return {'page': 1, 'results': [], 'total_results': 0}
+        tmdb_id = stable_id(f"{kind}:{query}")
+        title_key = 'title' if kind == 'movie' else 'name'
+        result = {
+            'id': tmdb_id,
+            title_key: query.title(),
+            'overview': f"Beschreibung für {query}. " * rng.randint(2, 6),
+            'genre_ids': rng.sample(range(len(GENRES)), 2),
+            'poster_path': f"/p{tmdb_id}.jpg",
+            'backdrop_path': f"/b{tmdb_id}.jpg" if rng.random() < 0.9 else None,
+            'popularity': round(rng.random() * 100, 3),
+        }
+        return {'page': 1, 'results': [result], 'total_results': 1}
+
+    def details(self, kind, tmdb_id):
+        rng = random.Random(f"{self.seed}:{kind}:{tmdb_id}")
+        return {'id': tmdb_id, 'genres': [{'id': i, 'name': GENRES[i]} for i in rng.sample(range(len(GENRES)), 2)],
+                'overview': 'Details', 'poster_path': f"/p{tmdb_id}.jpg"}
+
+    def season(self, tmdb_id, season):
+        rng = random.Random(f"{self.seed}:season:{tmdb_id}:{season}")
+        return {'id': tmdb_id * 100 + season, 'season_number': season, 'episodes': [
+            {'episode_number': number, 'season_number': season, 'name': f"Episode {number}",
+             'overview': f"Inhalt von S{season:02d}E{number:02d}.",
+             'still_path': f"/s{tmdb_id}_{season}_{number}.jpg" if rng.random() < 0.95 else None}
+            for number in range(1, 31)
+        ]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='application/json', headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        fake = self.fake
+        url = urlparse(self.path)
+        if url.path == '/__stats':
+            return self._send(200, json.dumps(fake.snapshot()).encode())
+
+        for endpoint, pattern in ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                break
+        else:
+            fake.count('unknown', 404)
+            return self._send(404, b'{"status_code":34}')
+
+        if endpoint != 'image' and not fake.allow():
+            fake.count(endpoint, 429)
+            return self._send(429, b'{"status_code":25}', headers=[('Retry-After', '1')])
+
+        fake.delay()
+        fake.count(endpoint, 200)
+        if endpoint == 'image':
+            return self._send(200, image_bytes(int(match.group(1) or 500), match.group(2).startswith('p')),
+                              content_type='image/jpeg')
+
+        query = parse_qs(url.query)
+        if endpoint == 'search':
+            body = fake.search(match.group(1), query.get('query', [''])[0])
+        elif endpoint == 'season':
+            body = fake.season(int(match.group(1)), int(match.group(2)))
+        elif endpoint == 'genre':
+            body = {'genres': [{'id': i, 'name': name} for i, name in enumerate(GENRES)]}
+        elif endpoint == 'episode':
+            season = fake.season(int(match.group(1)), int(match.group(2)))
+            body = next((ep for ep in season['episodes'] if ep['episode_number'] == int(match.group(3))), {})
+        else:
+            body = fake.details(endpoint, int(match.group(1)))
+        return self._send(200, json.dumps(body).encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Anfragen/Sekunde, 0 = unbegrenzt')
+    parser.add_argument('--not-found', type=float, default=0.05, help='Anteil nicht gefundener Titel')
+    args = parser.parse_args()
+    fake = FakeTMDB(args.port, args.latency_ms, args.jitter_ms, args.rate_limit, args.not_found)
+    print(f"Fake-TMDB auf {fake.base_url} (Bilder: {fake.image_base_url})")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Prüft filename_parser.py gegen den beschrifteten Korpus (filename_corpus.json) und misst die
+Geschwindigkeit an vielen künstlichen Namen (library_generator.py).
+
+Genauigkeit: jeder Korpus-Eintrag nennt den Pfad unterhalb des Quellordners, Film/Serie und die
+erwarteten Felder (title, year, season, episode, episode_title; fehlende Felder werden nicht geprüft).
+Geschwindigkeit: Namen pro Sekunde ohne Zwischenspeicher (erster Scan) und mit (Index-Neuaufbau).
+
+    python benchmarks/filename_parser_bench.py --names 200000
+
+Ausgabe: JSON; Exit-Code 1, wenn ein Korpus-Eintrag falsch erkannt wurde.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from filename_parser import cache_clear, parse_media_path  # noqa: E402
+from library_generator import _title, episode_filename, movie_filename  # noqa: E402
+
+CORPUS_FILE = os.path.join(BENCH_DIR, 'filename_corpus.json')
+FIELDS = ('title', 'year', 'season', 'episode', 'episode_title')
+
+
+def check_corpus(corpus):
+    """Liste der Abweichungen: (Pfad, Feld, erwartet, erkannt)."""
+    errors = []
+    for entry in corpus:
+        parsed = parse_media_path(entry['path'].split('/'), is_tv=entry['tv'])._asdict()
+        for field in FIELDS:
+            if field in entry and parsed[field] != entry[field]:
+                errors.append((entry['path'], field, entry[field], parsed[field]))
+    return errors
+
+
+def synthetic_paths(count, seed=42):
+    """Pfade wie in der künstlichen Benchmark-Bibliothek, halb Filme, halb Episoden."""
+    rng = random.Random(seed)
+    paths = []
+    while len(paths) < count:
+        if rng.random() < 0.5:
+            paths.append(([movie_filename(rng, _title(rng), rng.randint(1950, 2025))], False))
+        else:
+            series = _title(rng, (1, 3))
+            style = rng.randrange(5)
+            season = rng.randint(1, 10)
+            folders = [series, f"Staffel {season}"] if style == 4 else [series]
+            paths.append((folders + [episode_filename(rng, series, season, rng.randint(1, 24), style)], True))
+    return paths
+
+
+def names_per_second(paths, cold):
+    if cold:
+        cache_clear()
+    started = time.perf_counter()
+    for parts, is_tv in paths:
+        parse_media_path(parts, is_tv)
+    return round(len(paths) / (time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=100000, help='Anzahl künstlicher Namen für die Zeitmessung')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    with open(CORPUS_FILE, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    cache_clear()
+    errors = check_corpus(corpus)
+
+    paths = synthetic_paths(args.names)
+    cold = max(names_per_second(paths, cold=True) for _ in range(args.rounds))
+    warm = max(names_per_second(paths, cold=False) for _ in range(args.rounds))
+
+    result = {
+        'corpus_entries': len(corpus),
+        'corpus_errors': len(errors),
+        'accuracy': round(1 - len({path for path, *_ in errors}) / len(corpus), 4) if corpus else None,
+        'names': len(paths),
+        'names_per_second_cold': cold,
+        'names_per_second_cached': warm,
+    }
+    for path, field, expected, actual in errors:
+        print(f"FALSCH {path!r}: {field} = {actual!r}, erwartet {expected!r}", file=sys.stderr)
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
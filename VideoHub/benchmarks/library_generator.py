@@ -0,0 +1,151 @@
+"""
+Erzeugt eine künstliche Video-Bibliothek für Benchmarks: Filme/ und Serie/ mit
+unordentlichen, realistischen Dateinamen (Punkte statt Leerzeichen, Release-Tags, Jahre in
+Klammern, SxxExx / 1x02 / "Staffel 2"-Ordner, Umlaute ...).
+
+Die Dateien sind sparse (nur Größe, keine Daten auf der Platte), 200k Episoden kosten
+daher nur Inodes. Gleicher Seed = gleiche Bibliothek.
+
+    python benchmarks/library_generator.py /tmp/bench_lib --movies 10000 --episodes 200000
+"""
+import argparse
+import json
+import os
+import random
+
+WORDS = (
+    'Dark Night Last Kingdom Lost City Blue Red Black White Silent Hidden Iron Golden Broken '
+    'Wild River Storm Shadow Fire Ice Winter Summer Ghost Star Moon Sun Road Home Secret '
+    'Dragon Wolf Hunter Doctor Killer Angel Devil Empire Legacy Witness Island Mountain '
+    'Brücke Straße Nächte Mörder Schatten Grüße Fluß Königin Täter Spiel Zeit Haus Wald '
+    'Amélie Café Señor Noël Rückkehr Über Anfang Ende Liebe Krieg Frieden Traum'
+).split()
+TAGS = ('1080p', '720p', '2160p', 'BluRay', 'WEB-DL', 'WEBRip', 'x264', 'x265', 'HEVC', 'German', 'DL',
+        'AC3', 'DTS', 'REMUX', 'HDR', 'German.DL', 'EXTENDED', 'UNCUT')
+GROUPS = ('GROUP', 'SPARKS', 'RARBG', 'iNTERNAL', 'TVS', 'DETAiLS', 'WvF')
+EXTENSIONS = ('.mkv', '.mkv', '.mkv', '.mp4', '.mp4', '.avi', '.webm', '.mov')
+MARKER = '.videohub_bench.json'
+
+
+def _title(rng, words=(1, 4)):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(*words)))
+
+
+def movie_filename(rng, title, year):
+    style = rng.randrange(6)
+    ext = rng.choice(EXTENSIONS)
+    if style == 0:
+        tags = '.'.join(rng.sample(TAGS, 3))
+        return f"{title.replace(' ', '.')}.{year}.{tags}-{rng.choice(GROUPS)}{ext}"
+    if style == 1:
+        return f"{title} ({year}){ext}"
+    if style == 2:
+        return f"{title} [{year}] {rng.choice(TAGS)}{ext}"
+    if style == 3:
+        return f"{title.replace(' ', '_').lower()}_{year}{ext}"
+    if style == 4:
+        return f"{title} - Director's Cut ({year}) [{rng.choice(TAGS)}]{ext}"
+    return f"{title}{ext}"
+
+
+def episode_filename(rng, series, season, episode, style):
+    ext = rng.choice(EXTENSIONS[:5])
+    episode_title = _title(rng, (1, 3))
+    if style == 0:
+        tags = '.'.join(rng.sample(TAGS, 2))
+        return f"{series.replace(' ', '.')}.S{season:02d}E{episode:02d}.{tags}-{rng.choice(GROUPS)}{ext}"
+    if style == 1:
+        return f"{series} - {season}x{episode:02d} - {episode_title}{ext}"
+    if style == 2:
+        return f"{series} - S{season:02d}E{episode:02d} - {episode_title}{ext}"
+    if style == 3:
+        return f"{series.lower().replace(' ', '_')}_s{season}e{episode}{ext}"
+    return f"Folge {episode:02d}{ext}"  # nur im Ordner "Staffel N" eindeutig
+
+
+def _touch(path, size):
+    with open(path, 'wb') as f:
+        f.truncate(size)
+
+
+def generate(root, movies=10000, episodes=200000, seed=42, size_mb=700):
+    """Legt root/Filme und root/Serie an. Gibt (Anzahl Filme, Anzahl Episoden) zurück."""
+    rng = random.Random(seed)
+    movie_root = os.path.join(root, 'Filme')
+    series_root = os.path.join(root, 'Serie')
+    os.makedirs(movie_root, exist_ok=True)
+    os.makedirs(series_root, exist_ok=True)
+    size = size_mb * 1024 * 1024
+
+    used = set()
+    created_movies = 0
+    while created_movies < movies:
+        name = movie_filename(rng, _title(rng), rng.randint(1950, 2025))
+        if name.lower() in used:
+            continue
+        used.add(name.lower())
+        # Ein Teil der Filme liegt in eigenen Unterordnern
+        if rng.random() < 0.3:
+            folder = os.path.join(movie_root, os.path.splitext(name)[0])
+            os.makedirs(folder, exist_ok=True)
+            _touch(os.path.join(folder, name), rng.randint(size // 2, size))
+        else:
+            _touch(os.path.join(movie_root, name), rng.randint(size // 2, size))
+        created_movies += 1
+
+    created_episodes = 0
+    used_series = set()
+    while created_episodes < episodes:
+        series = _title(rng, (1, 3))
+        folder_name = f"{series} ({rng.randint(1990, 2025)})" if rng.random() < 0.3 else series
+        if folder_name.lower() in used_series:
+            continue
+        used_series.add(folder_name.lower())
+        style = rng.randrange(5)
+        for season in range(1, rng.randint(1, 10) + 1):
+            if style == 4 or rng.random() < 0.3:
+                season_dir = os.path.join(series_root, folder_name, f"Staffel {season}" if style == 4 else f"Season {season:02d}")
+            else:
+                season_dir = os.path.join(series_root, folder_name)
+            os.makedirs(season_dir, exist_ok=True)
+            for episode in range(1, rng.randint(6, 24) + 1):
+                if created_episodes >= episodes:
+                    break
+                name = episode_filename(rng, series, season, episode, style)
+                _touch(os.path.join(season_dir, name), rng.randint(size // 4, size // 2))
+                created_episodes += 1
+
+    with open(os.path.join(root, MARKER), 'w', encoding='utf-8') as f:
+        json.dump({'movies': movies, 'episodes': episodes, 'seed': seed, 'size_mb': size_mb}, f)
+    return created_movies, created_episodes
+
+
+def ensure_library(root, movies, episodes, seed=42, size_mb=700):
+    """Erzeugt die Bibliothek nur, wenn root noch keine mit denselben Parametern enthält."""
+    wanted = {'movies': movies, 'episodes': episodes, 'seed': seed, 'size_mb': size_mb}
+    try:
+        with open(os.path.join(root, MARKER), 'r', encoding='utf-8') as f:
+            if json.load(f) == wanted:
+                return False
+    except (OSError, ValueError):
+        pass
+    if os.path.exists(root) and os.listdir(root):
+        raise RuntimeError(f"'{root}' ist nicht leer und keine Benchmark-Bibliothek mit diesen Parametern")
+    generate(root, movies, episodes, seed, size_mb)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root')
+    parser.add_argument('--movies', type=int, default=10000)
+    parser.add_argument('--episodes', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--size-mb', type=int, default=700, help='maximale (sparse) Dateigröße')
+    args = parser.parse_args()
+    movies, episodes = generate(args.root, args.movies, args.episodes, args.seed, args.size_mb)
+    print(json.dumps({'root': args.root, 'movies': movies, 'episodes': episodes}))
+
+
+if __name__ == '__main__':
+    main()
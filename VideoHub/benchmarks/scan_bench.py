@@ -0,0 +1,252 @@
+"""
+Misst den Bibliotheks-Scan (python video_update.py --scan) gegen eine künstliche Bibliothek
+(library_generator.py) und einen lokalen Fake-TMDB-Server (fake_tmdb.py), ohne Netzwerk.
+
+Läufe:
+- cold: leeres DATA_PATH und leerer Webroot (kein Manifest, kein TMDB-Cache, keine Bilder)
+- warm: derselbe Stand noch einmal (nichts geändert, nur Verzeichnis-Durchlauf)
+- moved: optional (--moved), alle Serienordner umbenannt und alle Filme in einen Unterordner
+  verschoben; erwartet werden keine TMDB-Anfragen und keine Bild-Downloads (danach zurück)
+- full: optional (--full-rescan), alles neu abfragen, aber mit gefülltem TMDB-Cache
+
+Je Lauf: Laufzeit, Spitzen-RSS des Scan-Prozesses, Anfragen an den Fake-Server je Endpunkt,
+Schreibzeit der Datenbank und Dauer der Scan-Phasen (Differenz von DATA_PATH/metrics/scan.json
+vor und nach dem Lauf, der Scan zählt dort über alle Läufe weiter).
+Das Ergebnis ist JSON (mit Git-Commit), --compare alt.json zeigt die Unterschiede.
+
+    python benchmarks/scan_bench.py --movies 10000 --episodes 200000 --output bench.json
+    python benchmarks/scan_bench.py --movies 500 --episodes 5000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+MOVED_SUFFIX = ' (umbenannt)'
+MOVED_DIR = 'Verschoben'
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HUB_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, HUB_DIR)
+
+from fake_tmdb import FakeTMDB  # noqa: E402
+from library_generator import ensure_library  # noqa: E402
+
+
+def run_scan(workdir, env, full_rescan=False):
+    """Startet einen Scan-Prozess. Rückgabe: (Sekunden, Spitzen-RSS in MB oder None, Exit-Code)."""
+    command = [sys.executable, os.path.join(HUB_DIR, 'video_update.py'), '--scan']
+    if full_rescan:
+        command.append('--full')
+    started = time.perf_counter()
+    # cwd ist ein leeres Arbeitsverzeichnis, damit keine .env die Benchmark-Pfade überschreibt
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss: Linux in KB, macOS in Bytes
+        peak = usage.ru_maxrss / 1024 if sys.platform != 'darwin' else usage.ru_maxrss / 1024 / 1024
+    else:
+        process.wait()
+        peak = None
+    seconds = time.perf_counter() - started
+    return seconds, (round(peak, 1) if peak is not None else None), process.returncode
+
+
+def move_library(library, undo=False):
+    """Benennt die Serienordner um und schiebt die Filme nach Filme/Verschoben (undo: zurück)."""
+    series_root = os.path.join(library, 'Serie')
+    for name in os.listdir(series_root):
+        if undo and name.endswith(MOVED_SUFFIX):
+            os.rename(os.path.join(series_root, name), os.path.join(series_root, name[:-len(MOVED_SUFFIX)]))
+        elif not undo and not name.endswith(MOVED_SUFFIX):
+            os.rename(os.path.join(series_root, name), os.path.join(series_root, name + MOVED_SUFFIX))
+    movie_root = os.path.join(library, 'Filme')
+    moved_root = os.path.join(movie_root, MOVED_DIR)
+    if undo:
+        for name in os.listdir(moved_root):
+            os.rename(os.path.join(moved_root, name), os.path.join(movie_root, name))
+        os.rmdir(moved_root)
+    else:
+        os.makedirs(moved_root)
+        for name in os.listdir(movie_root):
+            if name != MOVED_DIR:
+                os.rename(os.path.join(movie_root, name), os.path.join(moved_root, name))
+
+
+def load_scan_metrics(data_dir):
+    try:
+        with open(os.path.join(data_dir, 'metrics', 'scan.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def metric_values(snapshot, name):
+    metric = snapshot.get('metrics', {}).get(name)
+    if not metric:
+        return {}
+    return {'/'.join(labels) or 'total': value for labels, value in metric['values']}
+
+
+def histogram_sums(before, after, name):
+    """{Label-Wert: Summe in Sekunden} eines Histogramms, nur was zwischen den Schnappschüssen dazukam."""
+    previous = metric_values(before, name)
+    return {label: round(value[1] - (previous[label][1] if label in previous else 0), 3)
+            for label, value in metric_values(after, name).items()
+            if value[2] > (previous[label][2] if label in previous else 0)}
+
+
+def counter_diff(before, after, name):
+    previous = metric_values(before, name)
+    diff = {label: value - previous.get(label, 0) for label, value in metric_values(after, name).items()}
+    return {label: delta for label, delta in diff.items() if delta}
+
+
+def request_diff(before, after):
+    diff = {}
+    for endpoint, codes in after.items():
+        for code, count in codes.items():
+            delta = count - before.get(endpoint, {}).get(code, 0)
+            if delta:
+                diff[f"{endpoint}/{code}"] = delta
+    return diff
+
+
+def measure(name, workdir, env, fake, data_dir, full_rescan=False):
+    from scan_state import ScanState
+
+    requests_before = fake.snapshot()
+    metrics_before = load_scan_metrics(data_dir)
+    seconds, peak_rss, exit_code = run_scan(workdir, env, full_rescan)
+    metrics_after = load_scan_metrics(data_dir)
+    requests = request_diff(requests_before, fake.snapshot())
+    state = ScanState(data_dir)
+    return {
+        'run': name,
+        'status': state.status(),
+        'exit_code': exit_code,
+        'wall_seconds': round(seconds, 3),
+        'peak_rss_mb': peak_rss,
+        'tmdb_requests': sum(count for key, count in requests.items() if not key.startswith('image/')),
+        'image_requests': sum(count for key, count in requests.items() if key.startswith('image/')),
+        'requests': requests,
+        'db_write_seconds': histogram_sums(metrics_before, metrics_after, 'videohub_db_write_duration_seconds'),
+        'phase_seconds': histogram_sums(metrics_before, metrics_after, 'videohub_scan_phase_duration_seconds'),
+        'files': counter_diff(metrics_before, metrics_after, 'videohub_scan_files_total'),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HUB_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """Gibt je Lauf die Veränderung von Laufzeit, RSS, Anfragen und DB-Schreibzeit aus."""
+    old_runs = {run['run']: run for run in old.get('runs', [])}
+    print(f"Vergleich {old.get('commit')} -> {new.get('commit')}")
+    for run in new['runs']:
+        previous = old_runs.get(run['run'])
+        if previous is None:
+            continue
+        print(f"  {run['run']}:")
+        for key in ('wall_seconds', 'peak_rss_mb', 'tmdb_requests', 'image_requests'):
+            a, b = previous.get(key), run.get(key)
+            if a is None or b is None:
+                continue
+            change = f" ({(b - a) / a * 100:+.1f}%)" if a else ''
+            print(f"    {key:16} {a:>10} -> {b:>10}{change}")
+        a = sum(previous.get('db_write_seconds', {}).values())
+        b = sum(run.get('db_write_seconds', {}).values())
+        print(f"    {'db_write_seconds':16} {a:>10.3f} -> {b:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--library', help='Ordner der künstlichen Bibliothek (wird wiederverwendet)')
+    parser.add_argument('--movies', type=int, default=10000)
+    parser.add_argument('--episodes', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency-ms', type=float, default=30.0, help='Antwortzeit des Fake-Servers')
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--server-rate-limit', type=float, default=0.0,
+                        help='Rate-Limit des Fake-Servers (Anfragen/Sekunde), 0 = unbegrenzt')
+    parser.add_argument('--moved', action='store_true', help='zusätzlich einen Lauf nach Umbenennen/Verschieben messen')
+    parser.add_argument('--full-rescan', action='store_true', help='zusätzlich einen --full Lauf messen')
+    parser.add_argument('--keep', action='store_true', help='Arbeitsverzeichnis nicht löschen')
+    parser.add_argument('--output', help='Ergebnis zusätzlich in diese Datei schreiben')
+    parser.add_argument('--compare', help='früheres Ergebnis (JSON) zum Vergleich')
+    args = parser.parse_args()
+
+    library = args.library or os.path.join(tempfile.gettempdir(), f'videohub_bench_lib_{args.movies}_{args.episodes}_{args.seed}')
+    generate_started = time.perf_counter()
+    generated = ensure_library(library, args.movies, args.episodes, args.seed)
+    if generated:
+        print(f"Bibliothek erzeugt in {time.perf_counter() - generate_started:.1f}s: {library}", file=sys.stderr)
+
+    workdir = tempfile.mkdtemp(prefix='videohub_scan_bench_')
+    data_dir = os.path.join(workdir, 'data')
+    www_dir = os.path.join(workdir, 'www')
+    os.makedirs(www_dir)
+    fake = FakeTMDB(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_limit=args.server_rate_limit).start()
+    env = dict(os.environ,
+               APACHE_PATH=www_dir,
+               DATA_PATH=data_dir,
+               FILME_PATH=os.path.join(library, 'Filme'),
+               SERIEN_PATH=os.path.join(library, 'Serie'),
+               TMDB_API_KEY='bench',
+               TMDB_BASE_URL=fake.base_url,
+               TMDB_IMAGE_BASE_URL=fake.image_base_url,
+               TMDB_CACHE_DIR=data_dir,
+               TMDB_OFFLINE='0')
+    env.pop('METADATA_DB', None)
+
+    runs = []
+    try:
+        for name, full_rescan in (('cold', False), ('warm', False)):
+            print(f"Lauf '{name}' ...", file=sys.stderr)
+            runs.append(measure(name, workdir, env, fake, data_dir, full_rescan))
+        if args.moved:
+            print("Lauf 'moved' ...", file=sys.stderr)
+            move_library(library)
+            try:
+                runs.append(measure('moved', workdir, env, fake, data_dir))
+            finally:
+                move_library(library, undo=True)
+        if args.full_rescan:
+            print("Lauf 'full' ...", file=sys.stderr)
+            runs.append(measure('full', workdir, env, fake, data_dir, True))
+    finally:
+        fake.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'library': {'movies': args.movies, 'episodes': args.episodes, 'seed': args.seed},
+        'server': {'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'rate_limit': args.server_rate_limit},
+        'runs': runs,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Vergleicht die Video-Auslieferung über send_from_directory (alt) mit video_stream.send_video (neu).
+
+Startet für jede Variante einen eigenen Server-Prozess (gunicorn mit gthread, falls installiert,
+sonst der Werkzeug-Server), simuliert Spulen im Player (zufällige Range-Anfragen) plus einige
+komplette Downloads und misst Durchsatz sowie die CPU-Zeit des Server-Prozesses.
+
+    python benchmarks/video_stream_bench.py --size-mb 256 --seeks 200 --clients 4
+
+Ausgabe: JSON mit MB/s und CPU-Sekunden je GB ausgelieferter Daten.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+try:
+    import resource  # nur Unix, unter Windows wird keine CPU-Zeit gemessen
+except ImportError:
+    resource = None
+
+HUB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+VIDEO_NAME = 'bench video.mp4'
+
+
+def create_app(video_dir):
+    sys.path.insert(0, HUB_DIR)
+    from flask import Flask, send_from_directory
+    from video_stream import send_video
+
+    app = Flask(__name__)
+
+    @app.route('/old/<path:filename>')
+    def old(filename):
+        return send_from_directory(video_dir, filename)
+
+    @app.route('/new/<path:filename>')
+    def new(filename):
+        return send_video(video_dir, filename)
+
+    return app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(video_dir, port, server):
+    env = dict(os.environ, BENCH_VIDEO_DIR=video_dir)
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-k', 'gthread', '--threads', '8', '-w', '1',
+                   '-b', f'127.0.0.1:{port}', '--chdir', os.path.dirname(os.path.abspath(__file__)),
+                   'video_stream_bench:wsgi_app()']
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--serve', str(port)]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server startet nicht")
+
+
+def wsgi_app():
+    return create_app(os.environ['BENCH_VIDEO_DIR'])
+
+
+def run_load(base_url, size, seeks, chunk, clients, full_downloads):
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=clients))
+    rng = random.Random(42)
+    jobs = [None] * full_downloads
+    for _ in range(seeks):
+        start = rng.randrange(0, max(1, size - chunk))
+        jobs.append((start, start + chunk - 1))
+
+    def fetch(job):
+        headers = {'Range': f'bytes={job[0]}-{job[1]}'} if job else {}
+        received = 0
+        with session.get(base_url, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            for block in response.iter_content(256 * 1024):
+                received += len(block)
+        return received
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        total = sum(pool.map(fetch, jobs))
+    return total, time.perf_counter() - started
+
+
+def children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--seeks', type=int, default=200)
+    parser.add_argument('--chunk-mb', type=float, default=2.0)
+    parser.add_argument('--full', type=int, default=2, help='Anzahl kompletter Downloads')
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'werkzeug'), default='auto')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        from werkzeug.serving import run_simple
+        run_simple('127.0.0.1', args.serve, wsgi_app(), threaded=True)
+        return
+
+    server = args.server
+    if server == 'auto':
+        server = 'gunicorn' if _has_module('gunicorn') else 'werkzeug'
+
+    video_dir = tempfile.mkdtemp(prefix='videohub_bench_')
+    size = args.size_mb * 1024 * 1024
+    block = os.urandom(1024 * 1024)
+    with open(os.path.join(video_dir, VIDEO_NAME), 'wb') as f:
+        for _ in range(args.size_mb):
+            f.write(block)
+
+    results = {'server': server, 'size_mb': args.size_mb, 'seeks': args.seeks, 'clients': args.clients}
+    try:
+        for variant in ('old', 'new'):
+            port = free_port()
+            cpu_before = children_cpu()
+            process = start_server(video_dir, port, server)
+            try:
+                url = f'http://127.0.0.1:{port}/{variant}/{requests.utils.quote(VIDEO_NAME)}'
+                total, seconds = run_load(url, size, args.seeks, int(args.chunk_mb * 1024 * 1024),
+                                          args.clients, args.full)
+            finally:
+                process.terminate()
+                process.wait()
+            cpu = children_cpu() - cpu_before
+            results[variant] = {
+                'bytes': total,
+                'seconds': round(seconds, 3),
+                'mb_per_s': round(total / seconds / 1024 / 1024, 1),
+                'server_cpu_s': round(cpu, 3),
+                'cpu_s_per_gb': round(cpu / (total / 1024 ** 3), 3) if total else None,
+            }
+    finally:
+        shutil.rmtree(video_dir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+
+
+def _has_module(name):
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Beobachtet die Video-Ordner und meldet geänderte Pfade (für python video_update.py --watch).
+
+- InotifyWatcher: inotify über ctypes (nur Linux), rekursiv; neue Unterordner werden
+  automatisch mit überwacht.
+- PollingWatcher: vergleicht in festen Abständen Größe und mtime aller Videodateien. Für
+  Netzlaufwerke (NFS/SMB/sshfs), deren Änderungen inotify nicht sieht.
+- ChangeBatcher: fasst Ereignisse zusammen (Debounce) und gibt eine Datei erst frei, wenn eine
+  Weile keine Ereignisse mehr kamen und sich Größe und mtime nicht mehr ändern (z.B. während
+  eine große Datei noch kopiert wird).
+
+Alle Watcher liefern über poll(timeout) eine Menge absoluter Pfade (Dateien oder Ordner), die
+sich geändert haben könnten, auch gelöschte. Was daraus folgt, entscheidet der Aufrufer.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+from image_downloader import console_log
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct('iIII')
+
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', 'sshfs', '9p', 'davfs', 'fuse.rclone'}
+
+
+def filesystem_type(path):
+    """Dateisystem-Typ des Mountpoints, unter dem path liegt (aus /proc/mounts), sonst None."""
+    try:
+        with open('/proc/mounts', 'r', encoding='utf-8') as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, best_type = '', None
+    for mount_point, fs_type in mounts:
+        mount_point = mount_point.replace('\\040', ' ')
+        if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type
+
+
+def inotify_available():
+    return sys.platform.startswith('linux') and _libc() is not None
+
+
+def _libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class InotifyWatcher:
+    def __init__(self, roots, extensions, log=console_log):
+        self.extensions = tuple(extensions)
+        self.log = log
+        self.libc = _libc()
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fehlgeschlagen")
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.watches = {}  # Watch-Deskriptor -> Ordner
+        for root in self.roots:
+            self._watch_tree(root)
+
+    def _watch_tree(self, top):
+        """Überwacht top und alle Unterordner. Gibt die Anzahl neuer Watches zurück."""
+        added = 0
+        pending = [top]
+        while pending:
+            directory = pending.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(error, "Zu viele inotify-Watches (fs.inotify.max_user_watches erhöhen)")
+                continue  # Ordner schon wieder weg oder nicht lesbar
+            self.watches[wd] = directory
+            added += 1
+            try:
+                with os.scandir(directory) as entries:
+                    pending.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+        return added
+
+    def poll(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+                name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+                offset += EVENT_HEADER.size + length
+                self._handle(wd, mask, os.fsdecode(name), changed)
+        return changed
+
+    def _handle(self, wd, mask, name, changed):
+        if mask & IN_Q_OVERFLOW:
+            # Ereignisse verloren: die Wurzeln komplett abgleichen lassen
+            self.log("inotify-Warteschlange übergelaufen, gleiche alle Ordner ab.")
+            changed.update(self.roots)
+            return
+        directory = self.watches.get(wd)
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return
+        if directory is None:
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            changed.add(directory)
+            return
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path)
+            if mask & (IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE):
+                changed.add(path)
+        elif name.lower().endswith(self.extensions):
+            changed.add(path)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, roots, extensions, interval=30, log=console_log):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.extensions = tuple(extensions)
+        self.interval = interval
+        self.log = log
+        self.snapshot = self._take_snapshot()
+        self.next_check = time.monotonic() + interval
+
+    def _take_snapshot(self):
+        """{Pfad: (Größe, mtime_ns)} aller Videodateien (nur stat, kein Lesen der Dateien)."""
+        snapshot = {}
+        for root in self.roots:
+            pending = [root]
+            while pending:
+                directory = pending.pop()
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    pending.append(entry.path)
+                                elif entry.name.lower().endswith(self.extensions):
+                                    stat = entry.stat()
+                                    snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                            except OSError:
+                                pass
+                except OSError:
+                    pass
+        return snapshot
+
+    def poll(self, timeout):
+        wait = self.next_check - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        if wait > 0:
+            time.sleep(wait)
+        self.next_check = time.monotonic() + self.interval
+        current = self._take_snapshot()
+        previous, self.snapshot = self.snapshot, current
+        changed = {path for path, state in current.items() if previous.get(path) != state}
+        changed.update(path for path in previous if path not in current)
+        return changed
+
+    def close(self):
+        pass
+
+
+class ChangeBatcher:
+    """
+    Sammelt gemeldete Pfade. Ein Pfad ist fertig, wenn seit quiet_seconds kein Ereignis mehr
+    kam und sich sein Zustand (Größe/mtime bzw. "existiert nicht") seit der letzten Prüfung
+    nicht geändert hat. Sonst wird er erneut zurückgestellt.
+    """
+
+    def __init__(self, quiet_seconds=5.0):
+        self.quiet_seconds = quiet_seconds
+        self.pending = {}  # Pfad -> (Zeitpunkt des letzten Ereignisses, zuletzt gesehener Zustand)
+
+    def __len__(self):
+        return len(self.pending)
+
+    @staticmethod
+    def _state(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns) if not os.path.isdir(path) else 'dir'
+
+    def add(self, paths, now=None):
+        now = time.monotonic() if now is None else now
+        for path in paths:
+            self.pending[path] = (now, self._state(path))
+
+    def ready(self, now=None):
+        """Entnimmt und liefert alle Pfade, die sich beruhigt haben."""
+        now = time.monotonic() if now is None else now
+        done = []
+        for path, (last_event, last_state) in list(self.pending.items()):
+            if now - last_event < self.quiet_seconds:
+                continue
+            state = self._state(path)
+            if state != last_state:
+                # Datei wächst noch (Kopie läuft): noch eine Runde warten
+                self.pending[path] = (now, state)
+                continue
+            done.append(path)
+            del self.pending[path]
+        return done
+
+    def restore(self, paths, now=None):
+        """Pfade zurückstellen, die gerade nicht verarbeitet werden konnten."""
+        now = time.monotonic() if now is None else now
+        for path in paths:
+            self.pending.setdefault(path, (now, self._state(path)))
@@ -0,0 +1,380 @@
+"""
+HLS-Auslieferung für Videos, die der Browser nicht direkt abspielen kann (HEVC, AC3/DTS, AVI, ...).
+
+- Die Playlist steht sofort: Dauer und Codecs kommen einmal je Datei von ffprobe (media_probe.py,
+  gemerkt als probe.json im Cache-Ordner), die Segmente haben feste Längen (segment_seconds).
+- Segmente entstehen erst auf Anfrage: ein ffmpeg-Job startet beim angefragten Segment (-ss vor
+  -i, also ab dem Keyframe davor statt ab Dateianfang) und schreibt ab dort fortlaufend Segmente
+  in den Cache. Liegt ein angefragtes Segment weit vor oder hinter dem laufenden Job (Spulen),
+  wird der Job beendet und an der neuen Stelle neu gestartet. Ein Job je Datei.
+- H.264-Video wird nur umverpackt (Remux), alles andere nach H.264 transkodiert; Ton wird zu AAC,
+  sofern er es nicht schon ist. Beim Remux liegen die Segmentgrenzen auf den Keyframes der Datei,
+  die Längen weichen dann etwas von der Playlist ab (hls.js und Safari kommen damit zurecht).
+- ffmpeg schreibt jedes Segment erst als .tmp und benennt es fertig um (-hls_flags temp_file):
+  was im Cache liegt, ist vollständig und kann sofort an alle Zuschauer gehen.
+- Höchstens max_jobs ffmpeg-Prozesse gleichzeitig, über alle gunicorn-Worker hinweg (Sperrdateien
+  wie beim Scan, siehe ScanLock). Sind alle belegt, gibt es 503 mit Retry-After. Ein Job, dessen
+  Segmente idle_seconds lang niemand abgerufen hat, beendet sich und gibt seinen Platz frei.
+- Größenlimit: nach jedem Job werden die am längsten nicht abgerufenen Dateien (ganze Ordner)
+  gelöscht, bis der Cache wieder unter max_bytes liegt.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+
+from flask import Response, abort, send_file
+
+import metrics
+from image_downloader import console_log
+from media_probe import audio_codec, probe_file
+from scan_state import ScanLock
+
+FORMAT_VERSION = 2
+SEGMENT_NAME = 'seg_{:05d}.ts'
+PROBE_NAME = 'probe.json'
+JOB_NAME = 'job.json'
+JOB_LOCK_NAME = 'job.lock'
+LAST_USED_NAME = 'last_used'
+FFMPEG_LOG_NAME = 'ffmpeg.log'
+SLOTS_DIR = 'slots'
+# Segmente, die ein laufender Job noch "bald" liefert; alles weiter weg startet ihn neu
+LOOKAHEAD_SEGMENTS = 3
+# So lange wartet eine Segment-Anfrage auf ffmpeg, bevor sie mit 504 aufgibt
+WAIT_SECONDS = 30
+POLL_SECONDS = 0.2
+# So lange wartet ein neuer Job, bis ein beendeter Vorgänger seine Sperre freigegeben hat
+HANDOVER_SECONDS = 5
+# ffmpeg beendet sich auf SIGTERM sauber mit 255; ohne Signal-Handler bleibt -SIGTERM
+STOPPED_RETURNCODES = (0, 255, -signal.SIGTERM, signal.SIGTERM)
+# Grobe Zeitstempel mancher Dateisysteme: so viel älter darf ein gerade geschriebenes Segment wirken
+MTIME_SLACK_SECONDS = 2
+COPY_VIDEO_CODECS = ('h264',)
+COPY_AUDIO_CODECS = ('aac',)
+X264_PRESET = 'veryfast'
+X264_CRF = '23'
+AUDIO_BITRATE = '192k'
+
+HLS_SEGMENTS = metrics.Counter('videohub_hls_segments_total', 'HLS-Segment-Anfragen nach Ergebnis (cached, transcoded, busy, timeout)', ('result',))
+HLS_JOBS = metrics.Counter('videohub_hls_jobs_total', 'Gestartete ffmpeg-Jobs nach Modus', ('mode',))
+HLS_JOBS_ACTIVE = metrics.Gauge('videohub_hls_jobs_active', 'Gerade laufende ffmpeg-Jobs')
+HLS_CACHE_EVICTED = metrics.Counter('videohub_hls_cache_evicted_bytes_total', 'Wegen des Größenlimits gelöschte HLS-Bytes')
+
+
+class HLSBusy(Exception):
+    """Alle Plätze für ffmpeg-Jobs sind belegt."""
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _tree_size(directory):
+    total = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                total += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass
+    return total
+
+
+class HLSStreamer:
+    def __init__(self, cache_dir, max_bytes=0, max_jobs=2, segment_seconds=6.0, idle_seconds=60.0,
+                 ffmpeg='ffmpeg', ffprobe='ffprobe', log=console_log):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_jobs = max(1, max_jobs)
+        self.segment_seconds = segment_seconds
+        self.idle_seconds = idle_seconds
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.log = log
+        self.start_lock = threading.Lock()
+
+    # --- Anfragen ---
+
+    def playlist(self, path):
+        """VOD-Playlist mit allen Segmenten einer Videodatei (Segment-URLs relativ zur Playlist)."""
+        directory, info = self._open(path)
+        duration = info['duration']
+        target = math.ceil(self.segment_seconds * (2 if self._mode(info)[0] == 'copy' else 1))
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-PLAYLIST-TYPE:VOD',
+                 f'#EXT-X-TARGETDURATION:{target}', '#EXT-X-MEDIA-SEQUENCE:0']
+        for index in range(self._segment_count(info)):
+            length = min(self.segment_seconds, duration - index * self.segment_seconds)
+            lines += [f'#EXTINF:{length:.3f},', SEGMENT_NAME.format(index)]
+        lines.append('#EXT-X-ENDLIST')
+        self._touch(directory)
+        return Response('\n'.join(lines) + '\n', mimetype='application/vnd.apple.mpegurl',
+                        headers={'Cache-Control': 'no-cache'})
+
+    def segment(self, path, index):
+        """Liefert ein Segment aus dem Cache; fehlt es, wird ffmpeg dafür (neu) gestartet und abgewartet."""
+        directory, info = self._open(path)
+        if not 0 <= index < self._segment_count(info):
+            abort(404)
+        self._touch(directory)
+        segment_path = os.path.join(directory, SEGMENT_NAME.format(index))
+        result = 'cached'
+        if not os.path.exists(segment_path):
+            result = 'transcoded'
+            try:
+                if not self._wait_for_segment(path, directory, info, index, segment_path):
+                    HLS_SEGMENTS.labels('timeout').inc()
+                    abort(504)
+            except HLSBusy:
+                HLS_SEGMENTS.labels('busy').inc()
+                return Response("Alle Transkodier-Plätze sind belegt.", status=503, headers={'Retry-After': '5'})
+        HLS_SEGMENTS.labels(result).inc()
+        response = send_file(segment_path, mimetype='video/mp2t', conditional=True)
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+        return response
+
+    # --- Datei, Probe, Cache-Ordner ---
+
+    def _open(self, path):
+        """(Cache-Ordner, Probe) einer Videodatei; eine geänderte Datei bekommt einen neuen Ordner."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            abort(404)
+        key = hashlib.sha1(f"{FORMAT_VERSION}|{self.segment_seconds}|{os.path.abspath(path)}|"
+                           f"{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8')).hexdigest()[:20]
+        directory = os.path.join(self.cache_dir, key)
+        os.makedirs(directory, exist_ok=True)
+        probe_path = os.path.join(directory, PROBE_NAME)
+        info = _read_json(probe_path)
+        if info is None:
+            try:
+                info = probe_file(path, self.ffprobe)
+            except (OSError, ValueError, subprocess.SubprocessError) as e:
+                self.log(f"ffprobe fehlgeschlagen für '{path}': {e}", is_error=True)
+                abort(500)
+            _write_json(probe_path, info)
+        if not info.get('duration') or not info.get('video_codec'):
+            abort(415)
+        return directory, info
+
+    def _segment_count(self, info):
+        return max(1, math.ceil(info['duration'] / self.segment_seconds - 1e-6))
+
+    def _mode(self, info):
+        """(Video, Ton): 'copy' oder 'encode'."""
+        video = 'copy' if info.get('video_codec') in COPY_VIDEO_CODECS else 'encode'
+        audio = 'copy' if audio_codec(info) in COPY_AUDIO_CODECS else 'encode'
+        return video, audio
+
+    def _touch(self, directory):
+        path = os.path.join(directory, LAST_USED_NAME)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            open(path, 'a').close()
+
+    def _last_used(self, directory):
+        try:
+            return os.stat(os.path.join(directory, LAST_USED_NAME)).st_mtime
+        except OSError:
+            return 0
+
+    # --- Jobs ---
+
+    def _running_job(self, directory):
+        """job.json des laufenden Jobs (egal in welchem Prozess) oder None."""
+        if not ScanLock(os.path.join(directory, JOB_LOCK_NAME)).is_locked():
+            return None
+        return _read_json(os.path.join(directory, JOB_NAME))
+
+    def _serves(self, job, directory, index):
+        """Liefert der laufende Job das Segment bald (ab seinem Start, höchstens LOOKAHEAD_SEGMENTS voraus)?"""
+        if job is None or index < job['start']:
+            return False
+        if index - job['start'] <= LOOKAHEAD_SEGMENTS:
+            return True
+        return any(os.path.exists(os.path.join(directory, SEGMENT_NAME.format(i)))
+                   for i in range(index - LOOKAHEAD_SEGMENTS, index))
+
+    def _wait_for_segment(self, path, directory, info, index, segment_path):
+        deadline = time.monotonic() + WAIT_SECONDS
+        started = False
+        while not os.path.exists(segment_path):
+            if time.monotonic() >= deadline:
+                return False
+            job = self._running_job(directory)
+            if not self._serves(job, directory, index):
+                if job is None and started:
+                    return False  # der eigene Job ist ohne dieses Segment zu Ende gegangen
+                self._start_job(path, directory, info, index, job)
+                started = True
+            time.sleep(POLL_SECONDS)
+        return True
+
+    def _stop_job(self, job):
+        try:
+            os.kill(job['pid'], signal.SIGTERM)
+        except (OSError, KeyError, TypeError):
+            pass
+
+    def _acquire_slot(self):
+        slots_dir = os.path.join(self.cache_dir, SLOTS_DIR)
+        os.makedirs(slots_dir, exist_ok=True)
+        for number in range(self.max_jobs):
+            slot = ScanLock(os.path.join(slots_dir, f'slot-{number}.lock'))
+            if slot.acquire(timeout=0):
+                return slot
+        return None
+
+    def _stop_idle_jobs(self):
+        """Beendet Jobs (auch anderer Prozesse), deren Segmente gerade niemand abruft. True, wenn einer beendet wurde."""
+        stopped = False
+        now = time.time()
+        for directory in self._stream_dirs():
+            if now - self._last_used(directory) >= self.idle_seconds:
+                job = self._running_job(directory)
+                if job is not None:
+                    self._stop_job(job)
+                    stopped = True
+        return stopped
+
+    def _start_job(self, path, directory, info, index, running):
+        """Startet ffmpeg ab Segment index; ein laufender Job für dieselbe Datei wird vorher beendet."""
+        with self.start_lock:
+            if running is not None:
+                self._stop_job(running)
+            job_lock = ScanLock(os.path.join(directory, JOB_LOCK_NAME))
+            if not job_lock.acquire(timeout=HANDOVER_SECONDS):
+                return  # ein anderer Prozess hat gerade selbst einen Job gestartet
+            slot = self._acquire_slot()
+            if slot is None and self._stop_idle_jobs():
+                time.sleep(1)
+                slot = self._acquire_slot()
+            if slot is None:
+                job_lock.release()
+                raise HLSBusy()
+
+            for name in os.listdir(directory):
+                if name.endswith('.tmp'):
+                    try: os.remove(os.path.join(directory, name))
+                    except OSError: pass
+            video_mode, audio_mode = self._mode(info)
+            start_time = index * self.segment_seconds
+            command = self._command(path, directory, index, start_time, video_mode, audio_mode)
+            try:
+                with open(os.path.join(directory, FFMPEG_LOG_NAME), 'wb') as log_file:
+                    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=log_file)
+            except OSError as e:
+                slot.release()
+                job_lock.release()
+                self.log(f"ffmpeg konnte nicht gestartet werden: {e}", is_error=True)
+                abort(500)
+            _write_json(os.path.join(directory, JOB_NAME), {'pid': process.pid, 'start': index, 'owner': os.getpid()})
+            HLS_JOBS.labels('remux' if video_mode == 'copy' else 'transcode').inc()
+            HLS_JOBS_ACTIVE.inc()
+            self.log(f"HLS: {'Remux' if video_mode == 'copy' else 'Transkodierung'} von '{os.path.basename(path)}' ab Segment {index}")
+            threading.Thread(target=self._watch_job, args=(process, directory, index, job_lock, slot),
+                             name='hls-job', daemon=True).start()
+
+    def _command(self, path, directory, index, start_time, video_mode, audio_mode):
+        # -copyts: Zeitstempel der Quelle behalten, damit Segmente verschiedener Jobs zusammenpassen
+        command = [self.ffmpeg, '-nostdin', '-v', 'error', '-copyts', '-ss', f'{start_time:.3f}', '-i', path,
+                   '-map', '0:v:0', '-map', '0:a:0?', '-sn', '-dn']
+        if video_mode == 'copy':
+            command += ['-c:v', 'copy']
+        else:
+            # Keyframes genau auf dem Segment-Raster der Playlist (t zählt wegen -copyts ab Dateianfang)
+            command += ['-c:v', 'libx264', '-preset', X264_PRESET, '-crf', X264_CRF, '-pix_fmt', 'yuv420p',
+                        '-force_key_frames', f'expr:gte(t,(n_forced+{index})*{self.segment_seconds})']
+        command += ['-c:a', 'copy'] if audio_mode == 'copy' else ['-c:a', 'aac', '-ac', '2', '-b:a', AUDIO_BITRATE]
+        command += ['-f', 'hls', '-hls_time', f'{self.segment_seconds}', '-hls_list_size', '0',
+                    '-hls_flags', 'temp_file', '-start_number', str(index),
+                    '-hls_segment_filename', os.path.join(directory, 'seg_%05d.ts'),
+                    os.path.join(directory, 'ffmpeg.m3u8')]
+        return command
+
+    def _watch_job(self, process, directory, index, job_lock, slot):
+        """
+        Begleitet einen Job: beendet ihn, wenn niemand mehr zuschaut oder er bei Segmenten ankommt, die
+        schon im Cache liegen (nach dem Zurückspulen), und räumt danach auf.
+        """
+        started_at = time.time() - MTIME_SLACK_SECONDS
+        next_index = index
+        try:
+            while process.poll() is None:
+                while True:
+                    try:
+                        mtime = os.stat(os.path.join(directory, SEGMENT_NAME.format(next_index))).st_mtime
+                    except OSError:
+                        break
+                    if mtime < started_at:
+                        process.terminate()
+                        break
+                    next_index += 1
+                if time.time() - self._last_used(directory) >= self.idle_seconds:
+                    process.terminate()
+                try:
+                    process.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    pass
+            if process.returncode not in STOPPED_RETURNCODES:
+                try:
+                    with open(os.path.join(directory, FFMPEG_LOG_NAME), 'r', encoding='utf-8', errors='replace') as f:
+                        detail = f.read()[-500:].strip()
+                except OSError:
+                    detail = ''
+                self.log(f"HLS: ffmpeg beendet mit Code {process.returncode}: {detail}", is_error=True)
+        finally:
+            for name in os.listdir(directory):
+                if name.endswith('.tmp') or name == JOB_NAME:
+                    try: os.remove(os.path.join(directory, name))
+                    except OSError: pass
+            HLS_JOBS_ACTIVE.dec()
+            slot.release()
+            job_lock.release()
+            try:
+                self.evict()
+            except OSError as e:
+                self.log(f"HLS: Aufräumen des Caches fehlgeschlagen: {e}", is_error=True)
+
+    # --- Cache ---
+
+    def _stream_dirs(self):
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                return [entry.path for entry in entries if entry.is_dir() and entry.name != SLOTS_DIR]
+        except FileNotFoundError:
+            return []
+
+    def evict(self):
+        """Löscht die am längsten nicht abgerufenen Dateien (ohne laufenden Job), bis der Cache unter max_bytes liegt."""
+        if not self.max_bytes:
+            return 0
+        streams = [(self._last_used(directory), directory, _tree_size(directory)) for directory in self._stream_dirs()]
+        total = sum(size for _, _, size in streams)
+        freed = 0
+        for _last_used, directory, size in sorted(streams):
+            if total - freed <= self.max_bytes:
+                break
+            if ScanLock(os.path.join(directory, JOB_LOCK_NAME)).is_locked():
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            freed += size
+        HLS_CACHE_EVICTED.inc(freed)
+        return freed
@@ -0,0 +1,175 @@
+"""
+Bild-Downloader für den VideoHub-Scan.
+
+- eine gepoolte requests.Session für alle Downloads (Keep-Alive statt neuer Verbindung je Bild)
+- begrenzter Thread-Pool, doppelte Anfragen für dieselbe Datei werden zusammengelegt
+- Download in eine .<pid>.part-Datei, Prüfung gegen Content-Length, danach atomares os.replace,
+  damit abgebrochene Downloads nie als gültiger Cache liegen bleiben
+- Einmaliger Verzeichnis-Snapshot von THUMBS_DIR beim Scan-Start: Existenzprüfungen
+  sind danach Set-Lookups statt Dateisystem-Aufrufe
+- Dateinamen kommen vom TMDB-Bildpfad (image_filename): alle Einträge mit demselben Bild
+  teilen sich eine Datei und einen Download
+"""
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+PART_SUFFIX = '.part'
+# Jüngere .part-Dateien gehören evtl. zu einem laufenden Download (z.B. im Metadaten-Editor)
+PART_GRACE_SECONDS = 3600
+DOWNLOAD_TIMEOUT = 10
+CHUNK_SIZE = 64 * 1024
+UNSAFE_NAME_CHARS = re.compile(r'[^A-Za-z0-9_-]+')
+
+IMAGE_DOWNLOADS = metrics.Counter('videohub_image_downloads_total', 'Bild-Anfragen nach Ergebnis (cached = lag schon lokal)', ('result',))
+IMAGE_BYTES = metrics.Counter('videohub_image_download_bytes_total', 'Heruntergeladene Bild-Bytes')
+IMAGE_SECONDS = metrics.Histogram('videohub_image_download_duration_seconds', 'Dauer eines Bild-Downloads')
+DOWNLOAD_CACHED = IMAGE_DOWNLOADS.labels('cached')
+DOWNLOAD_OK = IMAGE_DOWNLOADS.labels('ok')
+DOWNLOAD_ERROR = IMAGE_DOWNLOADS.labels('error')
+
+
+def image_filename(tmdb_path, kind):
+    """
+    Dateiname in THUMBS_DIR für ein TMDB-Bild ('/kqjL17yufvn.jpg', 'p' -> 'kqjL17yufvn_p.jpg').
+    kind: 'p' Poster, 'b' Backdrop, 'e' Episodenbild. TMDB vergibt für jedes neue Bild einen neuen
+    Pfad und eine vorhandene Datei wird nie überschrieben, der Inhalt unter einem Namen ändert sich
+    also nicht (deshalb dürfen Browser die Bilder unbegrenzt cachen).
+    """
+    stem = UNSAFE_NAME_CHARS.sub('_', os.path.splitext(tmdb_path.strip('/'))[0])
+    return f"{stem}_{kind}.jpg"
+
+
+def console_log(msg, is_error=False):
+    """
+    Standard-Logger der Hilfsklassen (ImageDownloader usw.) ohne Scan-Log: gleiche Signatur wie
+    log_message in video_update.py, Fehler gehen nach stderr.
+    """
+    print(msg, file=sys.stderr if is_error else sys.stdout)
+
+
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class ImageDownloader:
+    def __init__(self, thumbs_dir, web_path, workers=8, log=console_log, offline=False):
+        self.thumbs_dir = thumbs_dir
+        self.web_path = web_path
+        self.workers = workers
+        self.log = log
+        self.offline = offline
+        self.existing = set()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.pool = None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def build_index(self):
+        """Liest THUMBS_DIR einmalig ein und räumt alte, liegengebliebene .part-Dateien weg."""
+        os.makedirs(self.thumbs_dir, exist_ok=True)
+        existing = set()
+        stale_before = time.time() - PART_GRACE_SECONDS
+        with os.scandir(self.thumbs_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(PART_SUFFIX):
+                    try:
+                        if entry.stat().st_mtime < stale_before:
+                            os.remove(entry.path)
+                    except OSError: pass
+                elif entry.is_file():
+                    existing.add(entry.name)
+        with self.lock:
+            self.existing = existing
+        return len(existing)
+
+    def web_url(self, filename):
+        return os.path.join(self.web_path, filename).replace('\\', '/')
+
+    def exists(self, filename):
+        return filename in self.existing
+
+    def remember(self, filenames):
+        """Außerhalb des Downloaders angelegte Dateien (z.B. WebP/AVIF-Fassungen) in den Index aufnehmen."""
+        with self.lock:
+            self.existing.update(filenames)
+
+    def forget(self, filenames):
+        """Gelöschte Dateien (Thumbnail-GC) aus dem Index nehmen, damit sie neu geladen werden."""
+        with self.lock:
+            self.existing.difference_update(filenames)
+
+    def start(self):
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='images')
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    def submit(self, url, filename):
+        """Plant einen Download ein. Das Future liefert die Web-URL oder "" bei Fehler."""
+        if not url:
+            return _resolved("")
+        with self.lock:
+            if filename in self.existing:
+                DOWNLOAD_CACHED.inc()
+                return _resolved(self.web_url(filename))
+            if self.offline:
+                return _resolved("")
+            future = self.in_flight.get(filename)
+            if future is None:
+                self.start()
+                future = self.pool.submit(self._download, url, filename)
+                self.in_flight[filename] = future
+            return future
+
+    def _download(self, url, filename):
+        local_path = os.path.join(self.thumbs_dir, filename)
+        part_path = f"{local_path}.{os.getpid()}{PART_SUFFIX}"
+        started = time.perf_counter()
+        try:
+            self.log(f"Downloade Bild: {filename}")
+            with self.session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                expected = response.headers.get('Content-Length')
+                if response.headers.get('Content-Encoding', 'identity') != 'identity':
+                    expected = None  # Länge bezieht sich dann auf die komprimierten Bytes
+                written = 0
+                with open(part_path, 'wb') as file:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        file.write(chunk)
+                        written += len(chunk)
+            if expected is not None and written != int(expected):
+                raise IOError(f"unvollständig ({written} von {expected} Bytes)")
+            os.replace(part_path, local_path)
+            with self.lock:
+                self.existing.add(filename)
+            IMAGE_SECONDS.observe(time.perf_counter() - started)
+            IMAGE_BYTES.inc(written)
+            DOWNLOAD_OK.inc()
+            return self.web_url(filename)
+        except Exception as e:
+            DOWNLOAD_ERROR.inc()
+            self.log(f"FEHLER beim Download von {url}: {e}", is_error=True)
+            try: os.remove(part_path)
+            except OSError: pass
+            return ""
+        finally:
+            with self.lock:
+                self.in_flight.pop(filename, None)
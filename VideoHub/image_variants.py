@@ -0,0 +1,184 @@
+"""
+Verkleinerte WebP-/AVIF-Fassungen der heruntergeladenen Bilder für srcset im Frontend.
+
+Die Seiten haben bisher immer das volle JPEG geladen (Poster w500, Backdrop w1280), auch auf
+dem Handy. Nach den Downloads rechnet dieser Schritt jedes Bild in einige feste Breiten um
+(VARIANT_WIDTHS) und trägt sie neben dem Original im Eintrag ein, z.B.
+
+    poster_variants: {"webp": [[185, "thumbs/X_p.w185.webp"], [342, "thumbs/X_p.w342.webp"], ...],
+                      "avif": [...]}
+
+Das JPEG (poster_local_url usw.) bleibt als Fallback. Für Poster und Backdrops kommt ein
+Platzhalter dazu (LQIP, poster_lqip/backdrop_lqip): ein 16 Pixel breites WebP als data:-URL
+mit wenigen hundert Bytes, das die Seiten sofort malen, bis das echte Bild (lazy) geladen ist.
+
+Umgerechnet wird in einem Prozess-Pool, weil das Kodieren von WebP/AVIF rein CPU-gebunden ist,
+und nur für Bilder, deren Fassungen oder Platzhalter fehlen. Pillow ist optional: ohne Pillow
+(oder ohne AVIF-Unterstützung in Pillow) bleibt es bei den JPEGs bzw. bei WebP.
+"""
+import base64
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import metrics
+from image_downloader import console_log
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = features = None
+
+# Bild-Feld -> Feld mit seinen Fassungen
+VARIANT_FIELDS = {
+    'poster_local_url': 'poster_variants',
+    'backdrop_local_url': 'backdrop_variants',
+    'episode_still_local_url': 'episode_still_variants',
+}
+# Bild-Feld -> Feld mit dem Platzhalter (Episodenbilder sind klein genug, um ohne auszukommen)
+LQIP_FIELDS = {
+    'poster_local_url': 'poster_lqip',
+    'backdrop_local_url': 'backdrop_lqip',
+}
+LQIP_WIDTH = 16
+LQIP_QUALITY = 30
+# Breiten je Bildart (Kürzel im Dateinamen: _p Poster, _b Backdrop, _e Episodenbild)
+VARIANT_WIDTHS = {'p': (185, 342, 500), 'b': (480, 780, 1280), 'e': (300, 780)}
+FORMATS = ('avif', 'webp')
+QUALITY = {'webp': 80, 'avif': 55}
+PART_SUFFIX = '.part'
+VARIANT_NAME = re.compile(r'^(?P<stem>.+_[pbe])\.w\d+\.(?:webp|avif)$')
+SOURCE_KIND = re.compile(r'_([pbe])\.jpg$')
+
+IMAGE_VARIANTS = metrics.Counter('videohub_image_variants_total', 'Umgerechnete Bilder (WebP/AVIF-Fassungen) nach Ergebnis', ('result',))
+
+
+def variant_source(name):
+    """Dateiname des Originals zu einer Fassung ('X_p.w342.webp' -> 'X_p.jpg'), sonst None."""
+    match = VARIANT_NAME.match(name)
+    return f"{match.group('stem')}.jpg" if match else None
+
+
+def variant_urls(variants):
+    """Alle Web-URLs aus einem *_variants-Feld."""
+    return [url for entries in (variants or {}).values() for _width, url in entries]
+
+
+def lqip_data_url(image, fmt):
+    """Winziges, stark komprimiertes Vorschaubild als data:-URL (der Browser skaliert es weich hoch)."""
+    width, height = image.size
+    small = image.resize((LQIP_WIDTH, max(1, round(height * LQIP_WIDTH / width))), Image.BOX)
+    buffer = io.BytesIO()
+    small.save(buffer, format=fmt.upper(), quality=LQIP_QUALITY)
+    return f"data:image/{fmt};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def render_variants(source_path, widths, formats, lqip_format=None):
+    """
+    Läuft im Pool-Prozess: schreibt die Fassungen neben das Original und gibt
+    {Format: [(Breite, Dateiname), ...]} sowie mit lqip_format den Platzhalter unter 'lqip' zurück.
+    Kleinere Originale werden nicht hochskaliert, die größte Fassung hat dann die Originalbreite.
+    """
+    directory, filename = os.path.split(source_path)
+    stem = filename.rsplit('.', 1)[0]
+    result = {fmt: [] for fmt in formats}
+    with Image.open(source_path) as original:
+        if not formats:
+            original.draft('RGB', (LQIP_WIDTH, LQIP_WIDTH))  # nur Platzhalter: JPEG grob dekodieren genügt
+        image = original.convert('RGB')
+    if lqip_format:
+        result['lqip'] = lqip_data_url(image, lqip_format)
+    if not formats:
+        return result
+    source_width, source_height = image.size
+    for width in sorted({min(width, source_width) for width in widths}):
+        resized = image if width == source_width else image.resize(
+            (width, max(1, round(source_height * width / source_width))), Image.LANCZOS)
+        for fmt in formats:
+            name = f"{stem}.w{width}.{fmt}"
+            path = os.path.join(directory, name)
+            resized.save(path + PART_SUFFIX, format=fmt.upper(), quality=QUALITY[fmt])
+            os.replace(path + PART_SUFFIX, path)
+            result[fmt].append((width, name))
+    return result
+
+
+class VariantBuilder:
+    def __init__(self, thumbs_dir, web_path, formats=('webp',), lqip=True, workers=None, log=console_log):
+        self.thumbs_dir = thumbs_dir
+        self.web_path = web_path
+        self.requested = tuple(fmt for fmt in formats if fmt)
+        self.lqip = lqip
+        self.workers = workers
+        self.log = log
+        self._formats = None
+
+    @property
+    def formats(self):
+        """Angeforderte Formate, die Pillow hier auch schreiben kann (beim ersten Zugriff geprüft)."""
+        if self._formats is None:
+            unknown = [fmt for fmt in self.requested if fmt not in FORMATS]
+            if unknown:
+                self.log(f"Unbekannte Bildformate in IMAGE_VARIANTS ignoriert: {', '.join(unknown)}", is_error=True)
+            wanted = [fmt for fmt in FORMATS if fmt in self.requested]
+            if wanted and Image is None:
+                self.log("Pillow ist nicht installiert, es werden keine WebP/AVIF-Fassungen erzeugt.", is_error=True)
+                wanted = []
+            supported = [fmt for fmt in wanted if features.check(fmt)]
+            for fmt in wanted:
+                if fmt not in supported:
+                    self.log(f"Pillow kann hier kein {fmt.upper()} schreiben, Format wird übersprungen.", is_error=True)
+            self._formats = tuple(supported)
+        return self._formats
+
+    @property
+    def lqip_format(self):
+        """Format der Platzhalter (WebP, sonst JPEG) oder None, wenn keine erzeugt werden."""
+        if not self.lqip or Image is None:
+            return None
+        return 'webp' if features.check('webp') else 'jpeg'
+
+    @property
+    def enabled(self):
+        return bool(self.formats or self.lqip_format)
+
+    def web_url(self, filename):
+        return os.path.join(self.web_path, filename).replace('\\', '/')
+
+    def up_to_date(self, variants, exists):
+        """Passen die eingetragenen Fassungen zu den Formaten und liegen ihre Dateien noch vor?"""
+        if not variants or set(variants) != set(self.formats):
+            return False
+        return all(exists(url.rsplit('/', 1)[-1]) for url in variant_urls(variants))
+
+    def build(self, tasks):
+        """
+        tasks: [(Schlüssel, Dateiname des Originals in thumbs_dir, Fassungen?, Platzhalter?)].
+        Liefert (Schlüssel, Fassungen oder None, Platzhalter oder None) in der Reihenfolge der
+        Fertigstellung; ist das Bild nicht lesbar, sind beide None.
+        """
+        if not tasks or not self.enabled:
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {}
+            for key, filename, with_variants, with_lqip in tasks:
+                kind = SOURCE_KIND.search(filename)
+                widths = VARIANT_WIDTHS[kind.group(1)] if kind else VARIANT_WIDTHS['b']
+                future = pool.submit(render_variants, os.path.join(self.thumbs_dir, filename), widths,
+                                     self.formats if with_variants else (), self.lqip_format if with_lqip else None)
+                futures[future] = (key, filename, with_variants)
+            for future in as_completed(futures):
+                key, filename, with_variants = futures[future]
+                try:
+                    rendered = future.result()
+                except Exception as e:
+                    IMAGE_VARIANTS.labels('error').inc()
+                    self.log(f"Konnte Bild '{filename}' nicht umrechnen: {e}", is_error=True)
+                    yield key, None, None
+                    continue
+                IMAGE_VARIANTS.labels('ok').inc()
+                lqip = rendered.pop('lqip', None)
+                variants = {fmt: [[width, self.web_url(name)] for width, name in entries]
+                            for fmt, entries in rendered.items()}
+                yield key, variants if with_variants else None, lqip
@@ -0,0 +1,225 @@
+"""
+In-Memory-Index über die Metadaten-DB für die Abfrage-API (/api/movies, /api/series, /api/search).
+
+Die Seiten mussten bisher metadata.json komplett laden und Filme bzw. Serien im
+Browser filtern, sortieren und aus den Schlüsseln rekonstruieren. Der Index baut
+diese Sichten einmal auf dem Server auf und hält sie im Speicher. Neu gebaut wird
+nur, wenn sich die generation der DB geändert hat (siehe metadata_store.py); eine
+Abfrage kostet dann nur eine kleine SQL-Abfrage plus Filtern/Blättern im Speicher.
+"""
+import os
+import re
+import threading
+from urllib.parse import quote
+
+from filename_parser import parse_media_path
+from search_index import SearchIndex
+
+VIDEO_EXTENSION = re.compile(r'\.(mp4|mkv|webm|avi|mov)$', re.IGNORECASE)
+KEY_EXTENSION = re.compile(r'_([a-z0-9]{2,4})$', re.IGNORECASE)
+
+# Felder, die jede Liste immer liefert (auch bei eingeschränkter Feldauswahl)
+ALWAYS_FIELDS = ('key',)
+
+MOVIE_SORTS = {
+    'title': lambda item: item['title'].casefold(),
+    'key': lambda item: item['key'],
+}
+SERIES_SORTS = dict(MOVIE_SORTS, episodes=lambda item: item['episode_count'])
+
+
+def episode_label(filename, series_name='', folders=()):
+    """Staffel, Episode, Titel und Anzeige-Code aus dem Dateinamen (Staffel 0 = nicht erkannt, 'LOKAL')."""
+    base_title = VIDEO_EXTENSION.sub('', filename).strip()
+    parsed = parse_media_path(list(folders) + [filename], is_tv=True)
+    season, episode, title = 0, 0, ''
+    if parsed.season is not None and parsed.episode is not None:
+        season, episode, title = parsed.season, parsed.episode, parsed.episode_title
+    if season == 0 or not title:
+        title = base_title
+        if series_name and title.startswith(series_name):
+            title = title[len(series_name):].lstrip(' -').strip() or base_title
+    code = f"S{season:02d}E{episode:02d}" if season > 0 else 'LOKAL'
+    return {'season': season, 'episode': episode, 'title': title, 'code': code}
+
+
+def split_media_path(file_id, path):
+    """
+    Zerlegt den Pfad einer Datei (relativ zum Elternordner der Quelle, z.B. 'Serie/Arrow/x.mkv')
+    in seine Teile ohne den Quellordner. Ohne Manifest-Eintrag wird wie früher im Browser
+    aus der Datei-ID rekonstruiert (mehrdeutig, wenn Namen '_' enthalten).
+    """
+    if path:
+        return path.replace('\\', '/').split('/')[1:]
+    rest = file_id.split('_', 1)[1] if '_' in file_id else file_id
+    rest = KEY_EXTENSION.sub(lambda m: '.' + m.group(1), rest)
+    return rest.split('_', 1) if '_' in rest else [rest]
+
+
+def web_url(web_alias, parts):
+    return web_alias.rstrip('/') + '/' + '/'.join(quote(part) for part in parts)
+
+
+def build_views(rows, web_aliases):
+    """
+    Baut aus (file_id, media_type, data, path) die Film-Liste und die Serien-Gruppen.
+    web_aliases: {'movie': 'Videos/Filme', 'tv': 'Videos/Serie'}
+    Rückgabe: (movies, series) - movies ist eine Liste, series ein Dict {Serienordner: Serie}.
+    """
+    movies = []
+    series = {}
+
+    for file_id, media_type, data, path in rows:
+        parts = split_media_path(file_id, path)
+        if media_type == 'movie':
+            movies.append(dict(
+                data,
+                key=file_id,
+                title=data.get('title_display') or data.get('title') or os.path.splitext(parts[-1])[0],
+                url=web_url(web_aliases.get('movie', ''), parts),
+            ))
+        elif media_type == 'tv':
+            series_key = parts[0] if len(parts) > 1 else os.path.splitext(parts[0])[0]
+            label = episode_label(parts[-1], series_key, parts[:-1])
+            episode = dict(
+                data,
+                key=file_id,
+                filename=parts[-1],
+                url=web_url(web_aliases.get('tv', ''), parts),
+                season=label['season'],
+                episode=label['episode'],
+                code=label['code'],
+                episode_title=label['title'],
+            )
+            series.setdefault(series_key, []).append(episode)
+
+    return movies, {key: _series_view(key, episodes) for key, episodes in series.items()}
+
+
+def _series_view(series_key, episodes):
+    # Echte Staffeln nach Nummer, nicht erkannte ("Lokale Videos") nach Dateiname
+    episodes.sort(key=lambda e: (e['season'] == 0, e['season'], e['episode'] if e['season'] else 0, e['filename']))
+    representative = next((e for e in episodes if e['season'] > 0), episodes[0])
+
+    seasons = {}
+    for episode in episodes:
+        seasons.setdefault(episode['season'], []).append(episode)
+
+    return {
+        'key': series_key,
+        'title': series_key,
+        'tmdb_id': representative.get('tmdb_id'),
+        'overview': representative.get('overview', ''),
+        'genres': representative.get('genres') or [],
+        'not_found': bool(representative.get('not_found')),
+        'poster_local_url': representative.get('poster_local_url', ''),
+        'backdrop_local_url': representative.get('backdrop_local_url', ''),
+        'poster_variants': representative.get('poster_variants') or {},
+        'backdrop_variants': representative.get('backdrop_variants') or {},
+        'poster_lqip': representative.get('poster_lqip', ''),
+        'backdrop_lqip': representative.get('backdrop_lqip', ''),
+        'episode_count': len(episodes),
+        'season_numbers': sorted(seasons),
+        'seasons': [{'season': number, 'episodes': seasons[number]} for number in sorted(seasons)],
+    }
+
+
+def series_summary(view):
+    """Serie ohne Episodenliste (für Übersichten)."""
+    return {k: v for k, v in view.items() if k != 'seasons'}
+
+
+def search_documents(movies, series):
+    """Dokumente für den Suchindex: Filme, Serien und Episoden (Episoden auch über den Seriennamen)."""
+    for movie in movies:
+        yield {'type': 'movie', 'key': movie['key'], 'title': movie['title'], 'url': movie['url'],
+               'overview': movie.get('overview', ''), 'genres': movie.get('genres') or [],
+               'poster_local_url': movie.get('poster_local_url', ''), 'poster_variants': movie.get('poster_variants') or {},
+               'poster_lqip': movie.get('poster_lqip', '')}
+    for view in series.values():
+        yield {'type': 'series', 'key': view['key'], 'title': view['title'],
+               'overview': view['overview'], 'genres': view['genres'],
+               'poster_local_url': view['poster_local_url'], 'poster_variants': view['poster_variants'],
+               'poster_lqip': view['poster_lqip']}
+        for season in view['seasons']:
+            for episode in season['episodes']:
+                yield {'type': 'episode', 'key': episode['key'], 'series_key': view['key'],
+                       'title': episode['episode_title'], 'search_title': view['title'], 'code': episode['code'],
+                       'url': episode['url'], 'overview': episode.get('overview', ''),
+                       'episode_still_local_url': episode.get('episode_still_local_url', ''),
+                       'episode_still_variants': episode.get('episode_still_variants') or {}}
+
+
+def collect_genres(items):
+    return sorted({genre for item in items for genre in (item.get('genres') or [])}, key=str.casefold)
+
+
+def query_items(items, genres=None, sort='title', page=1, per_page=50, fields=None, sorts=MOVIE_SORTS):
+    """
+    Filtert (Genre, beliebiges der angegebenen), sortiert ('-' = absteigend), blättert und
+    projiziert eine Liste. Ungültige Parameter lösen ValueError aus.
+    """
+    descending = sort.startswith('-')
+    sort_key = sorts.get(sort.lstrip('-'))
+    if sort_key is None:
+        raise ValueError(f"Unbekannte Sortierung '{sort}' (möglich: {', '.join(sorted(sorts))})")
+    if page < 1 or per_page < 0:
+        raise ValueError("page muss >= 1 und per_page >= 0 sein")
+
+    if genres:
+        wanted = set(genres)
+        items = [item for item in items if wanted.intersection(item.get('genres') or ())]
+    items = sorted(items, key=sort_key, reverse=descending)
+
+    total = len(items)
+    if per_page:
+        items = items[(page - 1) * per_page:page * per_page]
+    if fields:
+        keep = set(fields).union(ALWAYS_FIELDS)
+        items = [{k: v for k, v in item.items() if k in keep} for item in items]
+    return total, items
+
+
+class LibraryIndex:
+    """Hält Film- und Serien-Sichten im Speicher und baut sie neu, sobald sich die DB-generation ändert."""
+
+    def __init__(self, store, web_aliases):
+        self.store = store
+        self.web_aliases = web_aliases
+        self.lock = threading.Lock()
+        self.generation = None
+        self.movies = []
+        self.series = {}
+        self.series_list = []
+        self.movie_genres = []
+        self.series_genres = []
+        self.search_lock = threading.Lock()
+        self.search_index = SearchIndex()
+        self.search_generation = None
+
+    def refresh(self):
+        """Prüft die generation und baut bei Bedarf neu. Gibt die aktuelle generation zurück."""
+        generation = self.store.generation()
+        with self.lock:
+            if generation != self.generation:
+                movies, series = build_views(self.store.media_with_paths(), self.web_aliases)
+                self.movies = movies
+                self.series = series
+                self.series_list = [series_summary(view) for view in series.values()]
+                self.movie_genres = collect_genres(movies)
+                self.series_genres = collect_genres(self.series_list)
+                self.generation = generation
+            return self.generation
+
+    def searcher(self):
+        """
+        Suchindex zum aktuellen Stand. Wird erst bei Bedarf gebaut (deutlich teurer als die
+        Listen), damit Checkpoints während eines Scans nicht jedes Mal einen Neuaufbau auslösen.
+        """
+        self.refresh()
+        with self.search_lock:
+            if self.search_generation != self.generation:
+                generation = self.generation
+                self.search_index = SearchIndex(search_documents(self.movies, self.series))
+                self.search_generation = generation
+            return self.search_index
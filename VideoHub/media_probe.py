@@ -0,0 +1,151 @@
+"""
+Technische Daten der Videodateien per ffprobe: Dauer, Auflösung, Codecs und Tonspuren mit Sprache.
+
+Der Scan ruft ffprobe im Prozess-Pool auf (MediaProber.probe_many), aber nur für Dateien, deren
+Eintrag noch keine oder veraltete Daten hat (Größe oder mtime passen nicht mehr). Das Ergebnis
+steht als media_info im Eintrag, z.B.
+
+    media_info: {"duration": 5412.3, "container": "matroska", "width": 1920, "height": 1080,
+                 "video_codec": "hevc", "audio": [{"codec": "ac3", "channels": 6, "language": "ger"}],
+                 "subtitles": ["ger", "eng"], "direct_play": false, "size": 4821..., "mtime": 1700...}
+
+metadata.json enthält media_info vollständig, die Dateien unter library/ nur duration und
+direct_play (siehe static_library.py). Damit zeigen die Seiten die Laufzeit und spielen Dateien
+mit direct_play = false gleich über HLS ab (siehe hls.py). Der Konverter in VideoTools und
+hls.py lesen die Daten hier statt ffprobe erneut zu starten.
+"""
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import metrics
+from image_downloader import console_log
+
+MEDIA_INFO_FIELD = 'media_info'
+PROBE_TIMEOUT = 120
+# Was Browser ohne Umwandlung abspielen (MKV/AVI können nicht alle, AC3/DTS/HEVC kaum einer)
+DIRECT_PLAY_CONTAINERS = ('mov', 'mp4', 'm4a', '3gp', '3g2', 'mj2')
+DIRECT_PLAY_VIDEO_CODECS = ('h264', 'vp8', 'vp9', 'av1')
+DIRECT_PLAY_AUDIO_CODECS = ('aac', 'mp3', 'opus', 'vorbis')
+# WebM ist Matroska mit eingeschränkten Codecs
+WEBM_VIDEO_CODECS = ('vp8', 'vp9', 'av1')
+WEBM_AUDIO_CODECS = ('opus', 'vorbis')
+
+MEDIA_PROBES = metrics.Counter('videohub_media_probes_total', 'ffprobe-Aufrufe des Scans nach Ergebnis', ('result',))
+
+
+def probe_file(path, ffprobe='ffprobe'):
+    """Läuft auch im Pool-Prozess: ffprobe auf eine Datei, Ergebnis als media_info (ohne size/mtime)."""
+    result = subprocess.run(
+        [ffprobe, '-v', 'error', '-show_format', '-show_streams', '-of', 'json', path],
+        capture_output=True, text=True, timeout=PROBE_TIMEOUT, check=True,
+        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+    return parse_probe(json.loads(result.stdout or '{}'))
+
+
+def parse_probe(data):
+    """Wandelt die JSON-Ausgabe von ffprobe -show_format -show_streams in media_info um."""
+    fmt = data.get('format', {})
+    streams = data.get('streams', [])
+    # Coverbilder (attached_pic) sind für ffprobe auch Videostreams
+    video = next((s for s in streams if s.get('codec_type') == 'video'
+                  and not s.get('disposition', {}).get('attached_pic')), None)
+
+    def language(stream):
+        return (stream.get('tags') or {}).get('language') or None
+
+    info = {
+        'duration': round(float(fmt.get('duration') or (video or {}).get('duration') or 0), 1),
+        'container': (fmt.get('format_name') or '').split(',')[0] or None,
+        'width': (video or {}).get('width'),
+        'height': (video or {}).get('height'),
+        'video_codec': ((video or {}).get('codec_name') or '').lower() or None,
+        'audio': [{'codec': (s.get('codec_name') or '').lower() or None,
+                   'channels': s.get('channels'),
+                   'language': language(s)}
+                  for s in streams if s.get('codec_type') == 'audio'],
+        'subtitles': [language(s) for s in streams if s.get('codec_type') == 'subtitle'],
+    }
+    info['direct_play'] = direct_play(info, fmt.get('format_name') or '', fmt.get('filename') or '')
+    return info
+
+
+def direct_play(info, format_name, filename=''):
+    """Kann ein Browser die Datei so abspielen, wie sie ist?"""
+    containers = set(format_name.split(','))
+    first_audio = audio_codec(info)
+    if 'matroska' in containers:
+        # ffprobe nennt .mkv und .webm gleich ('matroska,webm'): nur echte WebM-Dateien gehen direkt
+        if filename and os.path.splitext(filename)[1].lower() != '.webm':
+            return False
+        return (info.get('video_codec') in WEBM_VIDEO_CODECS
+                and (first_audio is None or first_audio in WEBM_AUDIO_CODECS))
+    return (bool(containers & set(DIRECT_PLAY_CONTAINERS))
+            and info.get('video_codec') in DIRECT_PLAY_VIDEO_CODECS
+            and (first_audio is None or first_audio in DIRECT_PLAY_AUDIO_CODECS))
+
+
+def audio_codec(info):
+    """Codec der ersten Tonspur (die spielen Browser, HLS und der Konverter ab) oder None."""
+    return next((track['codec'] for track in info.get('audio') or () if track.get('codec')), None)
+
+
+def is_current(info, size, mtime):
+    """Gehört media_info zum aktuellen Stand der Datei (Größe und mtime in ns wie im Scan-Manifest)?"""
+    return bool(info) and info.get('size') == size and info.get('mtime') == mtime
+
+
+def stored_media_info(store, full_path):
+    """media_info einer Datei aus der Metadaten-DB, sofern aktuell, sonst None (dann selbst ffprobe starten)."""
+    found = store.by_file_path(full_path)
+    if found is None:
+        return None
+    info = found[1].get(MEDIA_INFO_FIELD)
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return None
+    return info if is_current(info, stat.st_size, stat.st_mtime_ns) else None
+
+
+class MediaProber:
+    def __init__(self, ffprobe='ffprobe', workers=4, log=console_log):
+        self.ffprobe = ffprobe
+        self.workers = max(1, workers)
+        self.log = log
+        self._available = None
+
+    @property
+    def available(self):
+        """Ist ffprobe installiert (beim ersten Zugriff geprüft, ohne ffprobe wird der Schritt übersprungen)?"""
+        if self._available is None:
+            self._available = shutil.which(self.ffprobe) is not None
+            if not self._available:
+                self.log(f"ffprobe ('{self.ffprobe}') nicht gefunden, technische Daten der Videos werden nicht erfasst.", is_error=True)
+        return self._available
+
+    def probe_many(self, tasks):
+        """
+        tasks: [(Schlüssel, Pfad, Größe, mtime)]. Liefert (Schlüssel, media_info oder None) in der
+        Reihenfolge der Fertigstellung; media_info enthält Größe und mtime, gegen die geprüft wurde.
+        """
+        if not tasks or not self.available:
+            return
+        # ffprobe liest nur Header und Index, die Grenze schont vor allem Festplatten und Netzlaufwerke
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+            futures = {pool.submit(probe_file, path, self.ffprobe): (key, path, size, mtime)
+                       for key, path, size, mtime in tasks}
+            for future in as_completed(futures):
+                key, path, size, mtime = futures[future]
+                try:
+                    info = future.result()
+                except (OSError, ValueError, subprocess.SubprocessError) as e:
+                    MEDIA_PROBES.labels('error').inc()
+                    self.log(f"ffprobe fehlgeschlagen für '{path}': {e}", is_error=True)
+                    yield key, None
+                    continue
+                MEDIA_PROBES.labels('ok').inc()
+                info.update(size=size, mtime=mtime)
+                yield key, info
@@ -0,0 +1,325 @@
+"""
+SQLite-Speicher für die VideoHub-Metadaten (ersetzt das Komplett-Lesen/-Schreiben
+von metadata.json).
+
+Tabellen:
+- media: ein Eintrag je Datei-ID (JSON-Daten + indizierte Spalten media_type, tmdb_id)
+- files: das Scan-Manifest (Pfad, Größe, mtime, Inode und Inhalts-Fingerprint je Datei-ID)
+
+Die Datenbank läuft im WAL-Modus, damit Server, Scan und Metadaten-Editor
+gleichzeitig lesen können. metadata.json wird nur noch als Export für die
+videohub_*.html Seiten erzeugt.
+
+Jeder Commit, der tatsächlich etwas geändert hat, erhöht die "generation" in
+der meta-Tabelle. Der Export wird übersprungen, solange sich die generation
+seit dem letzten Export nicht geändert hat, und erfolgt sonst atomar über eine
+temporäre Datei, damit das Frontend nie eine halb geschriebene Datei liest.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+DB_WRITE_SECONDS = metrics.Histogram('videohub_db_write_duration_seconds', 'Dauer der Schreib-Transaktionen der Metadaten-DB', ('operation',))
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    file_id TEXT PRIMARY KEY,
+    media_type TEXT,
+    tmdb_id INTEGER,
+    not_found INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_media_tmdb_id ON media(tmdb_id);
+CREATE INDEX IF NOT EXISTS idx_media_type ON media(media_type);
+
+CREATE TABLE IF NOT EXISTS files (
+    file_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    fingerprint TEXT
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('exported_generation', -1);
+"""
+
+
+class MetadataStore:
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.path = db_path
+        self.lock = threading.RLock()
+        self.changes = 0  # Änderungen seit dem letzten Commit
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # DBs von vor dem Fingerprint ergänzen
+        if 'fingerprint' not in {row[1] for row in self.conn.execute("PRAGMA table_info(files)")}:
+            self.conn.execute("ALTER TABLE files ADD COLUMN fingerprint TEXT")
+        self.conn.commit()
+
+    # --- Einzelzugriffe ---
+
+    def get(self, file_id):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM media WHERE file_id = ?", (file_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __contains__(self, file_id):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM media WHERE file_id = ?", (file_id,)).fetchone() is not None
+
+    def put(self, file_id, data, media_type=None):
+        """Schreibt einen Eintrag (ohne Commit, siehe commit()). Unveränderte Einträge werden nicht angefasst."""
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        with self.lock:
+            old = self.conn.execute("SELECT data, media_type FROM media WHERE file_id = ?", (file_id,)).fetchone()
+            if old is not None and old[0] == body and (media_type is None or old[1] == media_type):
+                return False
+            self.conn.execute(
+                "INSERT OR REPLACE INTO media (file_id, media_type, tmdb_id, not_found, data, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (file_id, media_type if media_type is not None else (old[1] if old else None),
+                 data.get('tmdb_id'), 1 if data.get('not_found') else 0, body, time.time()))
+            self.changes += 1
+            return True
+
+    def update(self, file_id, fields):
+        """Ändert einzelne Felder eines vorhandenen Eintrags."""
+        with self.lock:
+            data = self.get(file_id)
+            if data is None:
+                return False
+            data.update(fields)
+            return self.put(file_id, data)
+
+    def rename(self, old_id, new_id):
+        """Hängt einen Eintrag an eine neue Datei-ID (umbenannte/verschobene Datei), ohne Commit."""
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE OR REPLACE media SET file_id = ?, updated = ? WHERE file_id = ?", (new_id, time.time(), old_id))
+            self.changes += cursor.rowcount
+            return cursor.rowcount > 0
+
+    def delete(self, file_ids):
+        with self.lock:
+            cursor = self.conn.executemany("DELETE FROM media WHERE file_id = ?", [(file_id,) for file_id in file_ids])
+            self.changes += max(cursor.rowcount, 0)
+
+    def commit(self):
+        """Schreibt offene Änderungen fest und erhöht dabei die generation (nur wenn sich etwas geändert hat)."""
+        with self.lock, DB_WRITE_SECONDS.labels('commit').time():
+            if self.changes:
+                self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+                self.changes = 0
+            self.conn.commit()
+
+    def generation(self):
+        with self.lock:
+            return self._meta('generation')
+
+    def _meta(self, key):
+        return self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def get_meta(self, key, default=None):
+        """Zusätzliche Zähler in der meta-Tabelle (z.B. welche generation ein Export zuletzt hatte)."""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self.conn.commit()
+
+    # --- Abfragen ---
+
+    def ids(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT file_id FROM media")]
+
+    def not_found_flags(self):
+        """{file_id: not_found} für alle Einträge, ohne die JSON-Daten zu laden."""
+        with self.lock:
+            return {file_id: bool(flag) for file_id, flag in self.conn.execute("SELECT file_id, not_found FROM media")}
+
+    def by_tmdb_id(self, tmdb_id):
+        with self.lock:
+            rows = self.conn.execute("SELECT file_id, data FROM media WHERE tmdb_id = ?", (tmdb_id,)).fetchall()
+        return [(file_id, json.loads(data)) for file_id, data in rows]
+
+    def by_media_type(self, media_type):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT file_id, data FROM media WHERE media_type = ? ORDER BY file_id", (media_type,)).fetchall()
+        return [(file_id, json.loads(data)) for file_id, data in rows]
+
+    def titles(self):
+        """(file_id, Titel) aller Einträge, sortiert nach Datei-ID (für Listenansichten)."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT file_id, COALESCE(json_extract(data, '$.title'), 'N/A') FROM media ORDER BY file_id").fetchall()
+
+    def media_with_paths(self):
+        """(file_id, media_type, Daten, Pfad laut Manifest oder None) aller Einträge, sortiert nach Datei-ID."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT m.file_id, m.media_type, m.data, f.path FROM media m "
+                "LEFT JOIN files f ON f.file_id = m.file_id ORDER BY m.file_id").fetchall()
+        return [(file_id, media_type, json.loads(data), path) for file_id, media_type, data, path in rows]
+
+    def image_urls(self, fields):
+        """(file_id, Feld, Wert) der angegebenen Bild-Felder aller Einträge (nur nicht-leere Werte)."""
+        return self.field_values(fields)
+
+    def field_values(self, fields):
+        """(file_id, Feld, Wert) der angegebenen Felder aller Einträge (nur nicht-leere Werte, Objekte als JSON-Text)."""
+        columns = ', '.join(f"json_extract(data, '$.{field}')" for field in fields)
+        with self.lock:
+            rows = self.conn.execute(f"SELECT file_id, {columns} FROM media").fetchall()
+        return [(row[0], field, value) for row in rows for field, value in zip(fields, row[1:]) if value]
+
+    def by_file_path(self, full_path):
+        """
+        (file_id, Daten) der Datei unter einem absoluten Pfad oder None. Das Manifest kennt nur den Pfad
+        ab dem Elternordner der Quelle ('Filme/x.mkv'), deshalb zählt der passende Pfad-Schluss.
+        """
+        full_path = os.path.normcase(os.path.abspath(full_path))
+        name = os.path.basename(full_path)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT f.path, m.file_id, m.data FROM files f JOIN media m ON m.file_id = f.file_id "
+                "WHERE f.path LIKE ? ESCAPE '\\'",
+                ('%' + name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'),)).fetchall()
+        for path, file_id, data in rows:
+            if full_path.endswith(os.sep + os.path.normcase(os.path.normpath(path))):
+                return file_id, json.loads(data)
+        return None
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    # --- Scan-Manifest ---
+
+    def load_manifest(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT file_id, path, size, mtime, inode, fingerprint FROM files").fetchall()
+        return {file_id: {'path': path, 'size': size, 'mtime': mtime, 'inode': inode, 'fingerprint': fingerprint}
+                for file_id, path, size, mtime, inode, fingerprint in rows}
+
+    def manifest_entry(self, file_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT path, size, mtime, inode, fingerprint FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        return None if row is None else dict(zip(('path', 'size', 'mtime', 'inode', 'fingerprint'), row))
+
+    def manifest_ids_under(self, path):
+        """Datei-IDs, deren Manifest-Pfad gleich path ist oder darunter liegt (gelöschte Ordner)."""
+        prefix = path.rstrip('/\\')
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT file_id FROM files WHERE path = ? OR substr(path, 1, ?) IN (?, ?)",
+                (prefix, len(prefix) + 1, prefix + '/', prefix + '\\')).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_manifest(self, file_ids):
+        with self.lock:
+            self.conn.executemany("DELETE FROM files WHERE file_id = ?", [(file_id,) for file_id in file_ids])
+            self.conn.commit()
+
+    def upsert_manifest(self, entries):
+        """Ergänzt/aktualisiert einzelne Manifest-Einträge (für Checkpoints während des Scans)."""
+        with self.lock, DB_WRITE_SECONDS.labels('manifest').time():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (file_id, path, size, mtime, inode, fingerprint) VALUES (?, ?, ?, ?, ?, ?)",
+                [(file_id, sig['path'], sig['size'], sig['mtime'], sig['inode'], sig.get('fingerprint'))
+                 for file_id, sig in entries.items()])
+            self.conn.commit()
+
+    def save_manifest(self, manifest):
+        """Ersetzt das Manifest vollständig (eine Transaktion)."""
+        with self.lock, DB_WRITE_SECONDS.labels('manifest').time():
+            self.conn.execute("DELETE FROM files")
+            self.conn.executemany(
+                "INSERT INTO files (file_id, path, size, mtime, inode, fingerprint) VALUES (?, ?, ?, ?, ?, ?)",
+                [(file_id, sig['path'], sig['size'], sig['mtime'], sig['inode'], sig.get('fingerprint'))
+                 for file_id, sig in manifest.items()])
+            self.conn.commit()
+
+    # --- Import / Export ---
+
+    def import_json(self, json_path, media_type_for):
+        """Übernimmt eine bestehende metadata.json (einmalige Migration)."""
+        with open(json_path, 'r', encoding='utf-8') as f:
+            db = json.load(f)
+        with self.lock:
+            for file_id, data in db.items():
+                self.put(file_id, data, media_type=media_type_for(file_id))
+            self.conn.commit()
+        return len(db)
+
+    def assign_missing_media_types(self, media_type_for):
+        """Ergänzt media_type bei Einträgen, die ohne Typ importiert wurden (z.B. vom Editor)."""
+        with self.lock:
+            rows = self.conn.execute("SELECT file_id FROM media WHERE media_type IS NULL").fetchall()
+            updates = [(media_type_for(file_id), file_id) for (file_id,) in rows]
+            self.conn.executemany("UPDATE media SET media_type = ? WHERE file_id = ?",
+                                  [u for u in updates if u[0] is not None])
+            self.conn.commit()
+
+    def export_json(self, json_path, force=False):
+        """
+        Schreibt metadata.json zeilenweise aus der DB, ohne alles im Speicher zu halten.
+        Übersprungen, wenn sich seit dem letzten Export nichts geändert hat. Gibt True zurück, wenn geschrieben wurde.
+        """
+        with self.lock:
+            self.commit()
+            generation = self._meta('generation')
+            if not force and generation == self._meta('exported_generation') and os.path.exists(json_path):
+                return False
+
+            tmp_path = f"{json_path}.{os.getpid()}.tmp"
+            rows = self.conn.execute("SELECT file_id, data FROM media ORDER BY file_id")
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write('{')
+                    first = True
+                    for file_id, data in rows:
+                        f.write('\n' if first else ',\n')
+                        f.write(json.dumps(file_id, ensure_ascii=False))
+                        f.write(':')
+                        f.write(data)
+                        first = False
+                    f.write('\n}\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, json_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            self.conn.execute("UPDATE meta SET value = ? WHERE key = 'exported_generation'", (generation,))
+            self.conn.commit()
+            return True
+
+
+def default_db_path():
+    """Pfad der Metadaten-DB aus METADATA_DB bzw. DATA_PATH (nach load_dotenv aufrufen)."""
+    data_dir = os.getenv("DATA_PATH") or DEFAULT_DATA_DIR
+    return os.getenv("METADATA_DB") or os.path.join(data_dir, 'metadata.sqlite')
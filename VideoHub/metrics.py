@@ -0,0 +1,330 @@
+"""
+Zähler, Gauges und Histogramme im Prometheus-Textformat (/metrics), ohne Zusatzpaket.
+
+Jeder Prozess (gunicorn-Worker, Scan-Prozess, Watcher) sammelt im Speicher; ein Wert
+erhöhen kostet ein Lock und eine Addition. Damit /metrics auch die Zahlen der anderen
+Prozesse zeigt, schreibt jeder Prozess alle FLUSH_SECONDS (und beim Beenden) einen
+Schnappschuss nach <Verzeichnis>/<name>.json. /metrics summiert die Schnappschüsse.
+Dateien beendeter Web-Worker werden verworfen (ihre Zähler fangen dann neu an, was
+Prometheus als Reset erkennt). Scan, Watcher, --thumbs-gc und --probe-all laufen als
+einzelne Prozesse nacheinander unter festem Namen; sie übernehmen beim Start die Werte aus
+ihrer Datei (configure mit resume=True) und zählen weiter, statt sie mit jedem Lauf auf 0
+zurückzusetzen.
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+FLUSH_SECONDS = 10
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        REGISTRY.register(self)
+
+    def labels(self, *values):
+        return _Bound(self, tuple(str(value) for value in values))
+
+    def snapshot(self):
+        with self.lock:
+            values = [[list(labels), self._copy(value)] for labels, value in self.values.items()]
+        return {'type': self.kind, 'help': self.documentation, 'labels': list(self.labelnames), 'values': values}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def _compatible(self, snapshot):
+        return snapshot.get('type') == self.kind and snapshot.get('labels') == list(self.labelnames)
+
+
+class _Bound:
+    """Metrik mit festen Label-Werten (kann vorab erzeugt und im Hot Path wiederverwendet werden)."""
+
+    __slots__ = ('metric', 'key')
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        self.metric._add(self.key, amount)
+
+    def dec(self, amount=1):
+        self.metric._add(self.key, -amount)
+
+    def set(self, value):
+        self.metric._set(self.key, value)
+
+    def observe(self, value):
+        self.metric._observe(self.key, value)
+
+    def time(self):
+        return self.metric._time(self.key)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1):
+        self._add((), amount)
+
+    def _add(self, key, amount):
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def _resume(self, key, value):
+        self._add(key, value)
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1):
+        self._add((), -amount)
+
+    def set(self, value):
+        self._set((), value)
+
+    def _set(self, key, value):
+        with self.lock:
+            self.values[key] = value
+
+    def _resume(self, key, value):
+        # Gauges sind Momentwerte: der alte Wert gilt nur, bis der Lauf einen neuen setzt
+        with self.lock:
+            self.values.setdefault(key, value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value):
+        self._observe((), value)
+
+    def time(self):
+        return self._time(())
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def _time(self, key):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._observe(key, time.perf_counter() - started)
+
+    def _resume(self, key, value):
+        counts, total, count = value
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+            entry[2] += count
+
+    def _compatible(self, snapshot):
+        return super()._compatible(snapshot) and snapshot.get('buckets') == list(self.buckets)
+
+    def snapshot(self):
+        result = super().snapshot()
+        result['buckets'] = list(self.buckets)
+        return result
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.directory = None
+        self.name = None
+        self.flusher = None
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        return {'pid': os.getpid(), 'time': time.time(),
+                'metrics': {name: metric.snapshot() for name, metric in self.metrics.items()}}
+
+    # --- Prozessübergreifend ---
+
+    def configure(self, directory, name, flush_seconds=FLUSH_SECONDS, resume=False):
+        """
+        Legt fest, wohin dieser Prozess seine Werte schreibt (z.B. name='scan' oder 'web-1234').
+        resume=True: die Werte eines früheren Laufs aus <name>.json übernehmen und weiterzählen.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            if resume and (directory, name) != (self.directory, self.name):
+                self._resume(os.path.join(directory, f"{name}.json"))
+            self.directory = directory
+            self.name = name
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_loop, args=(flush_seconds,),
+                                                name='metrics-flush', daemon=True)
+                self.flusher.start()
+                atexit.register(self.flush)
+
+    def _resume(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, previous in snapshot.get('metrics', {}).items():
+            metric = self.metrics.get(name)
+            # Geänderte Labels oder Buckets (neue Version): alte Werte verwerfen
+            if metric is None or not metric._compatible(previous):
+                continue
+            for labels, value in previous.get('values', []):
+                metric._resume(tuple(labels), value)
+
+    def _flush_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def flush(self):
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, f"{self.name}.json")
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temp_path, path)
+
+    def collect_all(self):
+        """Schnappschüsse aller Prozesse (der eigene frisch aus dem Speicher)."""
+        snapshots = [self.snapshot()]
+        if self.directory is None:
+            return snapshots
+        own_file = f"{self.name}.json"
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json') or filename == own_file:
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if filename.startswith('web-') and not _pid_alive(snapshot.get('pid')):
+                try: os.remove(path)
+                except OSError: pass
+                continue
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        return render(self.collect_all())
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    if os.name == 'nt':
+        return True  # ohne zusätzliche API nicht zuverlässig prüfbar, Datei behalten
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge(snapshots):
+    """Summiert gleichnamige Metriken mit gleichen Labels über alle Schnappschüsse."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.get('metrics', {}).items():
+            target = merged.setdefault(name, dict(metric, values={}))
+            for labels, value in metric['values']:
+                key = tuple(labels)
+                current = target['values'].get(key)
+                if metric['type'] == 'histogram':
+                    if current is None or len(current[0]) != len(value[0]):
+                        target['values'][key] = [list(value[0]), value[1], value[2]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+                else:
+                    target['values'][key] = (current or 0) + value
+    return merged
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+def render(snapshots):
+    """Prometheus-Textformat (Version 0.0.4)."""
+    lines = []
+    for name, metric in sorted(merge(snapshots).items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric['labels']
+        for labels, value in sorted(metric['values'].items()):
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{_label_text(names, labels)} {_number(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(list(metric['buckets']) + [float('inf')], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_label_text(names, labels, [('le', _number(float(bound)))])} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(names, labels)} {_number(float(total))}")
+            lines.append(f"{name}_count{_label_text(names, labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+configure = REGISTRY.configure
+flush = REGISTRY.flush
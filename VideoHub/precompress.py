@@ -0,0 +1,171 @@
+"""
+Vorkomprimierte Fassungen (gzip, Brotli) von metadata.json, den Dateien unter library/ und den
+statischen Seiten im Webroot (videohub_*.html, videohub.css).
+
+- update_precompressed() legt nach jedem Export neben jede Datei eine .gz- und (mit dem Paket
+  'brotli') eine .br-Datei. Beide bekommen die mtime des Originals: veraltete Fassungen erkennt
+  ein stat(), und ETag/Last-Modified der Fassung passen zum Original.
+- Komprimiert wird einmal beim Schreiben statt bei jeder Anfrage, deshalb auf hoher Stufe
+  (Brotli 11 ist bei großen Dateien wie metadata.json aber zu langsam, dort Stufe 5).
+- send_precompressed() liefert in Flask die beste Fassung, die der Browser annimmt
+  (Accept-Encoding), mit Vary, ETag, Last-Modified und Cache-Control aus. Apache bedient
+  dieselben Dateien mit der Konfiguration aus setup_ubuntu.sh.
+"""
+import gzip
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = ('.json', '.html', '.css', '.js', '.svg')
+# Reihenfolge = Vorzug bei gleicher Gewichtung im Accept-Encoding
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+ENCODED_SUFFIXES = tuple(suffix for _encoding, suffix in ENCODINGS)
+# Kleinere Dateien passen ohnehin in wenige Pakete
+MIN_SIZE = 1024
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+BROTLI_LARGE_QUALITY = 5
+BROTLI_LARGE_SIZE = 1024 * 1024
+# Seiten und Daten immer revalidieren (dank ETag meist ein 304 ohne Inhalt), CSS/JS eine Stunde ungefragt nutzen
+CACHE_CONTROL = {'.css': 'public, max-age=3600', '.js': 'public, max-age=3600'}
+DEFAULT_CACHE_CONTROL = 'no-cache'
+
+PRECOMPRESSED_FILES = metrics.Counter('videohub_precompressed_files_total', 'Geschriebene vorkomprimierte Dateien nach Kodierung', ('encoding',))
+STATIC_RESPONSES = metrics.Counter('videohub_static_responses_total', 'Ausgelieferte statische Dateien nach Content-Encoding', ('encoding',))
+
+
+def available_encodings():
+    return tuple((encoding, suffix) for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None)
+
+
+def _compress(encoding, data):
+    if encoding == 'br':
+        quality = BROTLI_QUALITY if len(data) < BROTLI_LARGE_SIZE else BROTLI_LARGE_QUALITY
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=quality)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _fresh(stat, encoded_path):
+    """Gehört die Fassung zum aktuellen Stand des Originals (gleiche mtime)?"""
+    try:
+        return os.stat(encoded_path).st_mtime_ns == stat.st_mtime_ns
+    except OSError:
+        return False
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def precompress(path):
+    """Schreibt fehlende oder veraltete Fassungen einer Datei. Gibt die Anzahl geschriebener Fassungen zurück."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    written = 0
+    data = None
+    for encoding, suffix in available_encodings():
+        target = path + suffix
+        if stat.st_size < MIN_SIZE:
+            _remove(target)
+            continue
+        if _fresh(stat, target):
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        body = _compress(encoding, data)
+        if len(body) >= len(data):
+            _remove(target)
+            continue
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(tmp_path, target)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        PRECOMPRESSED_FILES.labels(encoding).inc()
+        written += 1
+    return written
+
+
+def update_precompressed(root, subdirs=()):
+    """
+    Bringt die Fassungen der Dateien direkt in root und (rekursiv) in subdirs auf den Stand und
+    löscht Fassungen, deren Original verschwunden ist. Gibt die Anzahl geschriebener Fassungen zurück.
+    """
+    written = 0
+    pending = [(root, False)] + [(os.path.join(root, subdir), True) for subdir in subdirs]
+    while pending:
+        directory, recursive = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    pending.append((entry.path, True))
+            elif entry.name.endswith(ENCODED_SUFFIXES):
+                if not os.path.exists(entry.path[:-len(os.path.splitext(entry.name)[1])]):
+                    _remove(entry.path)
+            elif entry.name.lower().endswith(COMPRESSIBLE_SUFFIXES):
+                written += precompress(entry.path)
+    return written
+
+
+def send_precompressed(directory, path):
+    """
+    Wie send_from_directory, aber mit der besten aktuellen Fassung, die der Browser annimmt,
+    und Cache-Control je Dateityp. ETag und Last-Modified setzt send_from_directory je Fassung.
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    encoding = None
+    if suffix in COMPRESSIBLE_SUFFIXES:
+        full_path = safe_join(directory, path)
+        try:
+            stat = os.stat(full_path) if full_path else None
+        except OSError:
+            stat = None
+        if stat is not None:
+            fresh = [name for name, encoded_suffix in ENCODINGS if _fresh(stat, full_path + encoded_suffix)]
+            encoding = request.accept_encodings.best_match(fresh) if fresh else None
+
+    if encoding:
+        response = send_from_directory(directory, path + dict(ENCODINGS)[encoding],
+                                       mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(directory, path)
+    if suffix in COMPRESSIBLE_SUFFIXES:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = CACHE_CONTROL.get(suffix, DEFAULT_CACHE_CONTROL)
+    STATIC_RESPONSES.labels(encoding or 'identity').inc()
+    return response
+
+
+if __name__ == '__main__':
+    # Nach dem Kopieren neuer Seiten ins Webroot (setup_ubuntu.sh), sonst liefert Apache die alten .br/.gz
+    import sys
+    if len(sys.argv) < 2:
+        print("Aufruf: python precompress.py <Webroot> [Unterordner ...]", file=sys.stderr)
+        sys.exit(2)
+    count = update_precompressed(sys.argv[1], sys.argv[2:])
+    print(f"{count} vorkomprimierte Dateien (gzip/brotli) aktualisiert.")
@@ -0,0 +1,262 @@
+"""
+Scan-Status und Scan-Log, gemeinsam für alle Prozesse.
+
+Der Scan läuft als eigener Prozess (python video_update.py --scan). Damit beliebig viele
+Web-Worker (gunicorn -w N) denselben Stand sehen und nie zwei Scans gleichzeitig laufen:
+
+- ScanLock: exklusive Datei-Sperre (flock unter Linux, msvcrt.locking unter Windows).
+  Das Betriebssystem gibt sie frei, sobald der Scan-Prozess endet, auch nach einem Absturz.
+- ScanState: Status, Fortschritt und Log-Zeilen in einer kleinen SQLite-Datei (WAL) in DATA_PATH.
+  Das Log ist ein Ringpuffer mit fortlaufenden Nummern (seq): Clients holen mit ?since=N
+  nur neue Zeilen oder bekommen sie per Server-Sent Events (stream_events) geschickt.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# So lange darf ein gestarteter Scan-Prozess brauchen, bis er die Sperre hält
+START_GRACE_SECONDS = 30
+# STARTING: der Web-Worker hat den Scan-Prozess gestartet, der wartet noch auf die Sperre
+ACTIVE_STATES = ('STARTING', 'RUNNING')
+# So viele Log-Zeilen bleiben erhalten, ältere fallen aus dem Ringpuffer
+LOG_MAX_LINES = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS status (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    state TEXT NOT NULL,
+    pid INTEGER,
+    full_rescan INTEGER NOT NULL DEFAULT 0,
+    started REAL,
+    updated REAL NOT NULL,
+    progress_done INTEGER,
+    progress_total INTEGER,
+    log_start INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO status (id, state, updated) VALUES (1, 'IDLE', 0);
+
+CREATE TABLE IF NOT EXISTS log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    line TEXT NOT NULL
+);
+"""
+
+
+class ScanLock:
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def acquire(self, timeout=0):
+        """Versucht die Sperre zu bekommen (bis zu timeout Sekunden). True, wenn dieser Prozess sie jetzt hält."""
+        deadline = time.monotonic() + timeout
+        while not self._try_acquire():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+        return True
+
+    def _try_acquire(self):
+        handle = open(self.path, 'a+b')
+        try:
+            if os.name == 'nt':
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self.handle = handle
+        return True
+
+    def release(self):
+        if self.handle is None:
+            return
+        try:
+            if os.name == 'nt':
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.handle.close()
+            self.handle = None
+
+    def is_locked(self):
+        """True, wenn irgendein Prozess (auch dieser) die Sperre hält."""
+        if self.handle is not None:
+            return True
+        if self._try_acquire():
+            self.release()
+            return False
+        return True
+
+
+class ScanState:
+    def __init__(self, data_dir, max_lines=LOG_MAX_LINES):
+        os.makedirs(data_dir, exist_ok=True)
+        self.max_lines = max(1, max_lines)
+        self.lock = ScanLock(os.path.join(data_dir, 'scan.lock'))
+        self.db_lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(data_dir, 'scan_state.sqlite'), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(status)")}
+        for column, definition in (('progress_done', 'INTEGER'), ('progress_total', 'INTEGER'),
+                                   ('log_start', 'INTEGER NOT NULL DEFAULT 0')):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE status ADD COLUMN {column} {definition}")
+        self.conn.commit()
+
+    def mark_starting(self, full_rescan=False):
+        """
+        Vom Web-Worker vor dem Start des Scan-Prozesses: Status STARTING, Log und Fortschritt bleiben,
+        bis der Prozess die Sperre hat und begin() aufruft. False, wenn schon ein Scan startet oder läuft.
+        """
+        with self.db_lock:
+            changed = self.conn.execute(
+                "UPDATE status SET state = 'STARTING', pid = NULL, full_rescan = ?, updated = ? "
+                "WHERE id = 1 AND state NOT IN ('STARTING', 'RUNNING')",
+                (int(full_rescan), time.time())).rowcount
+            self.conn.commit()
+        return changed == 1
+
+    def _new_log(self):
+        """
+        Log leeren (db_lock wird gehalten). log_start ist die Nummer vor der ersten Zeile des neuen
+        Laufs; sie wird um eins weitergezählt, damit auch ein Client auf dem letzten Stand des alten
+        Laufs (since == letzte Nummer) den Wechsel bemerkt.
+        """
+        self.conn.execute("DELETE FROM log")
+        self.conn.execute("UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'log'")
+        self.conn.execute("UPDATE status SET log_start = COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'log'), 0) "
+                          "WHERE id = 1")
+
+    def begin(self, pid, full_rescan=False):
+        """Neuer Scan (nur mit gehaltener Sperre aufrufen): Log leeren und Status RUNNING setzen."""
+        now = time.time()
+        with self.db_lock:
+            self._new_log()
+            self.conn.execute(
+                "UPDATE status SET state = 'RUNNING', pid = ?, full_rescan = ?, started = ?, updated = ?, "
+                "progress_done = NULL, progress_total = NULL WHERE id = 1",
+                (pid, int(full_rescan), now, now))
+            self.conn.commit()
+
+    def abort_start(self, reason):
+        """
+        Der Scan-Prozess hat die Sperre nicht bekommen: Grund ins Log schreiben. Stand der Status auf
+        STARTING (Start über die Web-Seite), wird daraus FINISHED_ERROR; ein laufender Scan bleibt unberührt.
+        """
+        with self.db_lock:
+            starting = self.conn.execute(
+                "UPDATE status SET state = 'FINISHED_ERROR', updated = ? WHERE id = 1 AND state = 'STARTING'",
+                (time.time(),)).rowcount == 1
+            if starting:
+                self._new_log()
+            self.conn.execute("INSERT INTO log (line) VALUES (?)", (reason,))
+            self.conn.commit()
+
+    def finish(self, state):
+        with self.db_lock:
+            self.conn.execute("UPDATE status SET state = ?, updated = ? WHERE id = 1", (state, time.time()))
+            self.conn.commit()
+
+    def set_progress(self, done, total):
+        with self.db_lock:
+            self.conn.execute("UPDATE status SET progress_done = ?, progress_total = ?, updated = ? WHERE id = 1",
+                              (done, total, time.time()))
+            self.conn.commit()
+
+    def progress(self):
+        """{'done': n, 'total': m} der aktuellen Abfrage-Phase oder None."""
+        with self.db_lock:
+            done, total = self.conn.execute("SELECT progress_done, progress_total FROM status WHERE id = 1").fetchone()
+        return None if total is None else {'done': done, 'total': total}
+
+    def append(self, line):
+        with self.db_lock:
+            seq = self.conn.execute("INSERT INTO log (line) VALUES (?)", (line,)).lastrowid
+            self.conn.execute("DELETE FROM log WHERE seq <= ?", (seq - self.max_lines,))
+            self.conn.commit()
+
+    def read_log(self, since=0):
+        """
+        Log-Zeilen nach der Nummer `since`.
+        Rückgabe: ([(seq, zeile), ...], letzte vergebene Nummer, reset). reset=True heißt, der Client
+        hat Zeilen verpasst (neuer Scan oder aus dem Ringpuffer gefallen) und soll seine Anzeige ersetzen.
+        """
+        with self.db_lock:
+            row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'log'").fetchone()
+            last_seq = row[0] if row else 0
+            first_seq = self.conn.execute("SELECT MIN(seq) FROM log").fetchone()[0]
+            log_start = self.conn.execute("SELECT log_start FROM status WHERE id = 1").fetchone()[0]
+            # since < log_start: der Cursor stammt aus einem früheren Lauf
+            if (since > last_seq or since < log_start or (first_seq is None and since < last_seq)
+                    or (first_seq is not None and since < first_seq - 1)):
+                since, reset = 0, since > 0
+            else:
+                reset = False
+            lines = self.conn.execute("SELECT seq, line FROM log WHERE seq > ? ORDER BY seq", (since,)).fetchall()
+        return lines, last_seq, reset
+
+    def status(self):
+        """
+        Aktueller Status. Steht noch STARTING oder RUNNING in der DB, aber kein Prozess hält die Sperre
+        (Scan-Prozess abgestürzt oder nie gestartet), wird FINISHED_ERROR gemeldet.
+        """
+        with self.db_lock:
+            state, pid, updated = self.conn.execute("SELECT state, pid, updated FROM status WHERE id = 1").fetchone()
+        if state in ACTIVE_STATES and not self.lock.is_locked() and time.time() - updated > START_GRACE_SECONDS:
+            return 'FINISHED_ERROR'
+        return state
+
+
+def sse_event(event, data, event_id=None):
+    """Ein Server-Sent Event; mehrzeilige Daten werden auf mehrere data:-Zeilen verteilt."""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {part}" for part in str(data).split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_events(state, since=0, poll_seconds=0.5, keepalive_seconds=15):
+    """
+    Generator für /api/status/stream: schickt neue Log-Zeilen ('log', id = seq), Status und
+    Fortschritt ('status', JSON) sobald sie sich ändern, und endet, wenn kein Scan mehr startet oder läuft.
+    Status und Log liegen in SQLite (der Scan ist ein anderer Prozess), daher wird hier in
+    kurzen Abständen nachgesehen; eine Abfrage ist nur ein Index-Zugriff.
+    """
+    last_status = None
+    last_sent = time.monotonic()
+    while True:
+        lines, last_seq, reset = state.read_log(since)
+        if reset:
+            yield sse_event('reset', '')
+        for seq, line in lines:
+            yield sse_event('log', line, seq)
+        if lines or reset:
+            last_sent = time.monotonic()
+        since = max(last_seq, lines[-1][0]) if lines else last_seq
+
+        current = {'status': state.status(), 'progress': state.progress()}
+        if current != last_status:
+            yield sse_event('status', json.dumps(current))
+            last_status = current
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= keepalive_seconds:
+            yield ': ping\n\n'
+            last_sent = time.monotonic()
+
+        if current['status'] not in ACTIVE_STATES:
+            return
+        time.sleep(poll_seconds)
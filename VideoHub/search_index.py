@@ -0,0 +1,184 @@
+"""
+Invertierter Suchindex über Titel, Beschreibungen und Genres (für /api/search).
+
+- Normalisierung für deutsche Titel: Kleinschreibung, ä/ö/ü -> ae/oe/ue, ß -> ss,
+  sonstige Akzente werden entfernt ("Amélie" findet "amelie").
+- Jeder Suchbegriff muss passen (UND). Ein Begriff passt exakt, als Präfix
+  (für die Suche während des Tippens) oder mit einem Tippfehler (eine Einfügung,
+  Löschung, Ersetzung oder Vertauschung). Tippfehler werden über vorberechnete
+  Lösch-Varianten der Wörter gefunden, ohne das Vokabular zu durchlaufen.
+- Ranking: Feldgewicht (Titel > Genres > Beschreibung) x Seltenheit des Wortes (idf)
+  x Art des Treffers, Bonus wenn der Titel mit der Suche beginnt.
+"""
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+
+GERMAN_FOLDING = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+TOKEN_SPLIT = re.compile(r'[^a-z0-9]+')
+
+FIELD_WEIGHTS = {'title': 3.0, 'genres': 1.5, 'overview': 1.0}
+TYPE_WEIGHTS = {'movie': 1.0, 'series': 1.0, 'episode': 0.8}
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+TYPO_MATCH = 0.5
+MIN_PREFIX_LENGTH = 2
+MIN_TYPO_LENGTH = 4
+MAX_PREFIX_TERMS = 200
+
+
+def normalize(text):
+    """'Die Brücke am Fluß' -> 'die bruecke am fluss'"""
+    text = (text or '').casefold().translate(GERMAN_FOLDING)
+    if text.isascii():
+        return text
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return [token for token in TOKEN_SPLIT.split(normalize(text)) if token]
+
+
+def deletes(term):
+    """Alle Varianten mit genau einem gelöschten Zeichen."""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def within_one_edit(a, b):
+    """True, wenn a und b sich um höchstens eine Einfügung/Löschung/Ersetzung/Vertauschung unterscheiden."""
+    if a == b:
+        return True
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > 1:
+        return False
+    if len_a > len_b:
+        a, b, len_a, len_b = b, a, len_b, len_a
+    i = 0
+    while i < len_a and a[i] == b[i]:
+        i += 1
+    if len_a == len_b:
+        return (a[i + 1:] == b[i + 1:]
+                or (i + 1 < len_a and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]))
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+    def __init__(self, documents=()):
+        """
+        documents: Dicts mit 'type', 'key', 'title' und optional 'overview', 'genres', 'search_title'
+        (zusätzlicher Titeltext, z.B. der Serienname bei Episoden). Alles außer den
+        Suchfeldern wird unverändert als Treffer zurückgegeben.
+        """
+        self.documents = []
+        self.titles = []
+        self.postings = {}    # Wort -> {Dokument-Nr: Gewicht}
+        self.typo_keys = {}   # Lösch-Variante -> Wörter (nur Titel- und Genre-Wörter)
+        title_terms = set()
+        for document in documents:
+            title_terms.update(self._add(document))
+
+        self.vocabulary = sorted(self.postings)
+        count = max(1, len(self.documents))
+        self.idf = {term: math.log(1 + count / len(docs)) for term, docs in self.postings.items()}
+        # Tippfehler-Toleranz nur für Titel und Genres: das Vokabular der Beschreibungen
+        # ist um ein Vielfaches größer und würde Aufbauzeit und Speicher dominieren
+        for term in title_terms:
+            if len(term) >= MIN_TYPO_LENGTH:
+                for variant in deletes(term) | {term}:
+                    self.typo_keys.setdefault(variant, []).append(term)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _add(self, document):
+        """Nimmt ein Dokument auf und gibt seine Titel- und Genre-Wörter zurück."""
+        doc_id = len(self.documents)
+        self.documents.append({k: v for k, v in document.items() if k != 'search_title'})
+        self.titles.append(' '.join(tokenize(document.get('title', ''))))
+        fields = {
+            'title': f"{document.get('search_title', '')} {document.get('title', '')}",
+            'genres': ' '.join(document.get('genres') or []),
+            'overview': document.get('overview', ''),
+        }
+        weights = {}
+        title_terms = []
+        for field, text in fields.items():
+            tokens = tokenize(text)
+            field_weight = FIELD_WEIGHTS[field]
+            for token in tokens:
+                # Höchstes Feldgewicht zählt, Wiederholungen geben nur einen kleinen Zuschlag
+                weight = weights.get(token, 0)
+                weights[token] = (weight if weight > field_weight else field_weight) + 0.05
+            if field != 'overview':
+                title_terms.extend(tokens)
+        postings = self.postings
+        for token, weight in weights.items():
+            docs = postings.get(token)
+            if docs is None:
+                postings[token] = {doc_id: weight}
+            else:
+                docs[doc_id] = weight
+        return title_terms
+
+    def _matching_terms(self, token, allow_prefix):
+        """{Wort im Index: Trefferart-Gewicht} für einen Suchbegriff."""
+        matches = {}
+        if token in self.postings:
+            matches[token] = EXACT_MATCH
+        if allow_prefix and len(token) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_left(self.vocabulary, token)
+            end = bisect.bisect_left(self.vocabulary, token + '￿')
+            prefixed = self.vocabulary[start:end]
+            if len(prefixed) > MAX_PREFIX_TERMS:
+                prefixed = heapq.nlargest(MAX_PREFIX_TERMS, prefixed, key=lambda term: len(self.postings[term]))
+            for term in prefixed:
+                matches.setdefault(term, PREFIX_MATCH)
+        if len(token) >= MIN_TYPO_LENGTH:
+            for variant in deletes(token) | {token}:
+                for term in self.typo_keys.get(variant, ()):
+                    if term not in matches and within_one_edit(token, term):
+                        matches[term] = TYPO_MATCH
+        return matches
+
+    def search(self, query, limit=20, types=None):
+        """Liefert (Anzahl Treffer, die besten `limit` Treffer mit 'score')."""
+        tokens = tokenize(query)
+        if not tokens:
+            return 0, []
+
+        scores = None
+        for position, token in enumerate(tokens):
+            # Präfixe nur für das letzte Wort: das tippt der Nutzer gerade
+            matches = self._matching_terms(token, allow_prefix=(position == len(tokens) - 1))
+            token_scores = {}
+            for term, match_weight in matches.items():
+                factor = match_weight * self.idf[term]
+                for doc_id, weight in self.postings[term].items():
+                    score = weight * factor
+                    if score > token_scores.get(doc_id, 0):
+                        token_scores[doc_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: score + token_scores[doc_id] for doc_id, score in scores.items() if doc_id in token_scores}
+            if not scores:
+                return 0, []
+
+        phrase = ' '.join(tokens)
+        ranked = []
+        for doc_id, score in scores.items():
+            document = self.documents[doc_id]
+            if types and document.get('type') not in types:
+                continue
+            title = self.titles[doc_id]
+            if title == phrase:
+                score *= 2.0
+            elif title.startswith(phrase):
+                score *= 1.5
+            ranked.append((score * TYPE_WEIGHTS.get(document.get('type'), 1.0), doc_id))
+
+        best = heapq.nlargest(limit, ranked)
+        return len(ranked), [dict(self.documents[doc_id], score=round(score, 3)) for score, doc_id in best]
@@ -41,7 +41,7 @@ echo -e "\n${GREEN}Konfiguration wird angewendet...${NC}\n"
 PROJECT_DIR=$(pwd)
 
 # 1. System-Abhängigkeiten
-sudo apt update && sudo apt install -y python3-pip python3-venv apache2 gunicorn
+sudo apt update && sudo apt install -y python3-pip python3-venv apache2 gunicorn ffmpeg
 
 # 2. Frontend-Dateien in das Web-Root kopieren
 echo "📂 Kopiere HTML/CSS Dateien nach $WWW_DIR..."
@@ -51,6 +51,9 @@ sudo cp videohub_serien.html $WWW_DIR/
 sudo cp videohub_serien_silk.html $WWW_DIR/
 sudo cp update_metadaten_status.html $WWW_DIR/
 sudo cp videohub.css $WWW_DIR/
+# Alte .br/.gz-Fassungen der Seiten löschen: Apache würde sie sonst statt der neuen Dateien ausliefern.
+# Neu erzeugt werden sie unten, sobald die Python-Umgebung steht.
+sudo rm -f $WWW_DIR/*.html.br $WWW_DIR/*.html.gz $WWW_DIR/*.css.br $WWW_DIR/*.css.gz
 
 # 3. Berechtigungen setzen
 sudo chown -R $USER:www-data $WWW_DIR
@@ -60,7 +63,10 @@ sudo chmod -R 775 $WWW_DIR
 if [ ! -d "venv" ]; then
     python3 -m venv venv
 fi
-./venv/bin/pip install flask flask-cors requests tmdbsimple python-dotenv gunicorn
+./venv/bin/pip install flask flask-cors requests tmdbsimple python-dotenv gunicorn pillow brotli
+
+# gzip/Brotli-Fassungen der eben kopierten Seiten (und der Daten unter library/) schreiben
+./venv/bin/python precompress.py $WWW_DIR library
 
 # Linux .env Datei schreiben
 cat <<EOF > .env
@@ -87,8 +93,46 @@ Alias /Videos/Serie \"$SERIEN_PATH\"
     AllowOverride None
     Require all granted
 </Directory>
+
+# Vorkomprimierte Fassungen (.br/.gz, vom Scan geschrieben) ausliefern, wenn der Browser sie annimmt
+<Directory \"$WWW_DIR\">
+    RewriteEngine On
+    RewriteCond %{HTTP:Accept-Encoding} br
+    RewriteCond %{REQUEST_FILENAME}.br -s
+    RewriteRule ^(.+\\.(json|html|css|js|svg))$ \\\$1.br [L]
+    RewriteCond %{HTTP:Accept-Encoding} gzip
+    RewriteCond %{REQUEST_FILENAME}.gz -s
+    RewriteRule ^(.+\\.(json|html|css|js|svg))$ \\\$1.gz [L]
+    RewriteRule \\.json\\.(br|gz)$ - [T=application/json,E=no-gzip:1,E=no-brotli:1]
+    RewriteRule \\.html\\.(br|gz)$ - [T=text/html,E=no-gzip:1,E=no-brotli:1]
+    RewriteRule \\.css\\.(br|gz)$ - [T=text/css,E=no-gzip:1,E=no-brotli:1]
+    RewriteRule \\.js\\.(br|gz)$ - [T=text/javascript,E=no-gzip:1,E=no-brotli:1]
+    RewriteRule \\.svg\\.(br|gz)$ - [T=image/svg+xml,E=no-gzip:1,E=no-brotli:1]
+    <FilesMatch \"\\.(json|html|css|js|svg)\\.br$\">
+        Header set Content-Encoding br
+    </FilesMatch>
+    <FilesMatch \"\\.(json|html|css|js|svg)\\.gz$\">
+        Header set Content-Encoding gzip
+    </FilesMatch>
+    <FilesMatch \"\\.(json|html|css|js|svg)(\\.br|\\.gz)?$\">
+        Header append Vary Accept-Encoding
+    </FilesMatch>
+    # Seiten und Daten immer revalidieren (ETag/Last-Modified liefert Apache selbst), CSS/JS eine Stunde
+    <FilesMatch \"\\.(json|html)(\\.br|\\.gz)?$\">
+        Header set Cache-Control \"no-cache\"
+    </FilesMatch>
+    <FilesMatch \"\\.(css|js)(\\.br|\\.gz)?$\">
+        Header set Cache-Control \"public, max-age=3600\"
+    </FilesMatch>
+</Directory>
+
+# Bilder in thumbs/ ändern sich unter ihrem Namen nie (ein neues TMDB-Bild bekommt einen neuen Namen)
+<Directory \"$WWW_DIR/thumbs\">
+    Header set Cache-Control \"public, max-age=31536000, immutable\"
+</Directory>
 EOF"
 
+sudo a2enmod headers rewrite
 sudo a2enconf videohub-aliases
 sudo systemctl reload apache2
 
@@ -104,7 +148,7 @@ User=$USER
 Group=www-data
 WorkingDirectory=$PROJECT_DIR
 Environment=\"PATH=$PROJECT_DIR/venv/bin\"
-ExecStart=$PROJECT_DIR/venv/bin/gunicorn -w 1 -b 0.0.0.0:5000 video_update:app
+ExecStart=$PROJECT_DIR/venv/bin/gunicorn -w 2 -k gthread --threads 8 -b 0.0.0.0:5000 video_update:app
 Restart=always
 
 [Install]
@@ -0,0 +1,134 @@
+"""
+Statische JSON-Dateien für Installationen, in denen Apache den Webroot direkt ausliefert.
+
+Statt metadata.json komplett zu laden (und im Browser jede 'Serie_...'-ID zu zerlegen),
+laden die Seiten nur noch, was sie anzeigen:
+
+    library/movies.json            alle Filme (nur die Felder, die die Seite braucht)
+    library/series_index.json      kompakte Serien-Übersicht (Poster, Genres, Anzahl Episoden)
+    library/series/<name>.json     eine Datei je Serie mit Staffeln und Episoden
+
+Die Dateien werden nur geschrieben, wenn sich die DB-generation seit dem letzten
+Schreiben geändert hat, und dann nur die, deren Inhalt sich tatsächlich geändert hat.
+Jede Datei wird atomar ersetzt (temporäre Datei + os.replace). Die .gz/.br-Fassungen daneben
+schreibt precompress.py.
+"""
+import hashlib
+import json
+import os
+import re
+
+from library_index import build_views, collect_genres, series_summary
+from precompress import ENCODED_SUFFIXES
+
+LIBRARY_DIR = 'library'
+SERIES_DIR = 'series'
+DEFAULT_WEB_ALIASES = {'movie': 'Videos/Filme', 'tv': 'Videos/Serie'}
+META_KEY = 'static_library_generation'
+
+MOVIE_FIELDS = ('key', 'title', 'url', 'overview', 'genres', 'not_found', 'poster_local_url', 'backdrop_local_url',
+                'poster_variants', 'backdrop_variants', 'poster_lqip', 'backdrop_lqip', 'media_info')
+EPISODE_FIELDS = ('key', 'url', 'filename', 'season', 'episode', 'code', 'episode_title', 'overview',
+                  'not_found', 'episode_still_local_url', 'episode_still_variants', 'media_info')
+# Aus media_info (media_probe.py) brauchen die Seiten nur die Laufzeit und ob der Browser die Datei direkt abspielt
+MEDIA_INFO_FIELDS = ('duration', 'direct_play')
+
+
+def shard_name(series_key):
+    """Dateiname für eine Serie: lesbarer Teil + Hash (Ordnernamen dürfen beliebige Zeichen enthalten)."""
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', series_key).strip('-').lower()[:60] or 'serie'
+    digest = hashlib.sha1(series_key.encode('utf-8')).hexdigest()[:8]
+    return f"{slug}-{digest}.json"
+
+
+def _pick(item, fields):
+    picked = {field: item[field] for field in fields if field in item}
+    if picked.get('media_info'):
+        picked['media_info'] = _pick(picked['media_info'], MEDIA_INFO_FIELDS)
+    return picked
+
+
+def _dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class StaticLibraryWriter:
+    def __init__(self, wwwroot_path, web_aliases=None):
+        self.library_dir = os.path.join(wwwroot_path, LIBRARY_DIR)
+        self.series_dir = os.path.join(self.library_dir, SERIES_DIR)
+        self.web_aliases = web_aliases or DEFAULT_WEB_ALIASES
+        self.digests = {}  # Pfad -> sha1 des zuletzt geschriebenen Inhalts
+
+    def write(self, store, force=False):
+        """Schreibt die Dateien, falls sich die DB geändert hat. Gibt die Anzahl geschriebener Dateien zurück."""
+        generation = store.generation()
+        if not force and store.get_meta(META_KEY) == generation and os.path.exists(self.index_path()):
+            return 0
+
+        movies, series = build_views(store.media_with_paths(), self.web_aliases)
+        os.makedirs(self.series_dir, exist_ok=True)
+
+        written = 0
+        shards = set()
+        summaries = []
+        for series_key in sorted(series, key=str.casefold):
+            view = series[series_key]
+            name = shard_name(series_key)
+            shards.add(name)
+            summary = dict(series_summary(view), shard=f"{SERIES_DIR}/{name}")
+            summaries.append(summary)
+            shard = dict(summary, seasons=[
+                {'season': season['season'], 'episodes': [_pick(e, EPISODE_FIELDS) for e in season['episodes']]}
+                for season in view['seasons']
+            ])
+            written += self._write_file(os.path.join(self.series_dir, name), shard)
+
+        movie_items = sorted((_pick(m, MOVIE_FIELDS) for m in movies), key=lambda m: m['title'].casefold())
+        written += self._write_file(os.path.join(self.library_dir, 'movies.json'),
+                                    {'genres': collect_genres(movie_items), 'movies': movie_items})
+        written += self._write_file(self.index_path(),
+                                    {'genres': collect_genres(summaries), 'series': summaries})
+        self._remove_stale(shards)
+
+        store.set_meta(META_KEY, generation)
+        return written
+
+    def index_path(self):
+        return os.path.join(self.library_dir, 'series_index.json')
+
+    def _write_file(self, path, payload):
+        """Schreibt atomar, aber nur wenn sich der Inhalt geändert hat (bei Serien-Shards der Normalfall)."""
+        body = _dumps(payload)
+        digest = hashlib.sha1(body).hexdigest()
+        if self.digests.get(path) == digest:
+            return 0
+        if path not in self.digests and os.path.exists(path):
+            with open(path, 'rb') as f:
+                if f.read() == body:
+                    self.digests[path] = digest
+                    return 0
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.digests[path] = digest
+        return 1
+
+    def _remove_stale(self, shards):
+        with os.scandir(self.series_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(ENCODED_SUFFIXES):
+                    name = os.path.splitext(name)[0]
+                if name not in shards:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                    self.digests.pop(entry.path, None)
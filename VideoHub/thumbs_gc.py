@@ -0,0 +1,221 @@
+"""
+Aufräumen von THUMBS_DIR (Poster, Backdrops, Episodenbilder).
+
+- Verwaiste Bilder: Dateien, auf die kein DB-Eintrag mehr verweist (umbenannte oder gelöschte
+  Videos), werden gelöscht. Ganz frische Dateien bleiben eine Weile liegen, weil z.B. der
+  Metadaten-Editor ein Bild erst herunterlädt und danach den Eintrag schreibt.
+- Optionales Größenlimit: ist THUMBS_DIR danach noch größer als max_bytes, werden die am
+  längsten nicht benutzten Bilder entfernt (zuletzt benutzt = neuere von atime und mtime;
+  bei relatime-Mounts ist atime auf etwa einen Tag genau, das reicht für die Reihenfolge).
+  Die Verweise in der DB werden dabei geleert, die Seiten zeigen dann den Platzhalter; ein
+  vollständiger Scan lädt fehlende Bilder wieder.
+- Bericht (dry_run): zeigt, was gelöscht würde und wie viel Platz das bringt, ohne etwas anzufassen.
+- Einmalige Umstellung (migrate_shared_names): früher hatte jede Videodatei ihre eigene Kopie
+  von Poster und Backdrop, heute teilen sich alle Einträge eine Datei je TMDB-Bild.
+
+Angefasst werden nur Dateien, die der VideoHub selbst anlegt (MANAGED_SUFFIXES und die
+WebP/AVIF-Fassungen aus image_variants.py). Ein Original und seine Fassungen werden beim
+Größenlimit gemeinsam verdrängt.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+
+import metrics
+from image_downloader import console_log, image_filename
+from image_variants import VARIANT_FIELDS, variant_source, variant_urls
+
+IMAGE_FIELDS = tuple(VARIANT_FIELDS)
+VARIANTS_FIELDS = tuple(VARIANT_FIELDS.values())
+# Bild-Feld -> (Feld mit dem TMDB-Bildpfad, Kürzel im Dateinamen)
+TMDB_IMAGE_FIELDS = {
+    'poster_local_url': ('poster_path', 'p'),
+    'backdrop_local_url': ('backdrop_path', 'b'),
+    'episode_still_local_url': ('episode_still_path', 'e'),
+}
+MANAGED_SUFFIXES = ('_p.jpg', '_b.jpg', '_e.jpg')
+# Verwaiste Dateien, die jünger sind, bleiben liegen (Download läuft evtl. noch, Eintrag folgt)
+ORPHAN_GRACE_SECONDS = 3600
+
+THUMBS_GC_FILES = metrics.Counter('videohub_thumbs_gc_files_total', 'Vom Thumbnail-GC gelöschte Bilder', ('reason',))
+THUMBS_GC_BYTES = metrics.Counter('videohub_thumbs_gc_bytes_total', 'Vom Thumbnail-GC freigegebene Bytes', ('reason',))
+THUMBS_BYTES = metrics.Gauge('videohub_thumbs_bytes', 'Größe aller Bilder in THUMBS_DIR nach dem letzten GC')
+
+ThumbFile = namedtuple('ThumbFile', 'name size last_used')
+GCPlan = namedtuple('GCPlan', 'orphans evictions total_bytes kept_bytes max_bytes')
+
+
+def _content_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class ThumbsGC:
+    def __init__(self, thumbs_dir, max_bytes=0, grace_seconds=ORPHAN_GRACE_SECONDS, log=console_log):
+        self.thumbs_dir = thumbs_dir
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self.log = log
+
+    @staticmethod
+    def references(store):
+        """{Dateiname: [(file_id, DB-Feld), ...]} aller Bilder und Fassungen, auf die die DB verweist."""
+        references = {}
+        for file_id, field, value in store.image_urls(IMAGE_FIELDS + VARIANTS_FIELDS):
+            urls = variant_urls(json.loads(value)) if field in VARIANTS_FIELDS else [value]
+            for url in urls:
+                references.setdefault(url.replace('\\', '/').rsplit('/', 1)[-1], []).append((file_id, field))
+        return references
+
+    def _scan(self):
+        files = []
+        try:
+            with os.scandir(self.thumbs_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(MANAGED_SUFFIXES) and not variant_source(entry.name):
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    files.append(ThumbFile(entry.name, stat.st_size, max(stat.st_atime, stat.st_mtime)))
+        except FileNotFoundError:
+            pass
+        return files
+
+    def plan(self, references, now=None):
+        """Was gelöscht werden soll: verwaiste Dateien, danach ggf. die ältesten bis zum Limit."""
+        now = time.time() if now is None else now
+        orphans, kept = [], []
+        for thumb in self._scan():
+            if thumb.name in references:
+                kept.append(thumb)
+            elif now - thumb.last_used >= self.grace_seconds:
+                orphans.append(thumb)
+            else:
+                kept.append(thumb)
+        total = sum(thumb.size for thumb in orphans) + sum(thumb.size for thumb in kept)
+        kept_bytes = sum(thumb.size for thumb in kept)
+
+        evictions = []
+        if self.max_bytes and kept_bytes > self.max_bytes:
+            # Original samt Fassungen; frische, noch nicht eingetragene Dateien bleiben
+            groups = {}
+            for thumb in kept:
+                if thumb.name in references:
+                    groups.setdefault(variant_source(thumb.name) or thumb.name, []).append(thumb)
+            # Am längsten nicht benutzt zuerst (die Seiten laden meist nur eine der Fassungen)
+            for group in sorted(groups.values(), key=lambda g: max(t.last_used for t in g)):
+                if kept_bytes <= self.max_bytes:
+                    break
+                evictions.extend(group)
+                kept_bytes -= sum(thumb.size for thumb in group)
+        return GCPlan(orphans, evictions, total, kept_bytes, self.max_bytes)
+
+    def run(self, store, dry_run=False):
+        """
+        Plant und (ohne dry_run) löscht. Geleerte DB-Felder werden nicht committet; das
+        übernimmt der Aufrufer zusammen mit seinen übrigen Änderungen. Gibt (Plan, gelöschte Namen) zurück.
+        """
+        references = self.references(store)
+        plan = self.plan(references)
+        if dry_run:
+            return plan, []
+
+        deleted = []
+        for reason, thumbs in (('orphan', plan.orphans), ('evicted', plan.evictions)):
+            for thumb in thumbs:
+                try:
+                    os.remove(os.path.join(self.thumbs_dir, thumb.name))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    self.log(f"Konnte Bild '{thumb.name}' nicht löschen: {e}", is_error=True)
+                    continue
+                deleted.append(thumb.name)
+                THUMBS_GC_FILES.labels(reason).inc()
+                THUMBS_GC_BYTES.labels(reason).inc(thumb.size)
+                if reason == 'evicted':
+                    for file_id, field in references.get(thumb.name, ()):
+                        store.update(file_id, {field: {} if field in VARIANTS_FIELDS else ""})
+        THUMBS_BYTES.set(plan.kept_bytes)
+        return plan, deleted
+
+    def migrate_shared_names(self, store, web_url):
+        """
+        Stellt Dateinamen je Videodatei ('Serie_Arrow_..._p.jpg') auf eine gemeinsame Datei je
+        TMDB-Bild um (image_filename). Von mehreren Kopien desselben Bildes bleibt die größte (ältere
+        Scans haben Poster in w300 geladen, der Metadaten-Editor in w500); fehlt der TMDB-Pfad im
+        Eintrag, entscheidet der Inhalt (SHA-1). Die übrigen Kopien werden gelöscht. Die WebP/AVIF-
+        Fassungen baut der nächste Scan unter dem neuen Namen, die alten räumt danach der GC weg.
+        Committet nicht. Gibt (umgestellte Einträge, gelöschte Kopien, freigegebene Bytes) zurück.
+        """
+        path_fields = tuple(path_field for path_field, _kind in TMDB_IMAGE_FIELDS.values())
+        values = {(file_id, field): value for file_id, field, value in store.image_urls(IMAGE_FIELDS + path_fields)}
+
+        targets = {}  # neuer Name -> [(file_id, Feld, alter Name)]
+        for (file_id, field), url in values.items():
+            if field not in TMDB_IMAGE_FIELDS:
+                continue
+            old_name = url.replace('\\', '/').rsplit('/', 1)[-1]
+            old_path = os.path.join(self.thumbs_dir, old_name)
+            if not os.path.isfile(old_path):
+                continue
+            path_field, kind = TMDB_IMAGE_FIELDS[field]
+            tmdb_path = values.get((file_id, path_field))
+            new_name = image_filename(tmdb_path, kind) if tmdb_path else f"{_content_hash(old_path)}_{kind}.jpg"
+            if new_name != old_name:
+                targets.setdefault(new_name, []).append((file_id, field, old_name))
+
+        moved = removed = freed = 0
+        for new_name, users in targets.items():
+            new_path = os.path.join(self.thumbs_dir, new_name)
+            sizes = {}
+            for name in {old_name for _file_id, _field, old_name in users} | {new_name}:
+                try:
+                    sizes[name] = os.path.getsize(os.path.join(self.thumbs_dir, name))
+                except OSError:
+                    pass
+            keep = max(sizes, key=sizes.get)
+            try:
+                if keep != new_name:
+                    os.replace(os.path.join(self.thumbs_dir, keep), new_path)
+                for name in sizes.keys() - {keep, new_name}:
+                    os.remove(os.path.join(self.thumbs_dir, name))
+                    removed += 1
+                    freed += sizes[name]
+            except OSError as e:
+                self.log(f"Konnte Bild '{new_name}' nicht umstellen: {e}", is_error=True)
+                continue
+            for file_id, field, _old_name in users:
+                store.update(file_id, {field: web_url(new_name), VARIANT_FIELDS[field]: {}})
+                moved += 1
+        return moved, removed, freed
+
+
+def report_lines(plan, dry_run=False):
+    """Zusammenfassung für Scan-Log oder Konsole."""
+    verb = "würden gelöscht" if dry_run else "gelöscht"
+    orphan_bytes = sum(thumb.size for thumb in plan.orphans)
+    evicted_bytes = sum(thumb.size for thumb in plan.evictions)
+    lines = [
+        f"Bilder: {format_size(plan.total_bytes)} gesamt, danach {format_size(plan.kept_bytes)}"
+        + (f" (Limit {format_size(plan.max_bytes)})" if plan.max_bytes else ""),
+        f"Verwaist: {len(plan.orphans)} Bilder {verb}, {format_size(orphan_bytes)}",
+    ]
+    if plan.max_bytes:
+        lines.append(f"Über dem Limit: {len(plan.evictions)} am längsten ungenutzte Bilder {verb}, {format_size(evicted_bytes)}")
+    lines.append(f"Freigegeben{' (geschätzt)' if dry_run else ''}: {format_size(orphan_bytes + evicted_bytes)}")
+    return lines
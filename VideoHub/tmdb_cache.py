@@ -0,0 +1,144 @@
+"""
+Persistenter TMDB-Antwort-Cache, gemeinsam genutzt von video_update.py,
+serien_renamer.py und Metadaten_Editor.py.
+
+Die Antworten liegen in einer SQLite-Datei (WAL-Modus, damit Server und Tools
+gleichzeitig zugreifen können). Jeder Endpunkt hat eine eigene Gültigkeitsdauer,
+die Gesamtgröße ist begrenzt und wird per LRU (zuletzt genutzt) eingehalten.
+Im Offline-Modus wird nur der Cache gelesen, abgelaufene Einträge inklusive.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_MAX_MB = 200
+
+DAY = 24 * 60 * 60
+# Gültigkeit je Endpunkt-Kategorie in Sekunden
+DEFAULT_TTLS = {
+    'search': 7 * DAY,
+    'season': 3 * DAY,
+    'tv': 7 * DAY,
+    'movie': 14 * DAY,
+    # Die Genre-Listen ändert TMDB so gut wie nie
+    'genre': 30 * DAY,
+    'default': DAY,
+}
+# Leere Suchergebnisse verfallen schneller, damit neue TMDB-Einträge gefunden werden
+EMPTY_RESULT_TTL = DAY
+# last_access wird höchstens so oft geschrieben, damit Treffer keine Schreiblast erzeugen
+ACCESS_UPDATE_INTERVAL = 60 * 60
+
+
+class OfflineCacheMiss(Exception):
+    """Im Offline-Modus wurde eine Anfrage gestellt, die nicht im Cache liegt."""
+
+
+def endpoint_category(path):
+    """Ordnet einen TMDB-Pfad einer TTL-Kategorie zu (z.B. 'tv/1399/season/2' -> 'season')."""
+    parts = path.strip('/').split('/')
+    if parts[0] == 'search':
+        return 'search'
+    if parts[0] == 'tv' and 'season' in parts:
+        return 'season'
+    if parts[0] in ('tv', 'movie', 'genre'):
+        return parts[0]
+    return 'default'
+
+
+def cache_key(path, params):
+    """Eindeutiger Schlüssel aus Pfad und Parametern (ohne API-Key)."""
+    relevant = sorted((k, str(v)) for k, v in params.items() if k != 'api_key' and v is not None)
+    return path.strip('/') + '?' + '&'.join(f"{k}={v}" for k, v in relevant)
+
+
+class TMDBCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, ttls=None, offline=False):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, 'tmdb_cache.sqlite')
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.offline = offline
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                category TEXT NOT NULL,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, path, params):
+        """Liefert die gecachte Antwort oder None. Offline werden auch abgelaufene Einträge geliefert."""
+        key = cache_key(path, params)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, expires, last_access FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            body, expires, last_access = row
+            if expires < now and not self.offline:
+                return None
+            if now - last_access > ACCESS_UPDATE_INTERVAL:
+                self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self.conn.commit()
+        return json.loads(body)
+
+    def put(self, path, params, response):
+        category = endpoint_category(path)
+        ttl = self.ttls.get(category, self.ttls['default'])
+        if isinstance(response, dict) and response.get('results') == []:
+            ttl = min(ttl, EMPTY_RESULT_TTL)
+
+        key = cache_key(path, params)
+        body = json.dumps(response, ensure_ascii=False, separators=(',', ':'))
+        size = len(body.encode('utf-8'))
+        now = time.time()
+        with self.lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, category, body, size, expires, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, category, body, size, now + ttl, now))
+            self.total_bytes += size - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Entfernt die am längsten nicht genutzten Einträge, bis 90% des Limits erreicht sind."""
+        target = int(self.max_bytes * 0.9)
+        # Abgelaufenes zuerst, danach nach letztem Zugriff
+        self.conn.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if self.total_bytes <= target:
+            return
+        freed = 0
+        doomed = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            doomed.append((key,))
+            freed += size
+            if self.total_bytes - freed <= target:
+                break
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.total_bytes -= freed
+
+
+def cache_from_env():
+    """Erstellt den Cache aus den ENV-Werten (nach load_dotenv aufrufen)."""
+    cache_dir = os.getenv("TMDB_CACHE_DIR") or os.getenv("DATA_PATH") or DEFAULT_CACHE_DIR
+    max_mb = float(os.getenv("TMDB_CACHE_MAX_MB", DEFAULT_MAX_MB))
+    offline = os.getenv("TMDB_OFFLINE", "0").lower() in ("1", "true", "yes")
+    return TMDBCache(cache_dir, max_bytes=int(max_mb * 1024 * 1024), offline=offline)
@@ -0,0 +1,169 @@
+"""
+TMDB-Client für den VideoHub.
+
+Alle Anfragen laufen über eine gemeinsame requests.Session (Connection-Pooling)
+und einen gemeinsamen Token-Bucket, damit beliebig viele Worker-Threads
+zusammen das Request-Budget von TMDB einhalten. Antwortet TMDB trotzdem mit
+HTTP 429, pausiert der Bucket für alle Threads so lange wie im Retry-After
+Header angegeben.
+
+Optional wird ein TMDBCache (siehe tmdb_cache.py) vorgeschaltet: Treffer kosten
+dann weder Netzwerk noch Token, im Offline-Modus führt ein Cache-Miss zu
+OfflineCacheMiss statt zu einer Anfrage.
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from tmdb_cache import OfflineCacheMiss, endpoint_category
+
+DEFAULT_BASE_URL = "https://api.themoviedb.org/3"
+# TMDB erlaubt ca. 50 Anfragen pro Sekunde und IP, wir bleiben darunter
+DEFAULT_RATE_LIMIT = 40.0
+DEFAULT_BURST = 20
+DEFAULT_MAX_RETRIES = 5
+REQUEST_TIMEOUT = 10
+
+TMDB_REQUESTS = metrics.Counter('videohub_tmdb_requests_total', 'HTTP-Anfragen an TMDB nach Endpunkt und Status (error = Verbindungsfehler/Timeout)', ('endpoint', 'code'))
+TMDB_LATENCY = metrics.Histogram('videohub_tmdb_request_duration_seconds', 'Dauer einer TMDB-Anfrage (ohne Wartezeit im Token-Bucket)', ('endpoint',))
+TMDB_RATE_LIMITED = metrics.Counter('videohub_tmdb_rate_limited_total', 'Von TMDB mit HTTP 429 abgelehnte Anfragen')
+TMDB_THROTTLE_WAIT = metrics.Counter('videohub_tmdb_throttle_wait_seconds_total', 'Summe der Wartezeit im Token-Bucket')
+TMDB_CACHE = metrics.Counter('videohub_tmdb_cache_requests_total', 'Abfragen des lokalen TMDB-Caches nach Ergebnis', ('result',))
+CACHE_HIT = TMDB_CACHE.labels('hit')
+CACHE_MISS = TMDB_CACHE.labels('miss')
+
+
+class TokenBucket:
+    """Thread-sicherer Token-Bucket: `rate` Tokens pro Sekunde, maximal `burst` auf Vorrat."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blockiert, bis ein Token verfügbar ist. Gibt die Wartezeit in Sekunden zurück."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+                    self.last_refill = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        """Sperrt den Bucket für alle Threads (z.B. nach HTTP 429)."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class TMDBClient:
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, rate=DEFAULT_RATE_LIMIT,
+                 burst=DEFAULT_BURST, pool_size=10, language='de-DE', max_retries=DEFAULT_MAX_RETRIES, cache=None):
+        self.api_key = api_key
+        self.cache = cache
+        self.base_url = base_url.rstrip('/')
+        self.language = language
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(rate, burst)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, path, **params):
+        """GET auf einen TMDB-Endpunkt, inkl. Rate-Limit und Backoff bei 429."""
+        params = {k: v for k, v in params.items() if v is not None}
+        params.setdefault('language', self.language)
+
+        if self.cache is not None:
+            cached = self.cache.get(path, params)
+            if cached is not None:
+                CACHE_HIT.inc()
+                return cached
+            CACHE_MISS.inc()
+            if self.cache.offline:
+                raise OfflineCacheMiss(f"Offline-Modus: '{path}' ({params.get('query', '')}) liegt nicht im Cache.")
+
+        data = self._fetch(path, dict(params, api_key=self.api_key))
+        if self.cache is not None:
+            self.cache.put(path, params, data)
+        return data
+
+    def _fetch(self, path, params):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        endpoint = endpoint_category(path)
+
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire()
+            if waited:
+                TMDB_THROTTLE_WAIT.inc(waited)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout):
+                TMDB_REQUESTS.labels(endpoint, 'error').inc()
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+            TMDB_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+            TMDB_REQUESTS.labels(endpoint, response.status_code).inc()
+
+            if response.status_code == 429:
+                TMDB_RATE_LIMITED.inc()
+            if response.status_code == 429 and attempt < self.max_retries:
+                self.bucket.pause(retry_after_seconds(response, default=2 ** attempt))
+                continue
+            if response.status_code >= 500 and attempt < self.max_retries:
+                time.sleep(2 ** attempt)
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+    # --- Endpunkte, die der VideoHub nutzt ---
+
+    def search_movie(self, query, year=None):
+        return self.get('search/movie', query=query, year=year)
+
+    def search_tv(self, query):
+        return self.get('search/tv', query=query)
+
+    def movie_info(self, movie_id):
+        return self.get(f'movie/{movie_id}')
+
+    def tv_info(self, tv_id):
+        return self.get(f'tv/{tv_id}')
+
+    def genre_list(self, media_type):
+        """Alle Genres mit ID und Namen ('movie' oder 'tv'); Suchergebnisse enthalten nur genre_ids."""
+        return self.get(f'genre/{media_type}/list')
+
+    def tv_season(self, tv_id, season):
+        """Komplette Staffel inkl. aller Episoden (ein Request statt einem pro Episode)."""
+        return self.get(f'tv/{tv_id}/season/{season}')
+
+
+def retry_after_seconds(response, default=1.0):
+    """Liest den Retry-After Header (Sekunden) einer 429-Antwort."""
+    try:
+        return max(0.0, float(response.headers.get('Retry-After', default)))
+    except (TypeError, ValueError):
+        return float(default)
@@ -0,0 +1,264 @@
+"""
+Auslieferung der Videodateien mit Byte-Ranges (Spulen im Browser-Player).
+
+- Einzel- und Mehrfach-Ranges (multipart/byteranges) nach RFC 7233, inkl. 416 bei
+  ungültigen Bereichen
+- bedingte Anfragen: If-Range, If-None-Match, If-Modified-Since (ETag aus Größe + mtime)
+- Einzel-Ranges und ganze Dateien gehen über wsgi.file_wrapper: gunicorn schickt die Bytes
+  dann per sendfile direkt aus dem Page-Cache, ohne sie durch Python zu kopieren
+- Offload-Modus (VIDEO_OFFLOAD=nginx|apache): Flask prüft nur Pfad und Existenz und
+  antwortet mit X-Accel-Redirect bzw. X-Sendfile, die Bytes (und Ranges) liefert der Webserver
+"""
+import mimetypes
+import os
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+
+from flask import Response, abort, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+import metrics
+
+BLOCK_SIZE = 256 * 1024
+# Mehr Bereiche pro Anfrage werden ignoriert (ganze Datei), schützt vor Range-Überlastung
+MAX_RANGES = 16
+OFFLOAD_HEADERS = {'nginx': 'X-Accel-Redirect', 'apache': 'X-Sendfile'}
+
+VIDEO_REQUESTS = metrics.Counter('videohub_video_requests_total', 'Video-Anfragen nach HTTP-Status', ('code',))
+VIDEO_BYTES = metrics.Counter('videohub_video_bytes_served_total', 'Tatsächlich ausgelieferte Video-Bytes (ohne Offload)')
+ACTIVE_STREAMS = metrics.Gauge('videohub_video_streams_active', 'Gerade laufende Video-Antworten')
+
+mimetypes.add_type('video/x-matroska', '.mkv')
+mimetypes.add_type('video/webm', '.webm')
+mimetypes.add_type('video/mp4', '.mp4')
+
+
+class RangeFile:
+    """
+    Dateiobjekt, das ab `start` höchstens `length` Bytes liefert. gunicorn nutzt fileno()
+    und die aktuelle Position für sendfile, andere Server lesen über read().
+    """
+
+    def __init__(self, path, start, length):
+        self.file = open(path, 'rb')
+        self.file.seek(start)
+        self.length = length
+        self.remaining = length
+        self.sendfile = False
+        ACTIVE_STREAMS.inc()
+
+    def fileno(self):
+        # gunicorn schickt dann content_length Bytes per sendfile und setzt die Position
+        # danach zurück, read() wird nicht aufgerufen
+        self.sendfile = True
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        if self.file.closed:
+            return
+        sent = self.length - self.remaining
+        if not sent and self.sendfile:
+            sent = self.length
+        VIDEO_BYTES.inc(sent)
+        ACTIVE_STREAMS.dec()
+        self.file.close()
+
+
+def parse_ranges(header, size):
+    """
+    Liest einen Range-Header ('bytes=0-99,200-,-500').
+    Rückgabe: None = Header ignorieren (ungültig/zu viele Bereiche, ganze Datei senden),
+    [] = nicht erfüllbar (416), sonst sortierte, zusammengefasste Liste aus (start, ende_exklusiv).
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    specs = header[len('bytes='):].split(',')
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        first, sep, last = spec.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if first == '':
+                suffix = int(last)
+                if suffix == 0:
+                    continue
+                start, end = max(0, size - suffix), size
+            else:
+                start = int(first)
+                end = size if last == '' else min(int(last) + 1, size)
+                if last != '' and int(last) < start:
+                    return None
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _not_modified_since(header, mtime):
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return False
+
+
+def _if_range_matches(if_range, etag, last_modified):
+    """If-Range: nur wenn der Client noch denselben Stand hat, gilt die Range-Anfrage."""
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag  # starker Vergleich, schwache ETags passen nie
+    return if_range == last_modified
+
+
+def send_video(root, filename, offload='', accel_location=''):
+    """Liefert root/filename mit Range- und Conditional-Unterstützung (bzw. per Offload-Header)."""
+    try:
+        response = _send_video(root, filename, offload, accel_location)
+    except HTTPException as e:
+        VIDEO_REQUESTS.labels(e.code).inc()
+        raise
+    VIDEO_REQUESTS.labels(response.status_code).inc()
+    return response
+
+
+def _send_video(root, filename, offload, accel_location):
+    path = safe_join(root, filename) if root else None
+    if path is None:
+        abort(404)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+
+    size = stat.st_size
+    mtime = stat.st_mtime
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+    last_modified = formatdate(mtime, usegmt=True)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Last-Modified': last_modified,
+        'Cache-Control': 'public, max-age=3600',
+    }
+
+    offload_header = OFFLOAD_HEADERS.get(offload)
+    if offload_header:
+        # nginx/Apache liefern aus und kümmern sich selbst um Range/If-Range
+        if offload == 'nginx':
+            target = accel_location.rstrip('/') + '/' + quote(filename.replace('\\', '/'))
+        else:
+            target = os.path.abspath(path)
+        return Response(status=200, mimetype=mimetype, headers={offload_header: target, **headers})
+
+    # 304, wenn der Client die Datei schon hat
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return Response(status=304, headers=headers)
+    elif request.headers.get('If-Modified-Since') and _not_modified_since(request.headers['If-Modified-Since'], mtime):
+        return Response(status=304, headers=headers)
+
+    ranges = parse_ranges(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if ranges is not None and if_range and not _if_range_matches(if_range, etag, last_modified):
+        ranges = None
+
+    if ranges == []:
+        return Response(status=416, headers={'Content-Range': f'bytes */{size}', **headers})
+
+    if ranges is None or ranges == [(0, size)]:
+        return _file_response(path, 0, size, 200, mimetype, headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+        return _file_response(path, start, end - start, 206, mimetype, headers)
+
+    return _multipart_response(path, ranges, size, mimetype, headers)
+
+
+def _head_response(status, length, headers, **kwargs):
+    # HEAD: nur Header, die Datei wird gar nicht erst geöffnet
+    response = Response(status=status, headers=headers, **kwargs)
+    response.content_length = length
+    return response
+
+
+def _file_response(path, start, length, status, mimetype, headers):
+    if request.method == 'HEAD':
+        return _head_response(status, length, headers, mimetype=mimetype)
+    body = wrap_file(request.environ, RangeFile(path, start, length), BLOCK_SIZE)
+    response = Response(body, status=status, mimetype=mimetype, headers=headers, direct_passthrough=True)
+    response.content_length = length
+    return response
+
+
+def _multipart_response(path, ranges, size, mimetype, headers):
+    boundary = uuid.uuid4().hex
+    part_headers = [
+        (f'--{boundary}\r\nContent-Type: {mimetype}\r\nContent-Range: bytes {start}-{end - 1}/{size}\r\n\r\n'
+         ).encode('ascii')
+        for start, end in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode('ascii')
+    length = sum(len(h) for h in part_headers) + sum(end - start for start, end in ranges) \
+        + 2 * (len(ranges) - 1) + len(closing)
+
+    content_type = f'multipart/byteranges; boundary={boundary}'
+    if request.method == 'HEAD':
+        return _head_response(206, length, headers, content_type=content_type)
+
+    def generate():
+        ACTIVE_STREAMS.inc()
+        try:
+            yield from _multipart_parts(path, ranges, part_headers, closing)
+        finally:
+            ACTIVE_STREAMS.dec()
+
+    response = Response(generate(), status=206, headers=headers, direct_passthrough=True, content_type=content_type)
+    response.content_length = length
+    return response
+
+
+def _multipart_parts(path, ranges, part_headers, closing):
+    with open(path, 'rb') as f:
+        for index, ((start, end), part_header) in enumerate(zip(ranges, part_headers)):
+            if index:
+                yield b'\r\n'
+            yield part_header
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(BLOCK_SIZE, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                VIDEO_BYTES.inc(len(chunk))
+                yield chunk
+    yield closing
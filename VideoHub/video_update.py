@@ -1,14 +1,32 @@
 import os
 import sys
 import json
-import requests
-import tmdbsimple as tmdb
 import time
-import re 
-from flask import Flask, render_template, jsonify, send_from_directory
+import queue
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, render_template, jsonify, send_from_directory, request, abort
+from werkzeug.security import safe_join
 from flask_cors import CORS 
-from threading import Thread
+from threading import Thread, Lock
 from dotenv import load_dotenv
+from tmdb_client import TMDBClient, DEFAULT_BASE_URL, DEFAULT_RATE_LIMIT, DEFAULT_BURST
+from tmdb_cache import cache_from_env, OfflineCacheMiss
+from image_downloader import ImageDownloader, image_filename
+from image_variants import VariantBuilder, VARIANT_FIELDS, LQIP_FIELDS, variant_urls
+from metadata_store import MetadataStore, default_db_path
+from library_index import LibraryIndex, query_items, series_summary, SERIES_SORTS
+from static_library import StaticLibraryWriter, LIBRARY_DIR
+from precompress import update_precompressed, send_precompressed
+from video_stream import send_video
+from hls import HLSStreamer
+from media_probe import MediaProber, MEDIA_INFO_FIELD, is_current
+import metrics
+from scan_state import ACTIVE_STATES, ScanState, stream_events
+from filename_parser import parse_media_path
+from thumbs_gc import ThumbsGC, report_lines, format_size
+from fs_watcher import InotifyWatcher, PollingWatcher, ChangeBatcher, inotify_available, filesystem_type, NETWORK_FILESYSTEMS
 
 # --- 1. BETRIEBSSYSTEM-CHECK & ENV LADEN ---
 if os.name == 'nt':  # Windows
@@ -38,21 +56,92 @@ CORS(app)
 
 # --- 3. KONFIGURATION ---
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-tmdb.API_KEY = TMDB_API_KEY
 
-IMAGE_BASE_URL = "https://image.tmdb.org/t/p/"
-POSTER_SIZE = "w300" 
+# Parallele TMDB-Abfragen: Anzahl Worker und gemeinsames Request-Budget (Anfragen/Sekunde)
+TMDB_WORKERS = int(os.getenv("TMDB_WORKERS", "8"))
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", DEFAULT_RATE_LIMIT))
+tmdb_api = TMDBClient(
+    TMDB_API_KEY,
+    base_url=os.getenv("TMDB_BASE_URL", DEFAULT_BASE_URL),
+    rate=TMDB_RATE_LIMIT,
+    burst=int(os.getenv("TMDB_RATE_BURST", DEFAULT_BURST)),
+    pool_size=TMDB_WORKERS,
+    cache=cache_from_env(),
+)
+# TMDB_OFFLINE=1: Rescan nur aus dem TMDB-Cache, ohne Netzwerkzugriffe
+TMDB_OFFLINE = tmdb_api.cache.offline
+
+# Parallele Bild-Downloads (Poster, Backdrops, Episodenbilder)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "8"))
+# Verkleinerte Fassungen für srcset (webp, avif oder beides, leer = aus; braucht Pillow)
+IMAGE_VARIANTS = os.getenv("IMAGE_VARIANTS", "webp").replace(' ', '').lower().split(',')
+# Platzhalter (LQIP) für Poster und Backdrops, die die Seiten sofort malen können
+IMAGE_LQIP = os.getenv("IMAGE_LQIP", "1").lower() in ("1", "true", "yes")
+# Prozesse für das Umrechnen (0 = Anzahl CPU-Kerne)
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "0")) or None
+# Nach jedem Scan verwaiste Bilder löschen; optional Größenlimit für thumbs/ (0 = ohne Limit)
+THUMBS_GC = os.getenv("THUMBS_GC", "1").lower() in ("1", "true", "yes")
+THUMBS_MAX_MB = float(os.getenv("THUMBS_MAX_MB", "0"))
+
+# Zwischenspeichern während des Scans: alle N fertigen Dateien oder alle T Sekunden
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", "200"))
+CHECKPOINT_SECONDS = float(os.getenv("CHECKPOINT_SECONDS", "60"))
+
+# Watcher-Modus (python video_update.py --watch): auto = inotify, für Netzlaufwerke Polling
+WATCH_BACKEND = os.getenv("WATCH_BACKEND", "auto").strip().lower()
+WATCH_POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", "30"))
+# Ruhezeit nach dem letzten Ereignis, bevor eine Datei verarbeitet wird (Kopiervorgänge abwarten)
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "5"))
+# So lange wartet ein gestarteter Scan auf die Sperre, falls der Watcher gerade arbeitet
+SCAN_LOCK_WAIT_SECONDS = 20
+
+IMAGE_BASE_URL = os.getenv("TMDB_IMAGE_BASE_URL", "https://image.tmdb.org/t/p/")
+# Poster in w500 wie im Metadaten-Editor; kleinere Breiten liefern die WebP/AVIF-Fassungen
+POSTER_SIZE = "w500"
 BACKDROP_SIZE = "w1280"
 
-# Pfade für Datenbank und Bilder (relativ zum Webroot)
+# Pfade für den JSON-Export der Datenbank und die Bilder (relativ zum Webroot)
 DB_FILE = os.path.join(WWWROOT_PATH, 'metadata.json')
 THUMBS_DIR = os.path.join(WWWROOT_PATH, 'thumbs')      
 THUMBS_WEB_PATH = 'thumbs/'
+# Bilder in thumbs/ ändern sich unter ihrem Namen nie (siehe image_filename), Browser dürfen sie behalten
+THUMBS_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Aufbau von thumbs/ (meta.value ist INTEGER): 1 = eine Datei je Eintrag, 2 = eine Datei je TMDB-Bild
+THUMBS_LAYOUT_KEY = 'thumbs_layout'
+THUMBS_LAYOUT_VERSION = 2
+
+# Interne Daten (SQLite-Datenbank inkl. Scan-Manifest usw.), bewusst NICHT im Webroot
+DATA_PATH = os.getenv("DATA_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+LEGACY_MANIFEST_FILE = os.path.join(DATA_PATH, 'scan_manifest.json')
+# Anfang und Ende einer Videodatei, aus denen der Fingerprint für umbenannte Dateien entsteht
+FINGERPRINT_BLOCK = 64 * 1024
+store = MetadataStore(default_db_path())
 
 # Video-Quellen aus ENV beziehen
 FILME_PATH = os.getenv("FILME_PATH")
 SERIEN_PATH = os.getenv("SERIEN_PATH")
 
+# Video-Auslieferung: leer = Flask (Ranges + sendfile), "nginx" = X-Accel-Redirect, "apache" = X-Sendfile
+VIDEO_OFFLOAD = os.getenv("VIDEO_OFFLOAD", "").strip().lower()
+# interne nginx-Location, unter der /Filme und /Serie auf die Video-Ordner zeigen
+VIDEO_ACCEL_PREFIX = os.getenv("VIDEO_ACCEL_PREFIX", "/_videos")
+
+# HLS für Videos, die der Browser nicht direkt abspielt: Segmente entstehen per ffmpeg erst beim Abruf
+HLS_CACHE_DIR = os.getenv("HLS_CACHE_DIR") or os.path.join(DATA_PATH, 'hls')
+# Größenlimit des Segment-Caches (0 = ohne Limit)
+HLS_CACHE_MAX_MB = float(os.getenv("HLS_CACHE_MAX_MB", "4096"))
+# Gleichzeitige ffmpeg-Prozesse über alle Worker hinweg
+HLS_MAX_TRANSCODES = int(os.getenv("HLS_MAX_TRANSCODES", "2"))
+HLS_SEGMENT_SECONDS = float(os.getenv("HLS_SEGMENT_SECONDS", "6"))
+# Ohne Segment-Abruf so lange wird ein ffmpeg-Prozess beendet
+HLS_IDLE_SECONDS = float(os.getenv("HLS_IDLE_SECONDS", "60"))
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+FFPROBE_PATH = os.getenv("FFPROBE_PATH", "ffprobe")
+# Technische Daten (Dauer, Auflösung, Codecs, Tonspuren) beim Scan per ffprobe erfassen
+MEDIA_PROBE = os.getenv("MEDIA_PROBE", "1").lower() in ("1", "true", "yes")
+# Gleichzeitige ffprobe-Prozesse beim Scan
+MEDIA_PROBE_WORKERS = int(os.getenv("MEDIA_PROBE_WORKERS", "4"))
+
 VIDEO_SOURCES = {
     "Filme": {
         "type": "movie",                     
@@ -67,131 +156,373 @@ VIDEO_SOURCES = {
 }
 
 ALLOWED_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.avi', '.mov')
-current_log = []
-scan_status = "IDLE"
+
+# In-Memory-Sicht für /api/movies und /api/series, wird nur bei DB-Änderungen neu gebaut
+library_index = LibraryIndex(store, {cfg['type']: cfg['web_alias'] for cfg in VIDEO_SOURCES.values()})
+API_DEFAULT_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 500
+# Statische Shards (library/*.json) für Apache, das den Webroot ohne Flask ausliefert
+static_library = StaticLibraryWriter(WWWROOT_PATH, library_index.web_aliases)
+# Scan-Status und -Log liegen in DATA_PATH, damit alle gunicorn-Worker und der Scan-Prozess sie teilen
+scan_state = ScanState(DATA_PATH, max_lines=int(os.getenv("SCAN_LOG_LINES", 2000)))
+# Fortschritt (erledigte/gesamte Abfragen) höchstens so oft in den Scan-Status schreiben
+PROGRESS_SECONDS = 1.0
+
+# Metriken (/metrics): jeder Prozess schreibt seine Werte nach DATA_PATH/metrics, /metrics summiert sie
+METRICS_DIR = os.path.join(DATA_PATH, 'metrics')
+metrics.configure(METRICS_DIR, f"web-{os.getpid()}")
+SCAN_PHASE_SECONDS = metrics.Histogram('videohub_scan_phase_duration_seconds', 'Dauer der Scan-Phasen', ('phase',))
+SCANS = metrics.Counter('videohub_scans_total', 'Abgeschlossene Scans nach Ergebnis', ('result',))
+SCAN_FILES = metrics.Counter('videohub_scan_files_total', 'Dateien je Scan-Ergebnis (neu, geändert, verschoben, unverändert, entfernt)', ('result',))
+SCAN_FILES_PER_SECOND = metrics.Gauge('videohub_scan_files_per_second', 'Geprüfte Dateien pro Sekunde im letzten Scan')
+SCAN_LAST_DURATION = metrics.Gauge('videohub_scan_last_duration_seconds', 'Gesamtdauer des letzten Scans')
+SCAN_LAST_SUCCESS = metrics.Gauge('videohub_scan_last_success_timestamp_seconds', 'Zeitpunkt des letzten erfolgreichen Scans (Unix-Zeit)')
+METADATA_LOOKUPS = metrics.Counter('videohub_metadata_lookups_total', 'Metadaten-Abfragen nach Quelle (db = schon in der Datenbank, tmdb = TMDB/TMDB-Cache)', ('source',))
+WATCH_FILES = metrics.Counter('videohub_watch_files_total', 'Vom Watcher verarbeitete Dateien', ('result',))
+warmup_thread = None
 
 def log_message(msg, is_error=False):
-    """Fügt eine Nachricht zum Log hinzu und gibt sie auf der Konsole aus."""
+    """Fügt eine Nachricht zum (prozessübergreifenden) Scan-Log hinzu und gibt sie auf der Konsole aus."""
     prefix = "❌ FEHLER" if is_error else "✅ INFO"
     log_line = f"[{time.strftime('%H:%M:%S')}] {prefix}: {msg}"
-    current_log.append(log_line)
+    scan_state.append(log_line)
     if is_error:
         print(log_line, file=sys.stderr)
     else:
         print(log_line)
 
+image_downloader = ImageDownloader(THUMBS_DIR, THUMBS_WEB_PATH, workers=IMAGE_WORKERS, log=log_message, offline=TMDB_OFFLINE)
+variant_builder = VariantBuilder(THUMBS_DIR, THUMBS_WEB_PATH, formats=IMAGE_VARIANTS, lqip=IMAGE_LQIP, workers=IMAGE_VARIANT_WORKERS, log=log_message)
+thumbs_gc = ThumbsGC(THUMBS_DIR, max_bytes=int(THUMBS_MAX_MB * 1024 * 1024), log=log_message)
+hls_streamer = HLSStreamer(HLS_CACHE_DIR, max_bytes=int(HLS_CACHE_MAX_MB * 1024 * 1024), max_jobs=HLS_MAX_TRANSCODES,
+                           segment_seconds=HLS_SEGMENT_SECONDS, idle_seconds=HLS_IDLE_SECONDS,
+                           ffmpeg=FFMPEG_PATH, ffprobe=FFPROBE_PATH, log=log_message)
+media_prober = MediaProber(FFPROBE_PATH, workers=MEDIA_PROBE_WORKERS, log=log_message)
+
 # ------------------------------------------------
 # HILFSFUNKTIONEN
 # ------------------------------------------------
 
-def clean_title_for_search(title, is_tv=False):
-    title = title.replace('_', ' ').replace('.', ' ').strip()
-    if is_tv:
-        title = re.sub(r'[\s\.\-]+[Ss]\d+[Ee]\d+.*', '', title, flags=re.IGNORECASE).strip()
-        title = re.sub(r'[\s\.\-]+(\d+x\d+).*', '', title, flags=re.IGNORECASE).strip()
-        title = re.sub(r'[\s\.\-]+[Ss]taffel\s*\d+.*', '', title, flags=re.IGNORECASE).strip()
-        parts = re.split(r' - | \- ', title, 1)
-        if len(parts) > 1 and re.search(r'\d+', parts[1], flags=re.IGNORECASE):
-             title = parts[0].strip()
-    title = re.sub(r'_\d+$', '', title).strip()
-    title = re.sub(r'\s*\(\d{4}\)$', '', title).strip()
-    title = re.sub(r'\s*\d{4}$', '', title).strip()
-    title = re.sub(r'\s*\[.*?\]', '', title, flags=re.DOTALL).strip()
-    title = re.sub(r'\s*\(.*?\)', '', title, flags=re.DOTALL).strip() 
-    title = re.sub(r'\s+', ' ', title).strip()
-    title = re.sub(r'[_\-\s]+$', '', title).strip() 
-    return title
-
-def parse_episode_info(filename):
-    match = re.search(r'[Ss](\d+)[Ee](\d+)', filename, re.IGNORECASE)
-    if match: return int(match.group(1)), int(match.group(2))
-    match = re.search(r'(\d+)[xX](\d+)', filename, re.IGNORECASE)
-    if match: return int(match.group(1)), int(match.group(2))
-    path_match = re.search(r'[Ss]taffel\s*(\d+)', filename, re.IGNORECASE)
-    if path_match:
-         season = int(path_match.group(1))
-         match = re.search(r'(\d{1,3})$', filename.replace(path_match.group(0), ''), re.IGNORECASE)
-         if match: return season, int(match.group(1))
-    return 1, 1
-
-def load_db():
-    if os.path.exists(DB_FILE):
-        with open(DB_FILE, 'r', encoding='utf-8') as f:
-            try: return json.load(f)
-            except json.JSONDecodeError:
-                log_message("Konnte JSON-Datenbank nicht lesen. Erstelle neue.", is_error=True)
-                return {}
-    return {}
+def source_for_id(file_unique_id):
+    """Konfiguration der Video-Quelle zum Präfix der Datei-ID (z.B. 'Filme_...' -> Filme) oder None."""
+    for source_config in VIDEO_SOURCES.values():
+        root_path = source_config['source_path']
+        if not root_path:
+            continue
+        prefix = os.path.basename(os.path.normpath(root_path)).replace('.', '_') + '_'
+        if file_unique_id.startswith(prefix):
+            return source_config
+    return None
+
+def media_type_for_id(file_unique_id):
+    """Leitet den Medientyp aus dem Präfix der Datei-ID ab (z.B. 'Filme_...' -> movie)."""
+    source_config = source_for_id(file_unique_id)
+    return source_config['type'] if source_config else None
+
+def migrate_legacy_files():
+    """Übernimmt beim ersten Start eine vorhandene metadata.json und das alte JSON-Scan-Manifest in die DB."""
+    if store.count() == 0 and os.path.exists(DB_FILE) and os.path.getsize(DB_FILE) > 0:
+        try:
+            imported = store.import_json(DB_FILE, media_type_for_id)
+            log_message(f"{imported} Einträge aus metadata.json in die Datenbank übernommen.")
+        except (json.JSONDecodeError, OSError) as e:
+            log_message(f"Konnte metadata.json nicht übernehmen: {e}", is_error=True)
+    store.assign_missing_media_types(media_type_for_id)
+
+    if os.path.exists(LEGACY_MANIFEST_FILE):
+        try:
+            with open(LEGACY_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                store.save_manifest(json.load(f))
+            os.remove(LEGACY_MANIFEST_FILE)
+            log_message("Scan-Manifest in die Datenbank übernommen.")
+        except (json.JSONDecodeError, OSError) as e:
+            log_message(f"Konnte altes Scan-Manifest nicht übernehmen: {e}", is_error=True)
 
-def save_db(db):
+def migrate_thumb_names():
+    """Stellt thumbs/ einmalig auf eine gemeinsame Datei je TMDB-Bild um (siehe ThumbsGC.migrate_shared_names)."""
+    if store.get_meta(THUMBS_LAYOUT_KEY, 1) >= THUMBS_LAYOUT_VERSION:
+        return
+    moved, removed, freed = thumbs_gc.migrate_shared_names(store, image_downloader.web_url)
+    store.commit()
+    store.set_meta(THUMBS_LAYOUT_KEY, THUMBS_LAYOUT_VERSION)
+    if moved:
+        log_message(f"thumbs/ umgestellt: {moved} Einträge nutzen gemeinsame Bilder, {removed} doppelte Dateien gelöscht ({format_size(freed)}).")
+
+def export_db():
+    """
+    Exportiert metadata.json und die statischen Shards unter library/ atomar,
+    aber nur wenn sich die DB seit dem letzten Export geändert hat. Danach werden
+    die gzip/Brotli-Fassungen im Webroot nachgezogen (siehe precompress.py).
+    """
+    try:
+        if store.export_json(DB_FILE):
+            log_message("metadata.json aktualisiert.")
+    except Exception as e:
+        log_message(f"FEHLER beim Export von metadata.json: {e}", is_error=True)
     try:
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(db, f, indent=4, ensure_ascii=False)
+        written = static_library.write(store)
+        if written:
+            log_message(f"{written} Dateien unter library/ aktualisiert.")
     except Exception as e:
-        log_message(f"FEHLER beim Speichern der Datenbank: {e}", is_error=True)
+        log_message(f"FEHLER beim Schreiben der Shards unter library/: {e}", is_error=True)
+    try:
+        compressed = update_precompressed(WWWROOT_PATH, (LIBRARY_DIR,))
+        if compressed:
+            log_message(f"{compressed} vorkomprimierte Dateien (gzip/brotli) aktualisiert.")
+    except Exception as e:
+        log_message(f"FEHLER beim Vorkomprimieren der Dateien im Webroot: {e}", is_error=True)
 
-def download_image(url, filename):
-    if not url: return ""
-    os.makedirs(THUMBS_DIR, exist_ok=True)
-    local_path = os.path.join(THUMBS_DIR, filename)
-    
-    if os.path.exists(local_path):
-        return os.path.join(THUMBS_WEB_PATH, filename).replace('\\', '/')
-    
+def collect_thumbs(dry_run=False):
+    """Thumbnail-GC (siehe thumbs_gc.py). DB-Änderungen durch das Größenlimit committet der Aufrufer."""
+    plan, deleted = thumbs_gc.run(store, dry_run=dry_run)
+    image_downloader.forget(deleted)
+    for line in report_lines(plan, dry_run):
+        log_message(line)
+    return plan
+
+def file_signature(relative_path, stat_result):
+    """Merkmale, an denen ein Scan erkennt, ob sich eine Datei verändert hat."""
+    return {
+        'path': relative_path,
+        'size': stat_result.st_size,
+        'mtime': stat_result.st_mtime_ns,
+        'inode': stat_result.st_ino,
+    }
+
+def same_file(known_signature, signature):
+    """Passt der Manifest-Eintrag zu den aktuellen Merkmalen aus file_signature (der Fingerprint zählt nicht)?"""
+    return known_signature is not None and all(known_signature.get(key) == value for key, value in signature.items())
+
+def file_fingerprint(full_path, size):
+    """
+    Inhaltsmerkmal, das Umbenennen und Verschieben übersteht: SHA-1 über Größe, die ersten und die
+    letzten FINGERPRINT_BLOCK Bytes. Liest auch bei großen Videos nur 128 KB. None, wenn nicht lesbar.
+    """
+    digest = hashlib.sha1(str(size).encode())
     try:
-        log_message(f"Downloade Bild: {filename}")
-        response = requests.get(url, stream=True, timeout=10)
-        response.raise_for_status()
-        with open(local_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192): file.write(chunk)
-        return os.path.join(THUMBS_WEB_PATH, filename).replace('\\', '/')
+        with open(full_path, 'rb') as f:
+            digest.update(f.read(FINGERPRINT_BLOCK))
+            if size > 2 * FINGERPRINT_BLOCK:
+                f.seek(-FINGERPRINT_BLOCK, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_BLOCK))
+    except OSError as e:
+        log_message(f"Konnte Fingerprint für '{full_path}' nicht berechnen: {e}", is_error=True)
+        return None
+    return digest.hexdigest()
+
+def relink_moved_files(jobs, missing):
+    """
+    Ordnet neue Dateien verschwundenen zu, bevor TMDB gefragt wird (serien_renamer.py, verschobene
+    Ordner). Schneller Treffer: gleicher Inode mit gleicher Größe und mtime (Umbenennen im selben
+    Dateisystem), sonst gleicher Fingerprint (z.B. von einem anderen Laufwerk verschoben). Der
+    DB-Eintrag wandert samt TMDB-Daten und Bildern unter die neue Datei-ID.
+    missing: {Datei-ID: Manifest-Eintrag} verschwundener Dateien mit DB-Eintrag.
+    Gibt (noch abzufragende Jobs, [(übernommener Job, alte Datei-ID), ...]) zurück.
+    """
+    by_inode, by_fingerprint = {}, {}
+    for file_id, known in missing.items():
+        by_inode.setdefault((known['inode'], known['size'], known['mtime']), file_id)
+        if known.get('fingerprint'):
+            by_fingerprint.setdefault((known['size'], known['fingerprint']), file_id)
+
+    remaining, moved, taken = [], [], set()
+    for job in jobs:
+        signature = job['signature']
+        old_id = None
+        if missing and job['file_unique_id'] not in store:
+            old_id = by_inode.get((signature['inode'], signature['size'], signature['mtime']))
+            if old_id is None and signature.get('fingerprint'):
+                old_id = by_fingerprint.get((signature['size'], signature['fingerprint']))
+        if (old_id is None or old_id in taken or media_type_for_id(old_id) != job['media_type']
+                or not store.rename(old_id, job['file_unique_id'])):
+            remaining.append(job)
+            continue
+        taken.add(old_id)
+        moved.append((job, old_id))
+        log_message(f"Verschoben/umbenannt: {old_id} -> {job['file_unique_id']}")
+    return remaining, moved
+
+def file_identity(full_path, root_path):
+    """(Datei-ID, Pfad relativ zum Elternordner der Quelle) einer Videodatei."""
+    relative_path_for_id = os.path.relpath(full_path, os.path.dirname(root_path))
+    return relative_path_for_id.replace(os.sep, '_').replace('.', '_'), relative_path_for_id
+
+def build_lookup_job(file_unique_id, relative_path_for_id, media_type, signature):
+    """Metadaten-Abfrage für run_lookup_stage, None wenn der bereinigte Titel leer ist."""
+    # Teile unterhalb des Quellordners, z.B. ['Arrow', 'Staffel 2', 'Folge 05.mkv']
+    parts = relative_path_for_id.replace('\\', '/').split('/')[1:] or [relative_path_for_id]
+    parsed = parse_media_path(parts, is_tv=(media_type == 'tv'))
+
+    if not parsed.title:
+        log_message(f"Bereinigter Titel für '{parts[-1]}' ist leer. Überspringe.")
+        return None
+
+    # Staffel/Episode 0 = nicht erkannt: dann nur die Serie zuordnen, keine Episodendaten raten
+    season_num, episode_num = 0, 0
+    if media_type == 'tv' and parsed.season is not None and parsed.episode is not None:
+        season_num, episode_num = parsed.season, parsed.episode
+
+    return {
+        'file_unique_id': file_unique_id,
+        'title': parsed.title,
+        'year': parsed.year if media_type == 'movie' else None,
+        'media_type': media_type,
+        'season': season_num,
+        'episode': episode_num,
+        'folder': os.path.dirname(relative_path_for_id),
+        'signature': signature,
+    }
+
+def iter_video_files(root_path):
+    """Durchläuft root_path rekursiv und liefert (Pfad, stat) für jede Videodatei."""
+    pending_dirs = [root_path]
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending_dirs.append(entry.path)
+                        elif entry.name.lower().endswith(ALLOWED_EXTENSIONS):
+                            yield entry.path, entry.stat()
+                    except OSError as e:
+                        log_message(f"Konnte '{entry.path}' nicht lesen: {e}", is_error=True)
+        except OSError as e:
+            log_message(f"Konnte Ordner '{current_dir}' nicht lesen: {e}", is_error=True)
+
+def image_requests_for(data, media_type):
+    """
+    Welche lokalen Bilder ein Eintrag braucht: Liste aus (DB-Feld, URL, Dateiname).
+    Die Dateinamen hängen nur vom TMDB-Bild ab, alle Episoden einer Serie teilen sich Poster und Backdrop.
+    """
+    images = []
+    if data.get('poster_path'):
+        images.append(('poster_local_url', f"{IMAGE_BASE_URL}{POSTER_SIZE}{data['poster_path']}", image_filename(data['poster_path'], 'p')))
+    if data.get('backdrop_path'):
+        images.append(('backdrop_local_url', f"{IMAGE_BASE_URL}{BACKDROP_SIZE}{data['backdrop_path']}", image_filename(data['backdrop_path'], 'b')))
+    if media_type == 'tv' and data.get('episode_still_path'):
+        images.append(('episode_still_local_url', f"{IMAGE_BASE_URL}{BACKDROP_SIZE}{data['episode_still_path']}", image_filename(data['episode_still_path'], 'e')))
+    return images
+
+
+class TVLookupCache:
+    """
+    Merkt sich während eines Scans die Serien-Treffer je (Titel, Ordner) und die Episoden je Staffel.
+    So kostet eine Staffel mit 22 Episoden eine Suche und einen Staffel-Request statt 44 Requests.
+    Worker, die gleichzeitig dieselbe Serie brauchen, warten auf den ersten statt selbst anzufragen.
+    """
+
+    def __init__(self):
+        self.series = {}
+        self.seasons = {}
+        self.lock = Lock()
+        self.key_locks = {}
+
+    def _memoize(self, store, key, loader):
+        if key in store:
+            return store[key]
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, Lock())
+        with key_lock:
+            if key not in store:
+                store[key] = loader()
+        return store[key]
+
+    def series_result(self, title, folder):
+        def load():
+            log_message(f"Cache-Miss, frage TMDB ab für Serie: {title} ({folder})")
+            response = tmdb_api.search_tv(title)
+            return next((item for item in response['results']), None)
+        return self._memoize(self.series, (title, folder), load)
+
+    def season_episodes(self, tv_id, season):
+        def load():
+            log_message(f"  -> Lade Episoden-Infos für Staffel {season} (TMDB-ID {tv_id})")
+            season_details = tmdb_api.tv_season(tv_id, season)
+            return {ep['episode_number']: ep for ep in season_details.get('episodes', [])}
+        return self._memoize(self.seasons, (tv_id, season), load)
+
+
+# Genre-ID -> Name je Medientyp, einmal pro Prozess aus /genre/<typ>/list (liegt 30 Tage im TMDB-Cache)
+GENRE_NAMES = {}
+GENRE_NAMES_LOCK = Lock()
+
+def genre_names_by_id(media_type):
+    with GENRE_NAMES_LOCK:
+        if media_type not in GENRE_NAMES:
+            try:
+                response = tmdb_api.genre_list(media_type)
+            except Exception as e:
+                # Nicht merken: beim nächsten Eintrag wird es erneut versucht
+                log_message(f"Konnte TMDB-Genreliste ({media_type}) nicht laden: {e}", is_error=True)
+                return {}
+            GENRE_NAMES[media_type] = {g['id']: g['name'] for g in response.get('genres', [])}
+        return GENRE_NAMES[media_type]
+
+def genres_for(result, media_type):
+    """Genre-Namen eines TMDB-Treffers: Detailseiten liefern 'genres', Suchergebnisse nur 'genre_ids'."""
+    if result.get('genres'):
+        return [g['name'] for g in result['genres']]
+    if not result.get('genre_ids'):
+        return []
+    names = genre_names_by_id(media_type)
+    return [names[genre_id] for genre_id in result['genre_ids'] if genre_id in names]
+
+def backfill_genres(data, media_type):
+    """
+    Einträge aus früheren Scans haben leere Genres (Suchergebnisse enthielten nur genre_ids).
+    Holt sie einmalig über die Detailseite nach; ohne Treffer im Offline-Modus bleibt die Liste leer.
+    """
+    try:
+        details = tmdb_api.movie_info(data['tmdb_id']) if media_type == 'movie' else tmdb_api.tv_info(data['tmdb_id'])
+    except OfflineCacheMiss:
+        return
     except Exception as e:
-        log_message(f"FEHLER beim Download von {url}: {e}", is_error=True)
-        return ""
+        log_message(f"Konnte Genres für '{data.get('title')}' nicht laden: {e}", is_error=True)
+        return
+    data['genres'] = genres_for(details, media_type)
 
 
-def fetch_and_cache_metadata(title, media_type, file_unique_id, db, season=0, episode=0):
+def fetch_metadata(title, media_type, file_unique_id, cached=None, season=0, episode=0, folder='', tv_lookup=None, year=None):
+    """
+    Läuft in einem Worker-Thread: liefert den DB-Eintrag für eine Datei, ohne die DB anzufassen.
+    Rückgabe None bedeutet Fehler; die Datei wird dann beim nächsten Scan erneut versucht.
+    """
     # 1. CACHE-HIT PRÜFUNG & BILD-RECHECK
-    if file_unique_id in db:
-        data = db[file_unique_id]
-        if data.get('not_found'):
-            return None 
-        
-        # Re-Check, ob lokale Bilder noch vorhanden sind
-        if data.get('poster_path'):
-            data['poster_local_url'] = download_image(f"{IMAGE_BASE_URL}{POSTER_SIZE}{data['poster_path']}", f"{file_unique_id}_p.jpg")
-            
-        if data.get('backdrop_path'):
-            data['backdrop_local_url'] = download_image(f"{IMAGE_BASE_URL}{BACKDROP_SIZE}{data['backdrop_path']}", f"{file_unique_id}_b.jpg")
-        
-        if media_type == 'tv' and data.get('episode_still_path'):
-            data['episode_still_local_url'] = download_image(f"{IMAGE_BASE_URL}{BACKDROP_SIZE}{data['episode_still_path']}", f"{file_unique_id}_e.jpg")
-                 
-        log_message(f"Cache-Hit für: {title}")
+    if cached is not None:
+        # Kein Log je Treffer: bei großen Bibliotheken wären das zehntausende Zeilen,
+        # die Anzahl steht im Fortschritt und in der Zusammenfassung
+        if cached.get('not_found'):
+            return cached
+        data = dict(cached)
+        if not data.get('genres') and data.get('tmdb_id') and media_type in ('movie', 'tv'):
+            backfill_genres(data, media_type)
         return data
 
-    # 2. CACHE-MISS: TMDB ABFRAGE
-    log_message(f"Cache-Miss, frage TMDB ab für: {title} ({media_type})")
+    # 2. CACHE-MISS: TMDB ABFRAGE (Serien nur einmal pro Titel und Ordner)
+    if tv_lookup is None:
+        tv_lookup = TVLookupCache()
     
     try:
-        search = tmdb.Search()
-        
         if media_type == 'movie':
-            response = search.movie(query=title, language='de-DE')
+            log_message(f"Cache-Miss, frage TMDB ab für: {title} ({media_type})")
+            response = tmdb_api.search_movie(title, year=year)
+            if year and not response['results']:
+                # Jahr im Dateinamen kann vom TMDB-Erscheinungsjahr abweichen
+                response = tmdb_api.search_movie(title)
+            result = next((item for item in response['results']), None)
         elif media_type == 'tv':
-            response = search.tv(query=title, language='de-DE')
+            result = tv_lookup.series_result(title, folder)
         else:
             log_message(f"  -> Unbekannter Medientyp: {media_type}")
             return None
-        
-        time.sleep(0.5)
-
-        result = next((item for item in response['results']), None)
 
         if not result:
             log_message("  -> TMDB: Kein passendes Ergebnis gefunden.")
-            db[file_unique_id] = {'not_found': True}
-            return None
+            return {'not_found': True}
 
         # --- BASISDATEN STRUKTUR ---
         if media_type == 'movie':
@@ -199,7 +530,7 @@ def fetch_and_cache_metadata(title, media_type, file_unique_id, db, season=0, ep
                 'tmdb_id': result.get('id'),
                 'title': (result.get('title') if media_type == 'movie' else result.get('name')).strip(),
                 'overview': result.get('overview', 'Keine Beschreibung verfügbar.').strip(),
-                'genres': [g['name'] for g in result.get('genres', [])] if result else [],
+                'genres': genres_for(result, media_type),
                 'poster_path': result.get('poster_path', ''),
                 'backdrop_path': result.get('backdrop_path', ''),
                 'episode_still_path': '', 
@@ -209,69 +540,317 @@ def fetch_and_cache_metadata(title, media_type, file_unique_id, db, season=0, ep
                 'tmdb_id': result.get('id'),
                 'title': result.get('name', '').strip(),
                 'overview': result.get('overview', 'Keine Beschreibung verfügbar.').strip(),
-                'genres': [g['name'] for g in result.get('genres', [])] if result else [],
+                'genres': genres_for(result, media_type),
                 'poster_path': result.get('poster_path', ''),
                 'backdrop_path': result.get('backdrop_path', ''),
                 'episode_still_path': ''
             }
 
-            # --- EPISODEN-DATEN LADEN (falls vorhanden) ---
+            # --- EPISODEN-DATEN AUS DER GECACHTEN STAFFEL ÜBERNEHMEN ---
             if media_type == 'tv' and season > 0 and episode > 0:
                 try:
-                    tv_episode = tmdb.TV_Episodes(data['tmdb_id'], season, episode)
-                    ep_info = tv_episode.info(language='de-DE')
+                    ep_info = tv_lookup.season_episodes(data['tmdb_id'], season).get(episode)
                     if ep_info:
                         data['overview'] = ep_info.get('overview', data['overview'])
                         data['episode_still_path'] = ep_info.get('still_path', '')
                         log_message(f"  -> Episodeninfos gefunden: S{season}E{episode}")
+                except OfflineCacheMiss:
+                    raise
                 except Exception as e:
                     log_message(f"  -> Konnte Episodeninfos nicht laden: {e}")
 
-        # --- LOKALE BILDER HERUNTERLADEN ---
-        poster_filename = f"{file_unique_id}_p.jpg"
-        data['poster_local_url'] = download_image(f"{IMAGE_BASE_URL}{POSTER_SIZE}{data['poster_path']}", poster_filename)
-        
-        backdrop_filename = f"{file_unique_id}_b.jpg"
-        data['backdrop_local_url'] = download_image(f"{IMAGE_BASE_URL}{BACKDROP_SIZE}{data['backdrop_path']}", backdrop_filename)
-
-        if data.get('episode_still_path'):
-            still_filename = f"{file_unique_id}_e.jpg"
-            data['episode_still_local_url'] = download_image(f"{IMAGE_BASE_URL}{BACKDROP_SIZE}{data['episode_still_path']}", still_filename)
-        else:
-            data['episode_still_local_url'] = ""
-
-        db[file_unique_id] = data
+        # Lokale Bilder lädt der ImageDownloader, sobald der Eintrag übernommen wurde
+        data['poster_local_url'] = ""
+        data['backdrop_local_url'] = ""
+        data['episode_still_local_url'] = ""
         return data
 
+    except OfflineCacheMiss as e:
+        # Kein not_found-Eintrag: die Datei wird beim nächsten Online-Scan normal abgefragt
+        log_message(f"{e} Überspringe '{title}'.")
+        return None
     except Exception as e:
         log_message(f"FEHLER bei TMDB-Abfrage für '{title}': {e}", is_error=True)
         return None
 
 
+class ScanCheckpointer:
+    """
+    Sichert den Scan-Fortschritt alle CHECKPOINT_EVERY Einträge oder CHECKPOINT_SECONDS Sekunden:
+    DB-Commit und Manifest-Einträge der fertigen Dateien. Nach einem Absturz macht der nächste Scan
+    dort weiter, statt alle TMDB-Abfragen zu wiederholen. metadata.json und library/ exportiert erst
+    der Aufrufer am Ende (export_db), sonst würden sie bei großen Scans alle paar Sekunden neu geschrieben.
+    """
+
+    def __init__(self):
+        self.pending_manifest = {}
+        self.last_checkpoint = time.monotonic()
+
+    def file_done(self, file_unique_id, signature):
+        self.pending_manifest[file_unique_id] = signature
+        if (len(self.pending_manifest) >= CHECKPOINT_EVERY
+                or time.monotonic() - self.last_checkpoint >= CHECKPOINT_SECONDS):
+            self.flush()
+
+    def flush(self):
+        # Manifest vor dem generation-Wechsel schreiben, damit Leser Einträge nie ohne Pfad sehen
+        if self.pending_manifest:
+            store.upsert_manifest(self.pending_manifest)
+            log_message(f"Checkpoint: {len(self.pending_manifest)} Dateien gesichert.")
+        store.commit()
+        self.pending_manifest = {}
+        self.last_checkpoint = time.monotonic()
+
+
+def run_lookup_stage(jobs, new_manifest):
+    """
+    Verteilt die Metadaten-Abfragen auf TMDB_WORKERS Threads. Die Worker liefern nur Ergebnisse;
+    DB und Manifest werden ausschließlich hier (im Scan-Thread) geschrieben.
+    Bilder werden nach der Übernahme beim ImageDownloader eingeplant. Eine Datei gilt erst als
+    fertig (Manifest/Checkpoint), wenn auch ihre Bilder eingetragen sind.
+    Gibt die Anzahl gefundener Einträge je Medientyp zurück.
+    """
+    found_counts = {'movie': 0, 'tv': 0}
+    if not jobs:
+        return found_counts
+
+    log_message(f"Starte {len(jobs)} Metadaten-Abfragen mit {TMDB_WORKERS} Workern...")
+    tv_lookup = TVLookupCache()
+    checkpointer = ScanCheckpointer()
+    pending_images = {}
+    # Download-Threads melden hier nur, dass ein Bild fertig ist; eingetragen wird im Scan-Thread
+    ready_files = queue.SimpleQueue()
+
+    def file_done(job):
+        new_manifest[job['file_unique_id']] = job['signature']
+        checkpointer.file_done(job['file_unique_id'], job['signature'])
+
+    def apply_images(file_unique_id):
+        job, images = pending_images.pop(file_unique_id)
+        store.update(file_unique_id, {field: future.result() for field, future in images})
+        file_done(job)
+
+    def apply_ready_images():
+        while True:
+            try:
+                file_unique_id = ready_files.get_nowait()
+            except queue.Empty:
+                return
+            entry = pending_images.get(file_unique_id)
+            if entry is not None and all(future.done() for _, future in entry[1]):
+                apply_images(file_unique_id)
+
+    with ThreadPoolExecutor(max_workers=TMDB_WORKERS, thread_name_prefix='tmdb') as pool:
+        futures = {}
+        cache_hits = 0
+        for job in jobs:
+            cached = store.get(job['file_unique_id'])
+            cache_hits += cached is not None
+            future = pool.submit(
+                fetch_metadata,
+                job['title'],
+                job['media_type'],
+                job['file_unique_id'],
+                cached=cached,
+                season=job['season'],
+                episode=job['episode'],
+                folder=job['folder'],
+                tv_lookup=tv_lookup,
+                year=job.get('year'),
+            )
+            futures[future] = job
+
+        # Einziger Committer: Ergebnisse in der Reihenfolge ihres Eintreffens übernehmen
+        scan_state.set_progress(0, len(jobs))
+        last_progress = time.monotonic()
+        for done, future in enumerate(as_completed(futures), 1):
+            if done == len(jobs) or time.monotonic() - last_progress >= PROGRESS_SECONDS:
+                scan_state.set_progress(done, len(jobs))
+                last_progress = time.monotonic()
+            apply_ready_images()
+            job = futures[future]
+            data = future.result()
+            if data is None:
+                continue
+
+            file_unique_id = job['file_unique_id']
+            store.put(file_unique_id, data, media_type=job['media_type'])
+            if data.get('not_found'):
+                file_done(job)
+                continue
+
+            found_counts[job['media_type']] += 1
+            images = [(field, image_downloader.submit(url, filename))
+                      for field, url, filename in image_requests_for(data, job['media_type'])]
+            if not images:
+                file_done(job)
+                continue
+            pending_images[file_unique_id] = (job, images)
+            for _, image_future in images:
+                image_future.add_done_callback(lambda _f, file_id=file_unique_id: ready_files.put(file_id))
+
+    METADATA_LOOKUPS.labels('db').inc(cache_hits)
+    METADATA_LOOKUPS.labels('tmdb').inc(len(jobs) - cache_hits)
+    log_message(f"{len(jobs)} Metadaten-Abfragen fertig ({cache_hits} aus dem lokalen Datenbestand).")
+    if pending_images:
+        log_message(f"Warte auf Bilder für {len(pending_images)} Einträge...")
+    for file_unique_id in list(pending_images):
+        apply_images(file_unique_id)
+    checkpointer.flush()
+
+    return found_counts
+
+
+def run_variant_stage(file_ids=None):
+    """
+    Baut fehlende oder veraltete WebP/AVIF-Fassungen und Platzhalter (siehe image_variants.py)
+    im Prozess-Pool und trägt sie in die Einträge ein. Ohne file_ids für alle Einträge, so bekommen
+    auch Bilder aus älteren Scans und aus dem Metadaten-Editor ihre Fassungen. Committet nicht.
+    Jede Bilddatei wird höchstens einmal umgerechnet; Einträge, die sich eine Datei teilen (z.B. die
+    Episoden einer Serie), übernehmen vorhandene Fassungen voneinander.
+    Gibt die Anzahl aktualisierter Einträge zurück.
+    """
+    if not variant_builder.enabled:
+        return 0
+    values = {}
+    for file_id, field, value in store.image_urls(tuple(VARIANT_FIELDS) + tuple(VARIANT_FIELDS.values()) + tuple(LQIP_FIELDS.values())):
+        if file_ids is None or file_id in file_ids:
+            values[file_id, field] = value
+
+    # Dateiname -> Bild-Feld, Einträge, gültige Fassungen und Platzhalter (soweit schon vorhanden)
+    images = {}
+    for (file_id, field), url in values.items():
+        variants_field = VARIANT_FIELDS.get(field)
+        if variants_field is None:
+            continue
+        filename = url.replace('\\', '/').rsplit('/', 1)[-1]
+        if not image_downloader.exists(filename):
+            continue
+        image = images.setdefault(filename, {'field': field, 'file_ids': [], 'variants': None, 'lqip': None})
+        image['file_ids'].append(file_id)
+        variants = json.loads(values.get((file_id, variants_field), 'null'))
+        if image['variants'] is None and variant_builder.formats and variant_builder.up_to_date(variants, image_downloader.exists):
+            image['variants'] = variants
+        if image['lqip'] is None and field in LQIP_FIELDS:
+            image['lqip'] = values.get((file_id, LQIP_FIELDS[field]))
+
+    tasks = []
+    for filename, image in images.items():
+        with_variants = bool(variant_builder.formats) and image['variants'] is None
+        with_lqip = bool(variant_builder.lqip_format) and image['field'] in LQIP_FIELDS and image['lqip'] is None
+        if with_variants or with_lqip:
+            tasks.append((filename, filename, with_variants, with_lqip))
+    if tasks:
+        log_message(f"Erzeuge Bild-Fassungen und Platzhalter für {len(tasks)} Bilder...")
+        for filename, variants, lqip in variant_builder.build(tasks):
+            image = images[filename]
+            if variants is not None:
+                image['variants'] = variants
+                image_downloader.remember(url.rsplit('/', 1)[-1] for url in variant_urls(variants))
+            if lqip is not None:
+                image['lqip'] = lqip
+
+    updated = 0
+    for image in images.values():
+        field = image['field']
+        for file_id in image['file_ids']:
+            fields = {}
+            if image['variants'] is not None and json.loads(values.get((file_id, VARIANT_FIELDS[field]), 'null')) != image['variants']:
+                fields[VARIANT_FIELDS[field]] = image['variants']
+            if image['lqip'] is not None and values.get((file_id, LQIP_FIELDS[field])) != image['lqip']:
+                fields[LQIP_FIELDS[field]] = image['lqip']
+            if fields:
+                store.update(file_id, fields)
+                updated += 1
+    if tasks or updated:
+        log_message(f"{len(tasks)} Bilder umgerechnet, {updated} Einträge aktualisiert.")
+    return updated
+
+
+def run_probe_stage(signatures):
+    """
+    Liest Dauer, Auflösung, Codecs und Tonspuren per ffprobe (siehe media_probe.py) für die
+    übergebenen Dateien, deren media_info fehlt oder nicht mehr zu Größe und mtime passt. Der Scan
+    übergibt nur neue und geänderte Dateien; ältere Einträge ohne Daten holt --probe-all nach.
+    ffprobe läuft im Prozess-Pool. Committet nicht.
+    signatures: {Datei-ID: Merkmale aus file_signature}. Gibt die Anzahl aktualisierter Einträge zurück.
+    """
+    if not MEDIA_PROBE:
+        return 0
+    known = {file_id: json.loads(value) for file_id, _field, value in store.field_values((MEDIA_INFO_FIELD,))}
+    existing = store.not_found_flags()
+    tasks = []
+    for file_id, signature in signatures.items():
+        source_config = source_for_id(file_id)
+        if (file_id not in existing or source_config is None
+                or is_current(known.get(file_id), signature['size'], signature['mtime'])):
+            continue
+        full_path = os.path.join(os.path.dirname(os.path.normpath(source_config['source_path'])), signature['path'])
+        tasks.append((file_id, full_path, signature['size'], signature['mtime']))
+    if not tasks or not media_prober.available:
+        return 0
+
+    log_message(f"Lese technische Daten (ffprobe) von {len(tasks)} Dateien mit {media_prober.workers} Prozessen...")
+    updated = 0
+    scan_state.set_progress(0, len(tasks))
+    last_progress = time.monotonic()
+    for done, (file_id, info) in enumerate(media_prober.probe_many(tasks), 1):
+        if done == len(tasks) or time.monotonic() - last_progress >= PROGRESS_SECONDS:
+            scan_state.set_progress(done, len(tasks))
+            last_progress = time.monotonic()
+        if info is not None and store.update(file_id, {MEDIA_INFO_FIELD: info}):
+            updated += 1
+    log_message(f"Technische Daten von {updated} Dateien gespeichert.")
+    return updated
 
 
 # ------------------------------------------------
-# HAUPT-SCAN-TASK (Wird im Thread ausgeführt)
+# HAUPT-SCAN-TASK (läuft im eigenen Prozess, siehe run_scan_worker)
 # ------------------------------------------------
 
-def run_metadata_update_task():
-    global scan_status
-    
-    if scan_status == "RUNNING": return
+class PhaseTimer:
+    """Misst die nacheinander ablaufenden Scan-Phasen (nur zwei Zeitstempel je Phase)."""
 
-    scan_status = "RUNNING"
-    current_log.clear()
+    def __init__(self):
+        self.started = self.phase_started = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        SCAN_PHASE_SECONDS.labels(phase).observe(now - self.phase_started)
+        self.phase_started = now
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+def run_metadata_update_task(full_rescan=False):
+    scan_state.begin(os.getpid(), full_rescan)
+    phases = PhaseTimer()
     log_message("Starte Scan und Caching...")
+    if TMDB_OFFLINE:
+        log_message("Offline-Modus aktiv: TMDB-Daten kommen ausschließlich aus dem lokalen Cache.")
     
     try:
-        if not TMDB_API_KEY:
+        if not TMDB_API_KEY and not TMDB_OFFLINE:
             raise ValueError("TMDB_API_KEY fehlt.")
 
-        db = load_db()
+        migrate_legacy_files()
+        migrate_thumb_names()
+        known_ids = store.not_found_flags()
+        image_downloader.build_index()
+        # Beim vollständigen Scan wird das Manifest ignoriert und jede Datei neu geprüft
+        known_manifest = store.load_manifest()
+        manifest = {} if full_rescan else known_manifest
+        new_manifest = {}
         found_file_ids = set() 
         
         movie_count = 0
         tv_episode_count = 0
+        added_count = 0
+        changed_count = 0
+        unchanged_count = 0
+        lookup_jobs = []
+        job_is_new = {}
+        phases.lap('prepare')
 
         for menu_name, source_config in VIDEO_SOURCES.items():
             
@@ -280,66 +859,84 @@ def run_metadata_update_task():
             
             log_message(f"Starte Scan für Kategorie: {menu_name} ({media_type})")
             
-            if not os.path.isdir(root_path):
+            if not root_path or not os.path.isdir(root_path):
                  log_message(f"Pfad '{root_path}' existiert nicht. Überspringe.", is_error=True)
                  continue
                  
-            for dirpath, dirnames, filenames in os.walk(root_path):
+            for full_path, stat_result in iter_video_files(root_path):
+                file_unique_id, relative_path_for_id = file_identity(full_path, root_path)
                 
-                for filename in filenames:
-                    if filename.lower().endswith(ALLOWED_EXTENSIONS):
-                        
-                        relative_path_for_id = os.path.relpath(os.path.join(dirpath, filename), os.path.dirname(root_path))
-                        file_unique_id = relative_path_for_id.replace(os.sep, '_').replace('.', '_')
-                        
-                        found_file_ids.add(file_unique_id) 
-                        
-                        raw_title = os.path.splitext(filename)[0]
-                        is_tv = (media_type == 'tv')
-                        title_search = clean_title_for_search(raw_title, is_tv=is_tv)
+                found_file_ids.add(file_unique_id) 
 
-                        if not title_search:
-                            log_message(f"Bereinigter Titel für '{raw_title}' ist leer. Überspringe.")
-                            continue
-                        
-                        # NEU: S/E-Nummern VOR dem Metadaten-Abruf extrahieren
-                        season_num, episode_num = 0, 0
-                        if media_type == 'tv':
-                             season_num, episode_num = parse_episode_info(raw_title)
-                             
-                        # Metadaten abrufen/cachen
-                        metadata = fetch_and_cache_metadata(
-                            title_search, 
-                            media_type, 
-                            file_unique_id, 
-                            db,
-                            season=season_num, # S/E-Nummern übergeben
-                            episode=episode_num 
-                        )
-                        
-                        if metadata:
-                            if media_type == 'movie':
-                                movie_count += 1
-                            elif media_type == 'tv':
-                                tv_episode_count += 1
+                # Unveränderte Dateien (laut Manifest) werden komplett übersprungen
+                signature = file_signature(relative_path_for_id, stat_result)
+                known_signature = manifest.get(file_unique_id)
+                if same_file(known_signature, signature) and file_unique_id in known_ids:
+                    new_manifest[file_unique_id] = known_signature
+                    unchanged_count += 1
+                    if not known_ids[file_unique_id]:
+                        if media_type == 'movie':
+                            movie_count += 1
+                        elif media_type == 'tv':
+                            tv_episode_count += 1
+                    continue
+
+                if known_signature is None:
+                    added_count += 1
+                else:
+                    changed_count += 1
+
+                # Abfrage vormerken, die eigentliche Arbeit übernimmt run_lookup_stage
+                signature['fingerprint'] = file_fingerprint(full_path, stat_result.st_size)
+                job = build_lookup_job(file_unique_id, relative_path_for_id, media_type, signature)
+                if job:
+                    lookup_jobs.append(job)
+                    job_is_new[file_unique_id] = known_signature is None
                         
             log_message(f"Kategorie {menu_name} abgeschlossen.")
+
+        # Umbenannte/verschobene Dateien übernehmen ihren alten Eintrag statt einer neuen TMDB-Abfrage
+        missing = {file_id: known for file_id, known in known_manifest.items()
+                   if file_id not in found_file_ids and file_id in known_ids}
+        lookup_jobs, moved = relink_moved_files(lookup_jobs, missing)
+        for job, old_id in moved:
+            new_manifest[job['file_unique_id']] = job['signature']
+            if job_is_new[job['file_unique_id']]:
+                added_count -= 1
+            else:
+                changed_count -= 1
+            if not known_ids[old_id]:
+                if job['media_type'] == 'movie':
+                    movie_count += 1
+                elif job['media_type'] == 'tv':
+                    tv_episode_count += 1
+        moved_count = len(moved)
+        phases.lap('walk')
+        # Metadaten für neue und geänderte Dateien parallel abrufen
+        found_counts = run_lookup_stage(lookup_jobs, new_manifest)
+        phases.lap('lookup')
+        movie_count += found_counts['movie']
+        tv_episode_count += found_counts['tv']
+        try:
+            run_probe_stage({job['file_unique_id']: job['signature'] for job in lookup_jobs})
+        except Exception as e:
+            log_message(f"FEHLER beim Lesen der technischen Daten: {e}", is_error=True)
+        phases.lap('probe')
             
         # ----------------------------------------------------
         # BEREINIGUNG DER VERWAISTEN EINTRÄGE
         # ----------------------------------------------------
-        log_message("\n--- Starte Bereinigung der verwaisten Einträge (metadata.json) ---")
+        log_message("\n--- Starte Bereinigung der verwaisten Einträge (Datenbank) ---")
         
         keys_to_delete = []
-        for file_unique_id in db.keys():
+        for file_unique_id in store.ids():
             if file_unique_id not in found_file_ids:
                 keys_to_delete.append(file_unique_id)
         
-        deleted_count = 0
         for key in keys_to_delete:
             log_message(f"Entferne verwaisten Eintrag: {key}")
-            del db[key]
-            deleted_count += 1
+        store.delete(keys_to_delete)
+        deleted_count = len(keys_to_delete)
             
         if deleted_count > 0:
             log_message(f"✅ Bereinigung abgeschlossen. {deleted_count} verwaiste Einträge wurden entfernt.")
@@ -348,18 +945,272 @@ def run_metadata_update_task():
             
         # ----------------------------------------------------
         
-        save_db(db)
+        phases.lap('cleanup')
+        try:
+            run_variant_stage()
+        except Exception as e:
+            log_message(f"FEHLER beim Erzeugen der Bild-Fassungen: {e}", is_error=True)
+        phases.lap('variants')
+        if THUMBS_GC:
+            log_message("\n--- Starte Bereinigung der Bilder (thumbs) ---")
+            try:
+                collect_thumbs()
+            except Exception as e:
+                log_message(f"FEHLER beim Aufräumen der Bilder: {e}", is_error=True)
+            phases.lap('thumbs')
+        store.save_manifest(new_manifest)
+        store.commit()
+        export_db()
+        phases.lap('save')
+
+        for result, count in (('added', added_count), ('changed', changed_count), ('moved', moved_count),
+                              ('unchanged', unchanged_count), ('deleted', deleted_count)):
+            SCAN_FILES.labels(result).inc(count)
+        duration = phases.total()
+        SCAN_LAST_DURATION.set(duration)
+        SCAN_FILES_PER_SECOND.set((added_count + changed_count + moved_count + unchanged_count) / duration if duration else 0)
+        SCAN_LAST_SUCCESS.set(time.time())
+        SCANS.labels('ok').inc()
         
         log_message(f"\n========================================================")
         log_message(f"GESAMT ERFOLGREICH!")
         log_message(f"Aktualisiert: {movie_count} Filme und {tv_episode_count} Episoden.")
+        log_message(f"Dateien: {added_count} neu, {changed_count} geändert, {moved_count} verschoben, {deleted_count} entfernt, {unchanged_count} unverändert.")
         log_message(f"========================================================")
 
-        scan_status = "FINISHED_OK"
+        scan_state.finish("FINISHED_OK")
 
     except Exception as e:
         log_message(f"Ein kritischer Fehler ist aufgetreten: {e}", is_error=True)
-        scan_status = "FINISHED_ERROR"
+        SCANS.labels('error').inc()
+        scan_state.finish("FINISHED_ERROR")
+    finally:
+        # Download-Threads beenden, der nächste Lauf startet den Pool bei Bedarf neu
+        image_downloader.shutdown()
+
+# ------------------------------------------------
+# WATCHER-MODUS (python video_update.py --watch)
+# ------------------------------------------------
+
+def source_for_path(path):
+    """(Quellordner, Medientyp) der Video-Quelle, unter der path liegt, sonst (None, None)."""
+    path = os.path.abspath(path)
+    for source_config in VIDEO_SOURCES.values():
+        root_path = source_config['source_path']
+        if not root_path:
+            continue
+        root_path = os.path.abspath(root_path)
+        if path == root_path or path.startswith(root_path.rstrip(os.sep) + os.sep):
+            return root_path, source_config['type']
+    return None, None
+
+def apply_changed_paths(paths):
+    """
+    Gleicht nur die gemeldeten Pfade ab, ohne Baumdurchlauf über die ganze Bibliothek:
+    neue/geänderte Videodateien (auch in neuen Ordnern) gehen durch run_lookup_stage,
+    verschwundene Dateien und Ordner werden aus DB und Manifest entfernt. Taucht eine
+    verschwundene Datei unter neuem Pfad wieder auf, behält sie ihren Eintrag (relink_moved_files).
+    """
+    jobs = []
+    removed = set()
+    for path in sorted(paths):
+        root_path, media_type = source_for_path(path)
+        if root_path is None:
+            continue
+        if os.path.isdir(path):
+            files = iter_video_files(path)
+        elif os.path.isfile(path):
+            try:
+                files = [(path, os.stat(path))]
+            except OSError:
+                continue
+        else:
+            # Gelöscht oder weggeschoben: alles, was im Manifest darunter liegt
+            file_unique_id, relative_path_for_id = file_identity(path, root_path)
+            removed.update(store.manifest_ids_under(relative_path_for_id))
+            if file_unique_id in store:
+                removed.add(file_unique_id)
+            continue
+
+        for full_path, stat_result in files:
+            if not full_path.lower().endswith(ALLOWED_EXTENSIONS):
+                continue
+            file_unique_id, relative_path_for_id = file_identity(full_path, root_path)
+            signature = file_signature(relative_path_for_id, stat_result)
+            if same_file(store.manifest_entry(file_unique_id), signature) and file_unique_id in store:
+                continue
+            signature['fingerprint'] = file_fingerprint(full_path, stat_result.st_size)
+            job = build_lookup_job(file_unique_id, relative_path_for_id, media_type, signature)
+            if job:
+                jobs.append(job)
+
+    moved = []
+    if removed and jobs:
+        missing = {file_id: store.manifest_entry(file_id) for file_id in removed if file_id in store}
+        jobs, moved = relink_moved_files(jobs, {file_id: known for file_id, known in missing.items() if known})
+    if moved:
+        old_ids = {old_id for _job, old_id in moved}
+        store.upsert_manifest({job['file_unique_id']: job['signature'] for job, _old_id in moved})
+        store.delete_manifest(old_ids)
+        removed -= old_ids
+    if removed:
+        for key in sorted(removed):
+            log_message(f"Entferne Eintrag: {key}")
+        store.delete(removed)
+        store.delete_manifest(removed)
+    if jobs:
+        # committet am Ende selbst (inkl. der Löschungen)
+        run_lookup_stage(jobs, {})
+        signatures = {job['file_unique_id']: job['signature'] for job in jobs}
+        probed = run_probe_stage(signatures)
+        if run_variant_stage(set(signatures)) or probed:
+            store.commit()
+        export_db()
+    elif removed or moved:
+        store.commit()
+        export_db()
+    WATCH_FILES.labels('updated').inc(len(jobs))
+    WATCH_FILES.labels('moved').inc(len(moved))
+    WATCH_FILES.labels('deleted').inc(len(removed))
+    if jobs or moved or removed:
+        log_message(f"Watcher: {len(jobs)} Dateien neu/geändert, {len(moved)} verschoben, {len(removed)} entfernt.")
+
+def create_watchers(roots):
+    """inotify für lokale Ordner, Polling für Netzlaufwerke (oder wenn inotify nicht verfügbar ist)."""
+    inotify_roots, polling_roots = [], []
+    for root in roots:
+        use_inotify = WATCH_BACKEND == 'inotify' or (
+            WATCH_BACKEND == 'auto' and filesystem_type(root) not in NETWORK_FILESYSTEMS)
+        (inotify_roots if use_inotify and inotify_available() else polling_roots).append(root)
+
+    watchers = []
+    if inotify_roots:
+        try:
+            watchers.append(InotifyWatcher(inotify_roots, ALLOWED_EXTENSIONS, log=log_message))
+            log_message(f"Watcher (inotify): {', '.join(inotify_roots)}")
+        except OSError as e:
+            log_message(f"inotify nicht nutzbar ({e}), weiche auf Polling aus.", is_error=True)
+            polling_roots += inotify_roots
+    if polling_roots:
+        watchers.append(PollingWatcher(polling_roots, ALLOWED_EXTENSIONS, interval=WATCH_POLL_SECONDS, log=log_message))
+        log_message(f"Watcher (Polling alle {WATCH_POLL_SECONDS:g} s): {', '.join(polling_roots)}")
+    return watchers
+
+def run_watch_mode():
+    """
+    Beobachtet die Video-Ordner und aktualisiert nur geänderte Pfade. Verarbeitet wird unter
+    der Scan-Sperre; läuft gerade ein vollständiger Scan, bleiben die Pfade vorgemerkt.
+    """
+    roots = [cfg['source_path'] for cfg in VIDEO_SOURCES.values() if cfg['source_path'] and os.path.isdir(cfg['source_path'])]
+    if not roots:
+        print("Keine gültigen Video-Ordner (FILME_PATH/SERIEN_PATH) zum Beobachten.", file=sys.stderr)
+        return 1
+
+    metrics.configure(METRICS_DIR, 'watch', resume=True)
+    image_downloader.build_index()
+    watchers = create_watchers(roots)
+    batcher = ChangeBatcher(WATCH_DEBOUNCE_SECONDS)
+    timeout = 1.0 / len(watchers)
+    try:
+        while True:
+            for watcher in watchers:
+                batcher.add(watcher.poll(timeout))
+            paths = batcher.ready()
+            if not paths:
+                continue
+            if not scan_state.lock.acquire():
+                batcher.restore(paths)
+                continue
+            try:
+                apply_changed_paths(paths)
+            except Exception as e:
+                log_message(f"Watcher: Fehler beim Aktualisieren: {e}", is_error=True)
+            finally:
+                scan_state.lock.release()
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        for watcher in watchers:
+            watcher.close()
+        image_downloader.shutdown()
+
+def run_scan_worker(full_rescan=False):
+    """
+    Einstieg für den Scan-Prozess (python video_update.py --scan [--full]).
+    Die Datei-Sperre stellt sicher, dass maschinenweit nur ein Scan läuft.
+    """
+    metrics.configure(METRICS_DIR, 'scan', resume=True)
+    # Kurz warten: der Watcher hält die Sperre, während er einzelne Dateien abgleicht
+    if not scan_state.lock.acquire(timeout=SCAN_LOCK_WAIT_SECONDS):
+        reason = (f"Scan nicht gestartet: die Scan-Sperre ist seit {SCAN_LOCK_WAIT_SECONDS} s belegt "
+                  "(es läuft bereits ein Scan, der Watcher, --thumbs-gc oder --probe-all).")
+        print(reason, file=sys.stderr)
+        scan_state.abort_start(f"[{time.strftime('%H:%M:%S')}] ❌ FEHLER: {reason}")
+        return 1
+    try:
+        run_metadata_update_task(full_rescan)
+    finally:
+        scan_state.lock.release()
+    return 0
+
+def run_thumbs_gc(dry_run=False):
+    """
+    Nur den Thumbnail-GC ausführen (python video_update.py --thumbs-gc [--dry-run]).
+    Mit --dry-run wird nur berichtet, wie viel Platz frei würde.
+    """
+    if dry_run:
+        collect_thumbs(dry_run=True)
+        return 0
+    # Fester Name wie beim Scan, sonst verwirft /metrics die Werte nach dem Ende als toten web-Worker
+    metrics.configure(METRICS_DIR, 'thumbs-gc', resume=True)
+    if not scan_state.lock.acquire(timeout=SCAN_LOCK_WAIT_SECONDS):
+        print("Es läuft gerade ein Scan, breche ab.", file=sys.stderr)
+        return 1
+    try:
+        collect_thumbs()
+        store.commit()
+        export_db()
+    finally:
+        scan_state.lock.release()
+    return 0
+
+def run_probe_all():
+    """
+    Technische Daten für alle Einträge nachholen, denen sie fehlen (python video_update.py --probe-all),
+    z.B. einmalig nach dem Update für die schon vorhandene Bibliothek. Läuft unter der Scan-Sperre.
+    """
+    metrics.configure(METRICS_DIR, 'probe-all', resume=True)
+    if not scan_state.lock.acquire(timeout=SCAN_LOCK_WAIT_SECONDS):
+        print("Es läuft gerade ein Scan, breche ab.", file=sys.stderr)
+        return 1
+    try:
+        if run_probe_stage(store.load_manifest()):
+            store.commit()
+            export_db()
+    finally:
+        scan_state.lock.release()
+    return 0
+
+def spawn_scan_worker(full_rescan=False):
+    """Startet den Scan als eigenen Prozess, unabhängig vom Web-Worker, der die Anfrage bekommen hat."""
+    command = [sys.executable, os.path.abspath(__file__), '--scan']
+    if full_rescan:
+        command.append('--full')
+    if os.name == 'nt':
+        process = subprocess.Popen(command, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        process = subprocess.Popen(command, start_new_session=True)
+    # Prozess nach dem Ende abholen (keine Zombies im Web-Worker)
+    Thread(target=process.wait, daemon=True).start()
+
+def warm_library_index():
+    """Baut Such- und Abfrageindex nach einem Scan im Hintergrund neu, damit die erste Suche nicht wartet."""
+    global warmup_thread
+    if library_index.search_generation == store.generation():
+        return
+    if warmup_thread is None or not warmup_thread.is_alive():
+        warmup_thread = Thread(target=library_index.searcher, daemon=True)
+        warmup_thread.start()
 
 # ------------------------------------------------
 # FLASK API ENDPUNKTE
@@ -371,33 +1222,160 @@ def index():
 
 @app.route('/api/start_update', methods=['POST'])
 def start_update():
-    global scan_status
-    if scan_status == "RUNNING":
+    # ?full=1 erzwingt einen vollständigen Scan ohne Manifest
+    full_rescan = request.args.get('full') == '1'
+    # Nur STARTING setzen, Log und RUNNING schreibt der Scan-Prozess erst mit gehaltener Sperre.
+    # Das Setzen ist atomar: von zwei gleichzeitigen Anfragen startet nur eine einen Prozess.
+    if scan_state.status() in ACTIVE_STATES or not scan_state.mark_starting(full_rescan):
         return jsonify({"status": "RUNNING", "message": "Der Scan läuft bereits."}), 200
-        
-    thread = Thread(target=run_metadata_update_task)
-    thread.start()
+    spawn_scan_worker(full_rescan)
     return jsonify({"status": "STARTED", "message": "Der Metadaten-Scan wurde gestartet."}), 202
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
+    """
+    Status und Log. Mit ?since=N nur die Zeilen nach Nummer N; 'seq' ist der Cursor für die
+    nächste Abfrage, 'reset' heißt: Anzeige ersetzen statt anhängen (neuer Scan / Zeilen verpasst).
+    """
+    try:
+        since = max(0, int(request.args.get('since', 0)))
+    except ValueError:
+        return jsonify({"error": "since muss eine Zahl sein"}), 400
+    status = scan_state.status()
+    if status == "FINISHED_OK":
+        warm_library_index()
+    lines, last_seq, reset = scan_state.read_log(since)
     return jsonify({
-        "status": scan_status,
-        "log": "\n".join(current_log)
+        "status": status,
+        "progress": scan_state.progress(),
+        "log": "\n".join(line for _, line in lines),
+        "seq": max(last_seq, lines[-1][0]) if lines else last_seq,
+        "reset": reset,
     }), 200
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus-Metriken aller Prozesse (Web-Worker, letzter Scan, Watcher)."""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/status/stream', methods=['GET'])
+def status_stream():
+    """Server-Sent Events: Log-Zeilen und Statuswechsel, sobald sie entstehen (Ende mit dem Scan)."""
+    since = request.headers.get('Last-Event-ID') or request.args.get('since') or '0'
+    since = int(since) if since.isdigit() else 0
+    return Response(stream_events(scan_state, since), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # nginx soll die Events nicht puffern
+    })
+
+def list_args(name):
+    """Kommagetrennte Query-Parameter (z.B. ?genre=Action,Drama oder mehrfach ?genre=..)."""
+    return [value.strip() for raw in request.args.getlist(name) for value in raw.split(',') if value.strip()]
+
+def cached_api_response(build):
+    """
+    Antwortet mit 304, wenn der Client den Stand schon hat (If-None-Match), sonst mit JSON und ETag.
+    Der ETag hängt nur von der DB-generation und der Anfrage ab, wiederholte Abfragen kosten
+    deshalb weder Neuaufbau noch Serialisierung.
+    """
+    generation = library_index.refresh()
+    etag = hashlib.sha1(f"{generation}:{request.full_path}".encode('utf-8')).hexdigest()[:20]
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        try:
+            payload = build()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if payload is None:
+            return jsonify({"error": "Nicht gefunden."}), 404
+        response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def paged_query(items, all_genres, **query_options):
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', API_DEFAULT_PAGE_SIZE, type=int), API_MAX_PAGE_SIZE)
+    total, page_items = query_items(
+        items,
+        genres=list_args('genre'),
+        sort=request.args.get('sort', 'title'),
+        page=page,
+        per_page=per_page,
+        fields=list_args('fields'),
+        **query_options,
+    )
+    return {"total": total, "page": page, "per_page": per_page, "genres": all_genres, "items": page_items}
+
+@app.route('/api/movies', methods=['GET'])
+def api_movies():
+    """Filme: ?page, ?per_page, ?genre, ?sort=title|-title|key, ?fields=title,poster_local_url,..."""
+    return cached_api_response(lambda: paged_query(library_index.movies, library_index.movie_genres))
+
+@app.route('/api/series', methods=['GET'])
+def api_series():
+    """Serien-Übersicht (ohne Episoden), Parameter wie /api/movies, zusätzlich ?sort=episodes."""
+    return cached_api_response(
+        lambda: paged_query(library_index.series_list, library_index.series_genres, sorts=SERIES_SORTS))
+
+@app.route('/api/series/<path:series_key>', methods=['GET'])
+def api_series_detail(series_key):
+    """Eine Serie mit allen Staffeln und Episoden, optional nur ?season=N."""
+    def build():
+        view = library_index.series.get(series_key)
+        if view is None:
+            return None
+        season = request.args.get('season', type=int)
+        if season is None:
+            return view
+        return dict(series_summary(view), seasons=[s for s in view['seasons'] if s['season'] == season])
+    return cached_api_response(build)
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    """Volltext-/Präfixsuche mit Tippfehler-Toleranz: ?q=..., ?limit=20, ?type=movie,series,episode"""
+    def build():
+        query = request.args.get('q', '')
+        limit = max(1, min(request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int), SEARCH_MAX_LIMIT))
+        total, items = library_index.searcher().search(query, limit=limit, types=set(list_args('type')))
+        return {"query": query, "total": total, "items": items}
+    return cached_api_response(build)
+
+@app.route('/thumbs/<path:filename>')
+def serve_thumb(filename):
+    response = send_from_directory(THUMBS_DIR, filename)
+    response.headers['Cache-Control'] = THUMBS_CACHE_CONTROL
+    return response
+
 @app.route('/<path:path>')
 def send_report(path):
-    return send_from_directory(WWWROOT_PATH, path)
+    return send_precompressed(WWWROOT_PATH, path)
 
-@app.route('/Videos/Filme/<path:filename>')
+@app.route('/Videos/Filme/<path:filename>', methods=['GET', 'HEAD'])
 def serve_filme(filename):
     # Nutzt den oben erkannten Pfad
-    return send_from_directory(FILME_PATH, filename)
+    return send_video(FILME_PATH, filename, offload=VIDEO_OFFLOAD, accel_location=f"{VIDEO_ACCEL_PREFIX}/Filme")
 
-@app.route('/Videos/Serie/<path:filename>')
+@app.route('/Videos/Serie/<path:filename>', methods=['GET', 'HEAD'])
 def serve_serien(filename):
-    return send_from_directory(SERIEN_PATH, filename)
+    return send_video(SERIEN_PATH, filename, offload=VIDEO_OFFLOAD, accel_location=f"{VIDEO_ACCEL_PREFIX}/Serie")
+
+def hls_source_path(source, filename):
+    """Videodatei zu /hls/<Filme|Serie>/<Pfad>/..., 404 für unbekannte Quellen und Pfade außerhalb."""
+    root = {"Filme": FILME_PATH, "Serie": SERIEN_PATH}.get(source)
+    full_path = safe_join(root, filename) if root else None
+    if not full_path or not os.path.isfile(full_path):
+        abort(404)
+    return full_path
+
+@app.route('/hls/<source>/<path:filename>/index.m3u8')
+def serve_hls_playlist(source, filename):
+    return hls_streamer.playlist(hls_source_path(source, filename))
+
+@app.route('/hls/<source>/<path:filename>/seg_<int:index>.ts')
+def serve_hls_segment(source, filename, index):
+    return hls_streamer.segment(hls_source_path(source, filename), index)
 
 
 
@@ -405,4 +1383,12 @@ def serve_serien(filename):
 # STARTE FLASK-APP
 # ------------------------------------------------
 if __name__ == '__main__':
+    if '--scan' in sys.argv:
+        sys.exit(run_scan_worker(full_rescan='--full' in sys.argv))
+    if '--watch' in sys.argv:
+        sys.exit(run_watch_mode())
+    if '--probe-all' in sys.argv:
+        sys.exit(run_probe_all())
+    if '--thumbs-gc' in sys.argv:
+        sys.exit(run_thumbs_gc(dry_run='--dry-run' in sys.argv))
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
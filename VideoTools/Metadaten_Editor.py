@@ -1,12 +1,21 @@
 import os
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, scrolledtext
-import json
 import requests
 import re
 import shutil
 from dotenv import load_dotenv
 
+# Gemeinsame Module (TMDB-Client mit persistentem Cache) liegen im VideoHub-Ordner
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'VideoHub'))
+from tmdb_client import TMDBClient
+from tmdb_cache import cache_from_env
+from image_downloader import image_filename
+from metadata_store import MetadataStore, default_db_path
+from static_library import StaticLibraryWriter, LIBRARY_DIR
+from precompress import update_precompressed
+
 # --- KONFIGURATION & HILFSFUNKTIONEN ---
 
 if os.name == 'nt':  # Windows
@@ -24,7 +33,7 @@ else:
 WWWROOT_PATH = os.getenv("APACHE_PATH", default_www)
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
 METADATA_FILE = os.path.join(WWWROOT_PATH, 'metadata.json')
 THUMBS_DIR = os.path.join(WWWROOT_PATH, 'thumbs')  
 THUMBS_WEB_PATH = 'thumbs/'
@@ -40,15 +49,13 @@ COLORS = {
     "list_bg": "#252526"
 }
 
+tmdb_api = TMDBClient(TMDB_API_KEY, base_url=TMDB_BASE_URL, cache=cache_from_env())
+
 def search_tmdb_movies(query, year=None):
-    if not TMDB_API_KEY:
+    if not TMDB_API_KEY and not tmdb_api.cache.offline:
         return {"error": "TMDB API Key fehlt."}
-    params = {'api_key': TMDB_API_KEY, 'query': query, 'language': 'de-DE'}
-    if year: params['year'] = year
     try:
-        response = requests.get(f"{TMDB_BASE_URL}/search/movie", params=params)
-        response.raise_for_status()
-        return response.json().get('results', [])
+        return tmdb_api.search_movie(query, year=year).get('results', [])
     except Exception as e:
         return {"error": str(e)}
 
@@ -68,21 +75,35 @@ class MetadataEditorApp:
         if not os.path.exists(THUMBS_DIR):
             os.makedirs(THUMBS_DIR)
 
-        self.metadata = self.load_metadata()
+        try:
+            self.store = self.load_metadata()
+        except RuntimeError as e:
+            messagebox.showerror("Metadaten-DB", str(e))
+            sys.exit(1)
         self.metadata_items = []
         self.create_widgets()
         self.populate_listbox()
 
     def load_metadata(self):
-        if os.path.exists(METADATA_FILE):
-            with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        # Die Metadaten liegen in der SQLite-DB des VideoHub, metadata.json ist nur noch ein Export.
+        # Ohne ausdrücklich eingetragene DB landeten Änderungen in einer eigenen, leeren DB neben den Tools.
+        if not (os.getenv("METADATA_DB") or os.getenv("DATA_PATH")):
+            raise RuntimeError(f"METADATA_DB bzw. DATA_PATH fehlt in {env_file}: Pfad zur Datenbank des VideoHub (metadata.sqlite) eintragen.")
+        db_path = default_db_path()
+        if not os.path.isfile(db_path):
+            raise RuntimeError(f"Metadaten-DB '{db_path}' nicht gefunden. Ist der Pfad zum VideoHub erreichbar und lief dort schon ein Scan?")
+        store = MetadataStore(db_path)
+        if store.count() == 0 and os.path.exists(METADATA_FILE) and os.path.getsize(METADATA_FILE) > 0:
+            store.import_json(METADATA_FILE, lambda file_key: None)
+        return store
 
     def save_metadata(self):
+        """Exportiert die DB nach metadata.json und library/, damit die Hub-Seiten die Korrekturen sehen."""
         try:
-            with open(METADATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, indent=4, ensure_ascii=False)
+            self.store.commit()
+            self.store.export_json(METADATA_FILE)
+            StaticLibraryWriter(WWWROOT_PATH).write(self.store)
+            update_precompressed(WWWROOT_PATH, (LIBRARY_DIR,))
             self.log("✅ Metadaten erfolgreich gespeichert.")
             return True
         except Exception as e:
@@ -137,20 +158,27 @@ class MetadataEditorApp:
     def populate_listbox(self):
         for i in self.tree.get_children(): self.tree.delete(i)
         self.metadata_items = []
-        for key in sorted(self.metadata.keys()):
-            self.tree.insert("", tk.END, values=(key, self.metadata[key].get('title', 'N/A')))
+        for key, title in self.store.titles():
+            self.tree.insert("", tk.END, values=(key, title))
             self.metadata_items.append(key)
 
     def save_and_close(self):
         if self.save_metadata(): self.master.destroy()
 
-    def download_image(self, tmdb_path, local_filename):
+    def download_image(self, tmdb_path, kind):
+        # Gemeinsame Datei je TMDB-Bild wie beim Scan; eine vorhandene wird nie überschrieben
         if not tmdb_path: return None
-        url = f"https://image.tmdb.org/t/p/{'w500' if '_p.jpg' in local_filename else 'w1280'}{tmdb_path}"
+        local_filename = image_filename(tmdb_path, kind)
         local_path = os.path.join(THUMBS_DIR, local_filename)
+        if os.path.exists(local_path):
+            return f"{THUMBS_WEB_PATH}{local_filename}"
+        url = f"https://image.tmdb.org/t/p/{'w500' if kind == 'p' else 'w1280'}{tmdb_path}"
         try:
             r = requests.get(url, stream=True, timeout=10)
-            with open(local_path, 'wb') as f: shutil.copyfileobj(r.raw, f)
+            r.raise_for_status()
+            part_path = f"{local_path}.{os.getpid()}.part"
+            with open(part_path, 'wb') as f: shutil.copyfileobj(r.raw, f)
+            os.replace(part_path, local_path)
             return f"{THUMBS_WEB_PATH}{local_filename}"
         except: return None
 
@@ -172,7 +200,7 @@ class MetadataEditorApp:
         top_f.pack(fill="x")
         
         tk.Label(top_f, text="Titel:", bg=COLORS["card"], fg="white").pack(side="left", padx=5)
-        q_var = tk.StringVar(value=self.metadata[file_key].get('title', file_key))
+        q_var = tk.StringVar(value=(self.store.get(file_key) or {}).get('title', file_key))
         tk.Entry(top_f, textvariable=q_var, width=30).pack(side="left", padx=5)
         
         y_var = tk.StringVar()
@@ -196,17 +224,25 @@ class MetadataEditorApp:
                 res = sw.results[idx]
                 
                 # Bilder & Daten verarbeiten
-                clean_key = file_key.replace(os.path.sep, '_').replace('.', '_')
-                p_url = self.download_image(res.get('poster_path'), f"{clean_key}_p.jpg")
-                b_url = self.download_image(res.get('backdrop_path'), f"{clean_key}_b.jpg")
+                p_url = self.download_image(res.get('poster_path'), 'p')
+                b_url = self.download_image(res.get('backdrop_path'), 'b')
 
-                self.metadata[file_key].update({
+                # Nur dieser eine Eintrag wird in der DB geändert (kein Komplett-Schreiben mehr)
+                self.store.update(file_key, {
                     'title': res.get('title'),
                     'overview': res.get('overview'),
+                    'poster_path': res.get('poster_path') or "",
+                    'backdrop_path': res.get('backdrop_path') or "",
                     'poster_local_url': p_url or "",
-                    'backdrop_local_url': b_url or ""
+                    'backdrop_local_url': b_url or "",
+                    # WebP/AVIF-Fassungen und Platzhalter passen nicht mehr zum neuen Bild, der nächste Scan baut sie neu
+                    'poster_variants': {},
+                    'backdrop_variants': {},
+                    'poster_lqip': "",
+                    'backdrop_lqip': ""
                 })
-                self.save_metadata()
+                self.store.commit()
+                self.log(f"✅ '{res.get('title')}' übernommen (Export nach metadata.json beim Speichern).")
                 self.populate_listbox()
                 sw.destroy()
             except: messagebox.showerror("Fehler", "Auswahl ungültig!")
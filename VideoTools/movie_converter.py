@@ -1,11 +1,21 @@
 import os
+import sys
 import subprocess
 import json
+import sqlite3
 import threading
 import tkinter as tk
 from tkinter import filedialog, ttk, scrolledtext, messagebox
 import shutil
 import time
+from dotenv import load_dotenv
+
+# Technische Daten, die der VideoHub-Scan schon per ffprobe erfasst hat, liegen in seiner Metadaten-DB
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'VideoHub'))
+import media_probe
+from metadata_store import MetadataStore, default_db_path
+
+load_dotenv(".env_windows" if os.name == 'nt' else ".env")
 
 # --- KONFIGURATION ---
 CONVERT_EXTENSIONS = ('.avi', '.mpg', '.mpeg', '.mkv', '.divx')
@@ -24,6 +34,7 @@ class VideoConverterApp:
         self.files_to_process = []
         self.current_process = None
         self.is_running = False
+        self.store = self.open_media_db()
 
         self.create_widgets()
         self.set_default_output_dir()
@@ -287,8 +298,26 @@ class VideoConverterApp:
         self.log(f"  -> Status: {line}")
     # --- WICHTIGE NEUE/ANGEPASSTE LOGIK HIER ---
 
+    def open_media_db(self):
+        """Metadaten-DB des VideoHub, falls vorhanden (ohne DB fragt get_codec_info ffprobe direkt)."""
+        db_path = default_db_path()
+        if not os.path.exists(db_path):
+            return None
+        try:
+            return MetadataStore(db_path)
+        except sqlite3.Error:
+            return None
+
     def get_codec_info(self, file_path):
-        """Führt FFprobe in zwei separaten Durchgängen aus (Video & Audio) für maximale Robustheit."""
+        """
+        Nimmt die Daten aus der VideoHub-DB, wenn der Scan die Datei in ihrem jetzigen Stand schon
+        gelesen hat. Sonst FFprobe in zwei separaten Durchgängen (Video & Audio) für maximale Robustheit.
+        """
+        info = media_probe.stored_media_info(self.store, file_path) if self.store is not None else None
+        if info is not None and info.get('video_codec'):
+            video_codec, audio_codec, duration = info['video_codec'], media_probe.audio_codec(info), info.get('duration') or 0.0
+            self.master.after(0, self.log, f"  -> Daten aus der VideoHub-DB: V={video_codec.upper()}, A={audio_codec.upper() if audio_codec else 'NICHT GEFUNDEN'}, Dauer={duration:.2f}s", False)
+            return video_codec, audio_codec, duration
 
         def run_ffprobe_stream_info(stream_type):
             command = [
@@ -1,11 +1,17 @@
 import os
 import re
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, scrolledtext
-import tmdbsimple as tmdb
 import threading
 from dotenv import load_dotenv
 
+# Gemeinsame Module (TMDB-Client mit persistentem Cache) liegen im VideoHub-Ordner
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'VideoHub'))
+from tmdb_client import TMDBClient
+from tmdb_cache import cache_from_env
+from filename_parser import parse_media_path
+
 if os.name == 'nt':  # Windows
     env_file = ".env_windows"
     default_www = r"C:/Users/mario/Documents/VB2026/VideoHub/VideoHub/VideoHub/wwwroot"
@@ -38,7 +44,7 @@ class SeriesRenamerApp:
             master.destroy()
             return
 
-        tmdb.API_KEY = TMDB_API_KEY
+        self.tmdb = TMDBClient(TMDB_API_KEY, cache=cache_from_env())
 
         self.directory = None
         self.series_id = None
@@ -119,30 +125,11 @@ class SeriesRenamerApp:
                 self.tree.delete(i)
 
     def parse_episode_info(self, filename):
-        """Extrahiert Staffel- und Episodennummer aus dem Dateinamen."""
-        
-        # 1. Muster für S01E01, s01e01, SE01E01 etc.
-        match = re.search(r'[Ss]([0-9]+)[\s\._-]*[Ee]([0-9]+)', filename, re.IGNORECASE)
-        if match:
-            return int(match.group(1)), int(match.group(2))
-
-        # 2. NEU: Muster für "Episode 5 Staffel 3" oder "Staffel 3 Episode 5"
-        # Sucht nach den Begriffen und fängt die Zahlen ein
-        match_ep_st = re.search(r'Episode\s*(\d+).*Staffel\s*(\d+)', filename, re.IGNORECASE)
-        if match_ep_st:
-            # Achtung: Hier ist Gruppe 2 die Staffel und Gruppe 1 die Episode!
-            return int(match_ep_st.group(2)), int(match_ep_st.group(1))
-        
-        match_st_ep = re.search(r'Staffel\s*(\d+).*Episode\s*(\d+)', filename, re.IGNORECASE)
-        if match_st_ep:
-            return int(match_st_ep.group(1)), int(match_st_ep.group(2))
-
-        # 3. Muster für 1x01, 1x1, etc.
-        match = re.search(r'(\d+)[xX](\d+)', filename, re.IGNORECASE)
-        if match:
-            return int(match.group(1)), int(match.group(2))
-
-        return None, None
+        """Extrahiert Staffel- und Episodennummer aus dem Dateinamen (Staffel notfalls aus dem Ordnernamen)."""
+        parsed = parse_media_path([os.path.basename(self.directory or ''), filename], is_tv=True)
+        if parsed.season is None or parsed.episode is None:
+            return None, None
+        return parsed.season, parsed.episode
 
     def start_preview_thread(self):
         """Startet die Vorschau in einem separaten Thread, um die GUI nicht zu blockieren."""
@@ -176,9 +163,8 @@ class SeriesRenamerApp:
             self.log(f"Suche nach Serie: '{series_name}' auf TMDB...")
 
             try:
-                search = tmdb.Search()
-                search.tv(query=series_name, language='de-DE')
-                if not search.results:
+                results = self.tmdb.search_tv(series_name).get('results', [])
+                if not results:
                     self.log(f"Keine Serie mit dem Namen '{series_name}' gefunden.", is_error=True)
                     self.log("Tipp: Versuche die manuelle Suche, wenn die automatische Suche fehlschlägt.")
                     self.master.after(0, lambda: self.preview_button.config(state='normal'))
@@ -186,7 +172,7 @@ class SeriesRenamerApp:
                     return
 
                 # Wir nehmen das erste Ergebnis als das wahrscheinlichste
-                series_info = search.results[0]
+                series_info = results[0]
                 self.series_id = series_info['id']
                 original_series_name = series_info['name']
                 clean_series_name = re.sub(r'[\\/*?:"<>|]', "", original_series_name)
@@ -200,8 +186,7 @@ class SeriesRenamerApp:
         
         # NEU: Hole Seriendetails für den Namen, falls die ID manuell gesetzt wurde
         try:
-            tv = tmdb.TV(self.series_id)
-            details = tv.info(language='de-DE')
+            details = self.tmdb.tv_info(self.series_id)
             original_series_name = details['name']
             clean_series_name = re.sub(r'[\\/*?:"<>|]', "", original_series_name)
         except Exception as e:
@@ -228,8 +213,7 @@ class SeriesRenamerApp:
                 # Hole Staffeldetails, wenn noch nicht im Cache
                 if season_num not in episode_cache:
                     self.log(f"   -> Lade Episoden-Infos für Staffel {season_num}...")
-                    tv_season = tmdb.TV_Seasons(self.series_id, season_num)
-                    season_details = tv_season.info(language='de-DE')
+                    season_details = self.tmdb.tv_season(self.series_id, season_num)
                     episode_cache[season_num] = {ep['episode_number']: ep for ep in season_details.get('episodes', [])}
 
                 # Finde die Episode im Cache
@@ -347,12 +331,10 @@ class SeriesRenamerApp:
                 tree_results.delete(i)
             
             try:
-                search = tmdb.Search()
                 # Suchanfrage in separatem Thread, um GUI nicht zu blockieren
                 def run_search():
                     try:
-                        search.tv(query=query, language='de-DE')
-                        results = search.results
+                        results = self.tmdb.search_tv(query).get('results', [])
                         self.master.after(0, lambda r=results: update_results_tree(r))
                     except Exception as e:
                         self.master.after(0, lambda: messagebox.showerror("API-Fehler", f"Fehler bei der TMDB-Suche: {e}"))